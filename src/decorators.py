@@ -1,6 +1,10 @@
 import time
+from contextlib import contextmanager
+from contextvars import ContextVar
 from functools import wraps
-from typing import Any, Callable, Dict, Tuple
+from typing import Any, Callable, Dict, Iterator, Optional
+
+from src.primitive_db import metrics
 
 
 # Значения по умолчанию при ошибках для функций ядра
@@ -10,9 +14,6 @@ def _default_create_or_drop(metadata, *_, **__):
 def _default_insert(_metadata, _table, rows, _values, **__):
     return rows
 
-def _default_select(_rows, _where=None, **__):
-    return []
-
 def _default_update(*_, **__):
     return 0
 
@@ -25,8 +26,11 @@ def _default_get_schema(*_, **__):
 _DEFAULT_RETURNS: Dict[str, Callable[..., Any]] = {
     "create_table": _default_create_or_drop,
     "drop_table": _default_create_or_drop,
+    "create_index": _default_create_or_drop,
+    "drop_index": _default_create_or_drop,
+    "set_layout": _default_create_or_drop,
     "insert": _default_insert,
-    "select": _default_select,
+    "insert_many": lambda *_a, **_k: [],
     "update": _default_update,
     "delete": _default_delete,
     "_get_schema": _default_get_schema,
@@ -34,16 +38,37 @@ _DEFAULT_RETURNS: Dict[str, Callable[..., Any]] = {
 }
 
 
+# Строгий режим: ошибки ядра не печатаются, а выбрасываются (встраиваемый API)
+_STRICT_ERRORS: ContextVar[bool] = ContextVar("strict_errors", default=False)
+
+
+@contextmanager
+def strict_errors() -> Iterator[None]:
+    """Внутри блока handle_db_errors пропускает исключения к вызывающему."""
+    token = _STRICT_ERRORS.set(True)
+    try:
+        yield
+    finally:
+        _STRICT_ERRORS.reset(token)
+
+
+def errors_are_strict() -> bool:
+    return _STRICT_ERRORS.get()
+
+
 def handle_db_errors(func: Callable) -> Callable:
     """
     Ловит KeyError, ValueError, FileNotFoundError, печатает сообщение
-    и возвращает безопасное значение по умолчанию.
+    и возвращает безопасное значение по умолчанию (в блоке strict_errors —
+    пропускает исключение).
     """
     @wraps(func)
     def wrapper(*args, **kwargs):
         try:
             return func(*args, **kwargs)
         except (KeyError, ValueError, FileNotFoundError) as e:
+            if _STRICT_ERRORS.get():
+                raise
             print(f"Ошибка: {e}")
             default = _DEFAULT_RETURNS.get(func.__name__)
             if default is not None:
@@ -55,6 +80,16 @@ def handle_db_errors(func: Callable) -> Callable:
     return wrapper
 
 
+# Политика подтверждений: None — спрашивать, True/False — отвечать автоматически
+_CONFIRM_POLICY: Optional[bool] = None
+
+
+def set_confirm_policy(answer: Optional[bool]) -> None:
+    """None — спрашивать пользователя, True/False — автоматически да/нет."""
+    global _CONFIRM_POLICY
+    _CONFIRM_POLICY = answer
+
+
 def confirm_action(action_name: str) -> Callable:
     """
     Запрашивает подтверждение перед выполнением «опасного» действия.
@@ -63,8 +98,11 @@ def confirm_action(action_name: str) -> Callable:
     def decorator(func: Callable) -> Callable:
         @wraps(func)
         def wrapper(*args, **kwargs):
-            answer = input(f'Вы уверены, что хотите выполнить "{action_name}"? '
-                           '[y/n]: ').strip().lower()
+            if _CONFIRM_POLICY is None:
+                answer = input(f'Вы уверены, что хотите выполнить "{action_name}"? '
+                               '[y/n]: ').strip().lower()
+            else:
+                answer = "y" if _CONFIRM_POLICY else "n"
             if answer != "y":
                 print("Операция отменена пользователем.")
                 default = _DEFAULT_RETURNS.get(func.__name__)
@@ -75,29 +113,18 @@ def confirm_action(action_name: str) -> Callable:
 
 def log_time(func: Callable) -> Callable:
     """
-    Замеряет и выводит время выполнения функции.
+    Замеряет время выполнения функции и записывает его в гистограмму
+    задержек операции core.<имя функции> (см. команду stats).
     """
+    op = f"core.{func.__name__}"
+
     @wraps(func)
     def wrapper(*args, **kwargs):
-        start = time.monotonic()
+        if not metrics.enabled():
+            return func(*args, **kwargs)
+        start = time.perf_counter()
         try:
             return func(*args, **kwargs)
         finally:
-            dt = time.monotonic() - start
-            print(f"Функция {func.__name__} выполнилась за {dt:.3f} секунд.")
+            metrics.observe(op, time.perf_counter() - start)
     return wrapper
-
-
-def create_cacher() -> Callable[[Tuple[Any, ...], Callable[[], Any]], Any]:
-    """
-    Возвращает функцию cache_result(key, value_func), 
-    кэширующую результаты value_func() по ключу.
-    """
-    cache: Dict[Tuple[Any, ...], Any] = {}
-    def cache_result(key: Tuple[Any, ...], value_func: Callable[[], Any]) -> Any:
-        if key in cache:
-            return cache[key]
-        value = value_func()
-        cache[key] = value
-        return value
-    return cache_result
@@ -0,0 +1,355 @@
+"""
+Встраиваемый API: работа с БД из Python-кода без интерактивного цикла.
+Database владеет сеансом (метаданные, резидентные таблицы, кэш select),
+принимает команды того же языка с параметрами ? и возвращает результат
+в Cursor вместо печати. Ошибки выбрасываются исключением DatabaseError,
+удаление не запрашивает подтверждения.
+
+    with Database() as db:
+        db.execute('create_table users name:str age:int')
+        db.executemany('insert into users values (?, ?)',
+                       [("Ann", 30), ("Bob", 25)])
+        for row in db.execute("select from users where age > ?", (26,)):
+            print(row)
+"""
+import contextlib
+import inspect
+import io
+import time
+from itertools import islice
+from operator import itemgetter
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+)
+
+from src.decorators import strict_errors
+from src.primitive_db import metrics
+from src.primitive_db.core import _validate_value
+from src.primitive_db.core import insert_many as core_insert_many
+from src.primitive_db.engine import (
+    Session,
+    _get_rows,
+    _insert_records,
+    _table_indexes,
+)
+from src.primitive_db.ingest import iter_file_values
+from src.primitive_db.parser import Param, bind_params, parse_statement
+
+# Пакетная вставка без перехвата ошибок ядра
+_strict_insert_many = inspect.unwrap(core_insert_many)
+# Команды, которые выполняет сеанс: их вывод возвращается строками столбца output
+_SESSION_COMMANDS = ("create_table", "create_index", "drop_index", "set_layout",
+                     "compact", "convert", "info", "explain", "stats",
+                     "help", "sync", "flush")
+# Команды, меняющие схему: вне autocommit открывают транзакцию
+_WRITE_COMMANDS = ("create_table", "create_index", "drop_index", "set_layout")
+
+
+class DatabaseError(ValueError):
+    """Ошибка выполнения команды встраиваемого API."""
+
+
+def _row_tuple(columns: Sequence[str]) -> Callable[[Dict[str, Any]], tuple]:
+    if len(columns) == 1:
+        column = columns[0]
+        return lambda row: (row[column],)
+    return itemgetter(*columns)
+
+
+def _values_binder(values: List[Any]) -> Callable[[Sequence[Any]], List[Any]]:
+    """Функция, подставляющая параметры в список значений insert."""
+    slots = [(v.index if isinstance(v, Param) else None, v) for v in values]
+    return lambda params: [v if i is None else params[i] for i, v in slots]
+
+
+class Cursor:
+    """
+    Результат команды. Строки select отдаются лениво, кортежами в порядке
+    columns, по мере перебора; rowcount — число изменённых записей
+    (-1 для select), lastrowid — ID последней вставленной записи.
+    """
+    __slots__ = ("columns", "rowcount", "lastrowid", "_rows")
+
+    def __init__(self, columns: Sequence[str] = (),
+                 rows: Iterable[tuple] = (), rowcount: int = -1,
+                 lastrowid: Optional[int] = None) -> None:
+        self.columns = tuple(columns)
+        self.rowcount = rowcount
+        self.lastrowid = lastrowid
+        self._rows: Iterator[tuple] = iter(rows)
+
+    def __iter__(self) -> "Cursor":
+        return self
+
+    def __next__(self) -> tuple:
+        return next(self._rows)
+
+    def fetchone(self) -> Optional[tuple]:
+        return next(self._rows, None)
+
+    def fetchmany(self, size: int = 100) -> List[tuple]:
+        return list(islice(self._rows, size))
+
+    def fetchall(self) -> List[tuple]:
+        return list(self._rows)
+
+
+class Database:
+    """
+    Соединение с БД в текущем каталоге (db_meta.json и data/).
+    При autocommit=False изменения копятся в транзакции, которая открывается
+    первой изменяющей командой, и записываются одним коммитом в commit();
+    rollback() отменяет их. При autocommit=True каждый вызов execute
+    и executemany фиксируется сразу. Курсор select читает строки лениво:
+    его нужно дочитать до следующего изменения той же таблицы.
+    """
+
+    def __init__(self, autocommit: bool = False) -> None:
+        self._session = Session(defer_writes=True)
+        self.autocommit = autocommit
+
+    @property
+    def in_transaction(self) -> bool:
+        return self._session.in_transaction
+
+    def execute(self, sql: str, params: Sequence[Any] = ()) -> Cursor:
+        """Выполнить команду, подставив params вместо параметров ?."""
+        stmt = self._bind(sql, params)
+        with self._session.lock:
+            if not metrics.enabled():
+                return self._run(stmt)
+            start = time.perf_counter()
+            try:
+                return self._run(stmt)
+            finally:
+                metrics.observe(f'api.{stmt["cmd"]}', time.perf_counter() - start)
+
+    def executemany(self, sql: str,
+                    seq_of_params: Iterable[Sequence[Any]]) -> Cursor:
+        """
+        Выполнить insert, update или delete для каждого набора параметров.
+        Вставка проверяется по схеме целиком и пишется одним журналом;
+        изменения update/delete записываются одним коммитом, а при autocommit
+        ошибка в любом наборе отменяет весь пакет.
+        """
+        stmt, nparams = self._parse(sql)
+        ctype = stmt["cmd"]
+        if ctype == "insert":
+            # Подставляются только значения строки, без копирования всей команды
+            bind = _values_binder(stmt["values"])
+            values_list = [bind(self._check_params(nparams, p))
+                           for p in seq_of_params]
+            with self._session.lock:
+                return self._insert(stmt["table"], values_list)
+        bound = [self._bind_params(stmt, nparams, p) for p in seq_of_params]
+        with self._session.lock:
+            if ctype == "insert_many":
+                return self._insert(stmt["table"],
+                                    [row for b in bound for row in b["rows"]])
+            if ctype in ("update", "delete"):
+                return self._modify_many(stmt["table"], bound)
+        raise DatabaseError("executemany применим только к insert, update и delete")
+
+    def begin(self) -> None:
+        with self._session.lock:
+            self._call(self._session.begin)
+
+    def commit(self) -> None:
+        """Зафиксировать открытую транзакцию; без неё — ничего не делает."""
+        with self._session.lock:
+            if self._session.in_transaction:
+                self._call(self._session.commit)
+
+    def rollback(self) -> None:
+        """Отменить открытую транзакцию; без неё — ничего не делает."""
+        with self._session.lock:
+            if self._session.in_transaction:
+                self._session.rollback()
+
+    def close(self) -> None:
+        """Закрыть соединение; незафиксированная транзакция отменяется."""
+        with self._session.lock:
+            self.rollback()
+            self._session.close()
+
+    def __enter__(self) -> "Database":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if exc_type is None:
+            self.commit()
+        self.close()
+
+    # Разбор и подстановка параметров
+    @staticmethod
+    def _parse(sql: str) -> Tuple[Dict[str, Any], int]:
+        try:
+            return parse_statement(sql)
+        except ValueError as e:
+            raise DatabaseError(str(e)) from None
+
+    @staticmethod
+    def _check_params(nparams: int, params: Sequence[Any]) -> Sequence[Any]:
+        if len(params) != nparams:
+            raise DatabaseError(f"Ожидалось параметров: {nparams}, "
+                                f"получено: {len(params)}")
+        return params
+
+    def _bind_params(self, stmt: Dict[str, Any], nparams: int,
+                     params: Sequence[Any]) -> Dict[str, Any]:
+        self._check_params(nparams, params)
+        return bind_params(stmt, params) if nparams else stmt
+
+    def _bind(self, sql: str, params: Sequence[Any]) -> Dict[str, Any]:
+        stmt, nparams = self._parse(sql)
+        return self._bind_params(stmt, nparams, params)
+
+    @staticmethod
+    def _call(func: Callable[..., Any], *args: Any) -> Any:
+        try:
+            return func(*args)
+        except (KeyError, ValueError) as e:
+            if isinstance(e, DatabaseError):
+                raise
+            raise DatabaseError(str(e)) from e
+
+    # Выполнение команд
+    def _run(self, stmt: Dict[str, Any]) -> Cursor:
+        ctype = stmt["cmd"]
+        if ctype == "select":
+            return self._call(self._select, stmt)
+        if ctype == "insert":
+            return self._insert(stmt["table"], [stmt["values"]])
+        if ctype == "insert_many":
+            return self._insert(stmt["table"], stmt["rows"])
+        if ctype == "load":
+            return self._load(stmt["table"], stmt["path"])
+        if ctype in ("update", "delete"):
+            return self._modify_many(stmt["table"], [stmt])
+        if ctype == "drop_table":
+            return self._drop_table(stmt["table"])
+        if ctype == "list_tables":
+            return Cursor(("table",), ((name,) for name in
+                                       self._session.metadata.get("tables", {})))
+        if ctype == "begin":
+            self.begin()
+        elif ctype == "commit":
+            self.commit()
+        elif ctype == "rollback":
+            self.rollback()
+        elif ctype in _SESSION_COMMANDS:
+            return self._session_command(stmt)
+        else:
+            raise DatabaseError(f"Команда {ctype} недоступна во встраиваемом API")
+        return Cursor()
+
+    def _begin_write(self) -> None:
+        if not self.autocommit and not self._session.in_transaction:
+            self._session.begin()
+
+    def _end_write(self) -> None:
+        if self.autocommit:
+            # Внутри транзакции, открытой begin(), flush() ничего не пишет
+            self._session.flush()
+
+    def _schema(self, table: str) -> List[Dict[str, str]]:
+        tables = self._session.metadata.get("tables", {})
+        if table not in tables:
+            raise DatabaseError(f'Таблица "{table}" не существует')
+        return tables[table]["structure"]
+
+    def _select(self, stmt: Dict[str, Any]) -> Cursor:
+        session = self._session
+        plan = session._planner().select(stmt)
+        result, _ = session._select(plan, stmt)
+        columns = [c["name"] for c in plan.columns]
+        return Cursor(columns, map(_row_tuple(columns), result))
+
+    def _insert(self, table: str, values_list: List[List[Any]]) -> Cursor:
+        session = self._session
+        self._schema(table)
+        self._begin_write()
+        rows = _get_rows(session.pool, session.metadata, table)
+        indexes = _table_indexes(session.pool, session.metadata, table)
+        new_rows = self._call(_strict_insert_many, session.metadata, table, rows,
+                              values_list, indexes)
+        if not new_rows:
+            return Cursor(rowcount=0)
+        session.pool.log_many(table, _insert_records(new_rows))
+        session._save_metadata()
+        session.result_cache.invalidate(table)
+        self._end_write()
+        return Cursor(rowcount=len(new_rows), lastrowid=new_rows[-1]["ID"])
+
+    def _load(self, table: str, path: str) -> Cursor:
+        """
+        Загрузка файла одной вставкой: все строки проверяются до изменения
+        таблицы, поэтому ошибка в любой строке не оставляет части загрузки.
+        """
+        schema = self._schema(table)
+        try:
+            values_list = list(iter_file_values(path, schema))
+        except (ValueError, OSError) as e:
+            raise DatabaseError(str(e)) from e
+        return self._insert(table, values_list)
+
+    def _modify_many(self, table: str, stmts: List[Dict[str, Any]]) -> Cursor:
+        session = self._session
+        schema = self._schema(table)
+        col_types = {c["name"]: c["type"] for c in schema}
+        # Значения set проверяются для всего пакета до первого изменения
+        for stmt in stmts:
+            for column, value in stmt.get("set", {}).items():
+                if column not in col_types:
+                    raise DatabaseError(f"Неизвестный столбец: {column}")
+                self._call(_validate_value, value, col_types[column])
+        own_tx = self.autocommit and len(stmts) > 1 and not session.in_transaction
+        if own_tx:
+            session.begin()
+        else:
+            self._begin_write()
+        count = 0
+        try:
+            for stmt in stmts:
+                count += self._call(session.apply_modify, stmt, False, True)[2]
+        except Exception:
+            if own_tx:
+                session.rollback()
+            raise
+        if own_tx:
+            session.commit()
+        self._end_write()
+        return Cursor(rowcount=count)
+
+    def _drop_table(self, table: str) -> Cursor:
+        session = self._session
+        self._schema(table)
+        self._begin_write()
+        del session.metadata["tables"][table]
+        session._save_metadata()
+        session.pool.discard(table)
+        session.result_cache.invalidate(table)
+        self._end_write()
+        return Cursor()
+
+    def _session_command(self, stmt: Dict[str, Any]) -> Cursor:
+        """
+        Выполнить команду сеансом и вернуть напечатанные строки. Ошибки ядра
+        и сеанса не печатаются, а выбрасываются (strict_errors).
+        """
+        if stmt["cmd"] in _WRITE_COMMANDS:
+            self._begin_write()
+        buf = io.StringIO()
+        with strict_errors(), contextlib.redirect_stdout(buf):
+            self._call(self._session.execute, stmt)
+        if stmt["cmd"] in _WRITE_COMMANDS:
+            self._end_write()
+        return Cursor(("output",), ((line,) for line in buf.getvalue().splitlines()))
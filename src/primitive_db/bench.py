@@ -0,0 +1,255 @@
+#!/usr/bin/env python3
+"""
+Воспроизводимые замеры основных операций на синтетических таблицах разного
+размера: python -m src.primitive_db.bench [--sizes 1000,100000] [--baseline f].
+"""
+import argparse
+import contextlib
+import csv
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, List, Optional
+
+from src.decorators import set_confirm_policy
+from src.primitive_db.engine import Session
+from src.primitive_db.utils import load_table_data, save_table_data
+
+DEFAULT_SIZES = (1000, 100_000, 1_000_000)
+# Операций каждого точечного вида на один размер таблицы
+DEFAULT_OPS = 200
+# Допустимое ухудшение относительно базовых результатов (доля)
+DEFAULT_THRESHOLD = 0.2
+TABLE = "bench"
+_SCHEMA = "name:str age:int city:str active:bool"
+_CITIES = [f"city{i}" for i in range(50)]
+OPERATIONS = ("ingest", "save", "load", "insert", "point_select",
+              "filtered_select", "update", "delete")
+
+
+def _write_csv(path: str, size: int, rng: random.Random) -> None:
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["name", "age", "city", "active"])
+        for i in range(size):
+            writer.writerow([f"user{i}", rng.randint(18, 90), rng.choice(_CITIES),
+                             "true" if rng.random() < 0.5 else "false"])
+
+
+class _Bench:
+    """Прогон всех операций для одного размера таблицы в пустом каталоге."""
+
+    def __init__(self, size: int, ops: int, seed: int, memory: bool) -> None:
+        self.size = size
+        self.ops = ops
+        self.rng = random.Random(seed)
+        self.memory = memory
+        self.results: Dict[str, Dict[str, Any]] = {}
+        self.session: Optional[Session] = None
+
+    def measure(self, name: str, statements: List[Callable[[], Any]]) -> None:
+        """Выполнить операции по одной, записать пропускную способность,
+        задержки и пиковую память."""
+        latencies = []
+        if self.memory:
+            tracemalloc.reset_peak()
+            base = tracemalloc.get_traced_memory()[0]
+        clock = time.perf_counter
+        total_start = clock()
+        for stmt in statements:
+            start = clock()
+            stmt()
+            latencies.append(clock() - start)
+        total = clock() - total_start
+        res: Dict[str, Any] = {
+            "ops": len(latencies),
+            "seconds": total,
+            "ops_per_sec": len(latencies) / total if total else None,
+            "p50_ms": statistics.median(latencies) * 1000,
+            "p95_ms": _percentile(latencies, 0.95) * 1000,
+            "max_ms": max(latencies) * 1000,
+        }
+        if self.memory:
+            res["peak_bytes"] = tracemalloc.get_traced_memory()[1] - base
+        self.results[name] = res
+
+    def run_sql(self, sql: str) -> Callable[[], Any]:
+        return lambda: self.session.execute_line(sql)
+
+    def point_ids(self) -> List[int]:
+        return [self.rng.randint(1, self.size) for _ in range(self.ops)]
+
+    def run(self) -> Dict[str, Dict[str, Any]]:
+        _write_csv("bench.csv", self.size, self.rng)
+        self.session = Session()
+        self.session.execute_line(f"create_table {TABLE} {_SCHEMA}")
+        self.measure("ingest", [self.run_sql(f"load {TABLE} from bench.csv")])
+        # Снимок целиком (компактация журнала) и холодное чтение с диска
+        rows = self.session.pool.get(TABLE)
+        self.measure("save", [lambda: save_table_data(TABLE, rows)])
+        self.measure("load", [lambda: load_table_data(TABLE)])
+
+        self.measure("insert", [
+            self.run_sql(f'insert into {TABLE} values ("new{i}", {20 + i % 60}, '
+                         f'"{_CITIES[i % len(_CITIES)]}", true)')
+            for i in range(self.ops)
+        ])
+        self.measure("point_select", [
+            self.run_sql(f"select from {TABLE} where ID = {i}")
+            for i in self.point_ids()
+        ])
+        # Выборочное условие без индекса — полный просмотр таблицы
+        scans = max(1, min(self.ops, 10_000_000 // max(self.size, 1) // 10))
+        self.measure("filtered_select", [
+            self.run_sql(f"select from {TABLE} where age = {self.rng.randint(18, 90)} "
+                         f'and city = "{self.rng.choice(_CITIES)}"')
+            for _ in range(scans)
+        ])
+        self.measure("update", [
+            self.run_sql(f"update {TABLE} set age = {self.rng.randint(18, 90)} "
+                         f"where ID = {i}")
+            for i in self.point_ids()
+        ])
+        self.measure("delete", [
+            self.run_sql(f"delete from {TABLE} where ID = {i}")
+            for i in self.point_ids()
+        ])
+        self.session.close()
+        return self.results
+
+
+def _percentile(values: List[float], q: float) -> float:
+    if len(values) < 2:
+        return values[0]
+    return statistics.quantiles(values, n=100, method="inclusive")[round(q * 100) - 1]
+
+
+def run_benchmarks(sizes: List[int], ops: int = DEFAULT_OPS, seed: int = 1,
+                   memory: bool = True) -> Dict[str, Any]:
+    """Прогнать операции для каждого размера, каждый — в своём пустом каталоге."""
+    report: Dict[str, Any] = {
+        "meta": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "started": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "ops": ops,
+            "seed": seed,
+            "memory": memory,
+        },
+        "results": {},
+    }
+    cwd = os.getcwd()
+    set_confirm_policy(True)
+    if memory:
+        tracemalloc.start()
+    try:
+        for size in sizes:
+            with tempfile.TemporaryDirectory(prefix="primitive_db_bench_") as tmp:
+                os.chdir(tmp)
+                try:
+                    with open(os.devnull, "w", encoding="utf-8") as null, \
+                            contextlib.redirect_stdout(null):
+                        results = _Bench(size, ops, seed, memory).run()
+                finally:
+                    os.chdir(cwd)
+            report["results"][str(size)] = results
+            _print_results(size, results)
+    finally:
+        if memory:
+            tracemalloc.stop()
+    return report
+
+
+def _print_results(size: int, results: Dict[str, Dict[str, Any]]) -> None:
+    print(f"Строк: {size}")
+    for name, res in results.items():
+        line = (f"  {name:<16} {res['ops']:>6} оп. {res['ops_per_sec']:>12.1f} оп/с "
+                f"p50 {res['p50_ms']:>9.3f} мс  p95 {res['p95_ms']:>9.3f} мс")
+        if "peak_bytes" in res:
+            line += f"  пик памяти {res['peak_bytes'] / 1024 / 1024:>8.2f} МБ"
+        print(line)
+
+
+def compare(report: Dict[str, Any], baseline: Dict[str, Any],
+            threshold: float = DEFAULT_THRESHOLD) -> List[str]:
+    """
+    Сравнить результаты с базовыми. Регрессия — пропускная способность ниже
+    базовой или пиковая память выше базовой больше чем на threshold.
+    """
+    regressions = []
+    for size, results in report["results"].items():
+        base_results = baseline.get("results", {}).get(size, {})
+        for name, res in results.items():
+            base = base_results.get(name)
+            if base is None:
+                continue
+            if (base.get("ops_per_sec") and res["ops_per_sec"] is not None
+                    and res["ops_per_sec"] < base["ops_per_sec"] * (1 - threshold)):
+                regressions.append(
+                    f"{size} строк, {name}: {res['ops_per_sec']:.1f} оп/с "
+                    f"против {base['ops_per_sec']:.1f} в базовых результатах")
+            if (base.get("peak_bytes") and "peak_bytes" in res
+                    and res["peak_bytes"] > base["peak_bytes"] * (1 + threshold)):
+                regressions.append(
+                    f"{size} строк, {name}: пик памяти {res['peak_bytes']} Б "
+                    f"против {base['peak_bytes']} Б в базовых результатах")
+    return regressions
+
+
+def _parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        prog="bench", description="Замеры производительности основных операций.")
+    parser.add_argument("--sizes", default=",".join(map(str, DEFAULT_SIZES)),
+                        help="размеры таблиц через запятую (по умолчанию "
+                             "1000,100000,1000000)")
+    parser.add_argument("--ops", type=int, default=DEFAULT_OPS,
+                        help="операций каждого точечного вида на размер")
+    parser.add_argument("--seed", type=int, default=1,
+                        help="зерно генератора синтетических данных")
+    parser.add_argument("--no-memory", action="store_true",
+                        help="не замерять пиковую память (tracemalloc замедляет "
+                             "операции)")
+    parser.add_argument("-o", "--output", default="bench_results.json",
+                        help="файл результатов (по умолчанию bench_results.json)")
+    parser.add_argument("--baseline",
+                        help="сравнить с базовыми результатами из файла")
+    parser.add_argument("--save-baseline", metavar="PATH",
+                        help="сохранить результаты как базовые")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="допустимое ухудшение (доля, по умолчанию 0.2)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = _parse_args(argv)
+    sizes = [int(s) for s in args.sizes.split(",") if s.strip()]
+    report = run_benchmarks(sizes, ops=args.ops, seed=args.seed,
+                            memory=not args.no_memory)
+    for path in filter(None, (args.output, args.save_baseline)):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"Результаты записаны в {args.output}.")
+    if args.baseline is None:
+        return 0
+    with open(args.baseline, "r", encoding="utf-8") as f:
+        baseline = json.load(f)
+    if baseline.get("meta", {}).get("memory") != report["meta"]["memory"]:
+        print("Внимание: базовые результаты сняты в другом режиме замера памяти.")
+    regressions = compare(report, baseline, args.threshold)
+    if not regressions:
+        print("Регрессий относительно базовых результатов нет.")
+        return 0
+    print("Регрессии:")
+    for line in regressions:
+        print(f"  {line}")
+    return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
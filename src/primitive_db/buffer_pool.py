@@ -0,0 +1,308 @@
+import logging
+import os
+import sys
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from src.primitive_db import metrics
+from src.primitive_db.columnar import ColumnarTable
+from src.primitive_db.indexes import TableIndexes
+from src.primitive_db.utils import (
+    append_log_many,
+    commit_group,
+    commit_started,
+    compact_if_needed,
+    load_table_data,
+    recover,
+    save_table_changes,
+    table_files,
+)
+
+# Предел памяти под резидентные таблицы по умолчанию
+POOL_MAX_BYTES = 256 * 1024 * 1024
+# Сколько строк берётся для оценки размера таблицы
+_SAMPLE_ROWS = 64
+
+# Ошибки после точки фиксации коммита пишутся в журнал приложения
+logger = logging.getLogger(__name__)
+
+# (mtime_ns, size) по каждому файлу таблицы
+Stamp = Tuple[Tuple[int, int], ...]
+
+
+def _stamp(table_name: str) -> Stamp:
+    res = []
+    for path in table_files(table_name):
+        try:
+            st = os.stat(path)
+            res.append((st.st_mtime_ns, st.st_size))
+        except FileNotFoundError:
+            res.append((0, -1))
+    return tuple(res)
+
+
+def _records_bytes(records: List[Dict[str, Any]], row_bytes: int) -> int:
+    """Грубая оценка объёма записей журнала без их сериализации."""
+    total = 0
+    for r in records:
+        if r["op"] == "insert":
+            # У пустой таблицы средний размер строки ещё не известен
+            total += row_bytes or _row_bytes([r["row"]])
+        else:
+            total += 8 * len(r["ids"]) + sum(
+                sys.getsizeof(v) for v in r.get("set", {}).values())
+    return total
+
+
+def _row_bytes(rows: List[Dict[str, Any]]) -> int:
+    """Средний размер строки таблицы по выборке первых строк."""
+    sample = rows[:_SAMPLE_ROWS]
+    if not sample:
+        return 0
+    sample_bytes = sum(
+        sys.getsizeof(r) + sum(sys.getsizeof(v) for v in r.values()) for r in sample
+    )
+    return sample_bytes // len(sample)
+
+
+class _Entry:
+    __slots__ = ("rows", "stamp", "dirty", "row_bytes", "indexes")
+
+    def __init__(self, rows: List[Dict[str, Any]], stamp: Stamp) -> None:
+        self.rows = rows
+        self.stamp = stamp
+        # Журнал непуст — в памяти есть изменения, не слитые в снимок
+        self.dirty = stamp[-1][1] > 0
+        self.row_bytes = 0
+        self.measure()
+        # Строятся лениво при первом обращении
+        self.indexes: TableIndexes = None
+
+    def measure(self) -> None:
+        """Переоценить средний размер строки по выборке."""
+        if not isinstance(self.rows, ColumnarTable):
+            self.row_bytes = _row_bytes(self.rows)
+
+    @property
+    def nbytes(self) -> int:
+        """Грубая оценка памяти под строки таблицы."""
+        if isinstance(self.rows, ColumnarTable):
+            return self.rows.memory_bytes()
+        size = len(self.rows)
+        if size < _SAMPLE_ROWS:
+            # Маленькие таблицы дешевле переоценить, чем ошибиться в разы
+            self.row_bytes = _row_bytes(self.rows)
+        return sys.getsizeof(self.rows) + self.row_bytes * size
+
+
+class TablePool:
+    """
+    Пул резидентных таблиц: держит разобранные таблицы в памяти между командами,
+    сверяет их с файлами по mtime/size и вытесняет давно не используемые
+    таблицы (LRU), когда суммарный объём превышает max_bytes. Чтения таблиц
+    и индексов (get, indexes) можно выполнять из нескольких потоков.
+    """
+
+    def __init__(self, max_bytes: int = POOL_MAX_BYTES,
+                 defer_writes: bool = False,
+                 schema_of: Optional[Callable[[str], Optional[List[Dict[str, str]]]]]
+                 = None) -> None:
+        self.max_bytes = max_bytes
+        # Объявленная схема таблицы для записи снимков (макет бинарных страниц)
+        self.schema_of = schema_of or (lambda table_name: None)
+        # Отложенная запись: изменения копятся в памяти до commit()
+        self.defer_writes = defer_writes
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._pending: Dict[str, List[Dict[str, Any]]] = {}
+        # Оценка объёма отложенных изменений (для порога фоновой записи)
+        self.pending_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        # Загрузку, вытеснение и построение индексов при параллельных чтениях
+        self._lock = threading.RLock()
+
+    def get(self, table_name: str,
+            columnar_schema: Optional[List[Dict[str, str]]] = None
+            ) -> List[Dict[str, Any]]:
+        """
+        Строки таблицы. Если передана схема columnar_schema, таблица держится
+        в памяти в колоночном представлении (ColumnarTable).
+        """
+        with self._lock:
+            entry = self._entries.get(table_name)
+            stamp = _stamp(table_name)
+            if entry is not None and entry.stamp == stamp:
+                self._entries.move_to_end(table_name)
+                self.hits += 1
+                metrics.inc("table_pool_hits")
+                changed = False
+            else:
+                # Таблица холодная или файлы изменены извне — перечитываем
+                self.misses += 1
+                metrics.inc("table_pool_misses")
+                entry = _Entry(load_table_data(table_name), stamp)
+                self._entries[table_name] = entry
+                self._entries.move_to_end(table_name)
+                changed = True
+            is_columnar = isinstance(entry.rows, ColumnarTable)
+            if columnar_schema is not None and not is_columnar:
+                entry.rows = ColumnarTable.from_rows(columnar_schema, entry.rows)
+                changed = True
+            elif columnar_schema is None and is_columnar:
+                entry.rows = entry.rows.to_rows()
+                changed = True
+            if changed:
+                entry.indexes = None
+                entry.measure()
+                self._evict()
+            return entry.rows
+
+    def stamp(self, table_name: str) -> Stamp:
+        """Отметка файлов таблицы: меняется при любой записи на диск."""
+        return _stamp(table_name)
+
+    def is_resident(self, table_name: str) -> bool:
+        """Таблица в памяти и совпадает с файлами на диске."""
+        entry = self._entries.get(table_name)
+        return entry is not None and entry.stamp == _stamp(table_name)
+
+    def indexes(self, table_name: str, columns: Iterable[str],
+                sorted_columns: Iterable[str] = ()) -> TableIndexes:
+        """Индексы резидентной таблицы, согласованные со списками столбцов."""
+        with self._lock:
+            entry = self._entries.get(table_name)
+            if entry is None:
+                self.get(table_name)
+                entry = self._entries[table_name]
+            rows = entry.rows
+            if entry.indexes is None:
+                entry.indexes = TableIndexes(rows, columns, sorted_columns)
+            else:
+                entry.indexes.ensure(rows, columns, sorted_columns)
+            return entry.indexes
+
+    def log(self, table_name: str, record: Dict[str, Any]) -> None:
+        """Записать изменение резидентной таблицы в её журнал."""
+        self.log_many(table_name, [record])
+
+    def log_many(self, table_name: str, records: List[Dict[str, Any]]) -> None:
+        """Записать пачку изменений резидентной таблицы одной записью в журнал."""
+        entry = self._entries[table_name]
+        if metrics.enabled():
+            metrics.inc("rows_written", sum(
+                1 if r["op"] == "insert" else len(r["ids"]) for r in records))
+        if self.defer_writes:
+            self._pending.setdefault(table_name, []).extend(records)
+            self.pending_bytes += _records_bytes(records, entry.row_bytes)
+            entry.dirty = True
+        else:
+            self._write_log(table_name, entry, records)
+        self._evict()
+
+    def commit(self, meta_path: str,
+               metadata: Optional[Dict[str, Any]] = None) -> None:
+        """
+        Атомарно записать отложенные изменения всех таблиц в их журналы
+        вместе с метаданными (если переданы): после сбоя на диске окажутся
+        либо все изменения, либо ни одного. Исключение означает, что коммит
+        не зафиксирован: изменения остаются отложенными до следующей попытки.
+        Ошибки после фиксации (применение журнала, слияние со снимком) только
+        пишутся в журнал приложения — их доводит до конца следующий коммит.
+        """
+        pending = self._pending
+        if not pending and metadata is None:
+            return
+        # Незавершённый прошлый коммит доводится до конца отдельно: его журнал
+        # не должен выдать новый коммит за зафиксированный
+        recover()
+        applied = True
+        try:
+            commit_group(pending, meta_path, metadata)
+        except Exception:
+            if not commit_started():
+                raise
+            # Журнал коммита уже на диске: изменения зафиксированы,
+            # а применит их следующий коммит или recover() при запуске
+            logger.exception("Коммит зафиксирован, но не применён к файлам")
+            applied = False
+        self._pending = {}
+        self.pending_bytes = 0
+        for table_name in pending:
+            entry = self._entries[table_name]
+            if not applied:
+                # Полная копия таблицы — в памяти, а не в недописанных файлах
+                entry.stamp = _stamp(table_name)
+                continue
+            try:
+                self._committed(table_name, entry)
+            except Exception:
+                logger.exception("Не удалось слить журнал таблицы %s со снимком",
+                                 table_name)
+
+    def rollback(self) -> None:
+        """Отбросить отложенные изменения: затронутые таблицы перечитаются с диска."""
+        for table_name in list(self._pending):
+            self.discard(table_name)
+        self.pending_bytes = 0
+
+    def _write_log(self, table_name: str, entry: _Entry,
+                   records: List[Dict[str, Any]]) -> None:
+        append_log_many(table_name, records)
+        self._committed(table_name, entry)
+
+    def _committed(self, table_name: str, entry: _Entry) -> None:
+        entry.dirty = not compact_if_needed(table_name, entry.rows,
+                                            self.schema_of(table_name))
+        entry.stamp = _stamp(table_name)
+
+    def _save(self, table_name: str, entry: _Entry) -> None:
+        # Снимок включает и отложенные изменения; у сегментированной таблицы
+        # переписываются только сегменты, затронутые журналом и ими
+        save_table_changes(table_name, entry.rows,
+                           self._pending.get(table_name, ()),
+                           self.schema_of(table_name))
+        self._pending.pop(table_name, None)
+        entry.dirty = False
+        entry.stamp = _stamp(table_name)
+
+    def flush(self, table_name: str) -> None:
+        """Слить изменения таблицы в снимок, если они есть."""
+        entry = self._entries.get(table_name)
+        if entry is None:
+            rows = load_table_data(table_name)
+            if _stamp(table_name)[-1][1] > 0:
+                save_table_changes(table_name, rows,
+                                   schema=self.schema_of(table_name))
+            return
+        if entry.dirty:
+            self._save(table_name, entry)
+
+    def flush_all(self) -> None:
+        for table_name in list(self._entries):
+            self.flush(table_name)
+
+    def discard(self, table_name: str) -> None:
+        """Забыть таблицу без сохранения (например, после drop_table)."""
+        self._entries.pop(table_name, None)
+        self._pending.pop(table_name, None)
+
+    def memory_usage(self) -> int:
+        return sum(e.nbytes for e in self._entries.values())
+
+    def _evict(self) -> None:
+        # Последнюю использованную таблицу не вытесняем, даже если она одна
+        # превышает предел. Таблицы с незафиксированными изменениями тоже
+        # остаются в памяти: их снимок нельзя записать до коммита.
+        candidates = [name for name in list(self._entries)[:-1]
+                      if name not in self._pending]
+        usage = self.memory_usage()
+        for table_name in candidates:
+            if usage <= self.max_bytes:
+                break
+            entry = self._entries.pop(table_name)
+            usage -= entry.nbytes
+            if entry.dirty:
+                self._save(table_name, entry)
+            self.evictions += 1
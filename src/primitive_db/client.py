@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Клиент сервера БД. Протокол: клиент отправляет команду одной строкой,
+сервер отвечает одной JSON-строкой {"ok": bool, "output": текст вывода}.
+"""
+import argparse
+import asyncio
+import json
+import socket
+import sys
+from typing import Any, Dict, Optional
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 7654
+
+
+def encode_response(ok: bool, output: str) -> bytes:
+    return (json.dumps({"ok": ok, "output": output}, ensure_ascii=False)
+            + "\n").encode("utf-8")
+
+
+def _decode_response(line: bytes) -> Dict[str, Any]:
+    if not line:
+        raise ConnectionError("Сервер закрыл соединение")
+    return json.loads(line)
+
+
+def _encode_command(command: str) -> bytes:
+    if "\n" in command:
+        raise ValueError("Команда должна занимать одну строку")
+    return (command + "\n").encode("utf-8")
+
+
+class ServerError(Exception):
+    """Сервер отказался выполнять команду (например, begin по сети)."""
+
+
+def _output(response: Dict[str, Any]) -> str:
+    if not response["ok"]:
+        raise ServerError(response["output"])
+    return response["output"]
+
+
+class Client:
+    """Синхронный клиент: одно соединение, команды выполняются по очереди."""
+
+    def __init__(self, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT,
+                 unix_path: Optional[str] = None,
+                 timeout: Optional[float] = None) -> None:
+        if unix_path is not None:
+            self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self._sock.settimeout(timeout)
+            self._sock.connect(unix_path)
+        else:
+            self._sock = socket.create_connection((host, port), timeout=timeout)
+            self._sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self._file = self._sock.makefile("rb")
+
+    def execute(self, command: str) -> str:
+        """Выполнить команду и вернуть напечатанный ею текст."""
+        self._sock.sendall(_encode_command(command))
+        return _output(_decode_response(self._file.readline()))
+
+    def close(self) -> None:
+        self._file.close()
+        self._sock.close()
+
+    def __enter__(self) -> "Client":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+class AsyncClient:
+    """Клиент для asyncio: await client.execute(команда)."""
+
+    def __init__(self, reader: asyncio.StreamReader,
+                 writer: asyncio.StreamWriter) -> None:
+        self._reader = reader
+        self._writer = writer
+
+    @classmethod
+    async def connect(cls, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT,
+                      unix_path: Optional[str] = None) -> "AsyncClient":
+        if unix_path is not None:
+            reader, writer = await asyncio.open_unix_connection(unix_path)
+        else:
+            reader, writer = await asyncio.open_connection(host, port)
+        return cls(reader, writer)
+
+    async def execute(self, command: str) -> str:
+        self._writer.write(_encode_command(command))
+        await self._writer.drain()
+        return _output(_decode_response(await self._reader.readline()))
+
+    async def close(self) -> None:
+        self._writer.close()
+        await self._writer.wait_closed()
+
+
+def _parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(prog="client",
+                                     description="Клиент сервера БД.")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--unix", metavar="PATH", help="Unix-сокет сервера")
+    parser.add_argument("-c", "--command", help="выполнить одну команду и выйти")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> None:
+    args = _parse_args(argv)
+    with Client(args.host, args.port, unix_path=args.unix) as client:
+        if args.command is not None:
+            print(client.execute(args.command), end="")
+            return
+        while True:
+            try:
+                line = input("db> ").strip()
+            except (EOFError, KeyboardInterrupt):
+                print()
+                break
+            if not line:
+                continue
+            if line.lower() == "exit":
+                break
+            try:
+                print(client.execute(line), end="")
+            except ServerError as e:
+                print(f"Ошибка: {e}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,313 @@
+import operator
+from array import array
+from bisect import bisect_left
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
+
+from src.primitive_db.predicates import Node, Predicate, like_regex
+
+try:
+    import numpy as np
+except ImportError:  # NumPy необязателен: без него сканы идут по array
+    np = None
+
+# Позиции установленных битов для каждого значения байта
+_BIT_POSITIONS = [[b for b in range(8) if v >> b & 1] for v in range(256)]
+_OPS = {"=": operator.eq, "!=": operator.ne, "<": operator.lt,
+        "<=": operator.le, ">": operator.gt, ">=": operator.ge}
+
+# Маска строк: массив bool NumPy или (без NumPy) список bool
+Mask = Any
+
+
+def _mask_of(data: array, test: Callable[[Any], bool], vector) -> Mask:
+    """Маска по массиву: vector(view) на NumPy или test по каждому элементу."""
+    if np is not None and data:
+        return vector(np.frombuffer(data, dtype=np.dtype(data.typecode)))
+    return [test(x) for x in data]
+
+
+def _not(mask: Mask) -> Mask:
+    if np is not None and not isinstance(mask, list):
+        return ~mask
+    return [not m for m in mask]
+
+
+def _combine(kind: str, masks: List[Mask]) -> Mask:
+    res = masks[0]
+    for m in masks[1:]:
+        if np is not None and not isinstance(res, list):
+            res = res & m if kind == "and" else res | m
+        elif kind == "and":
+            res = [a and b for a, b in zip(res, m)]
+        else:
+            res = [a or b for a, b in zip(res, m)]
+    return res
+
+
+class _IntColumn:
+    __slots__ = ("data",)
+
+    def __init__(self) -> None:
+        self.data = array("q")
+
+    def append(self, value: int) -> None:
+        try:
+            self.data.append(value)
+        except OverflowError:
+            raise ValueError(f"Значение {value} не помещается в int64") from None
+
+    def get(self, i: int) -> int:
+        return self.data[i]
+
+    def set(self, i: int, value: int) -> None:
+        self.data[i] = value
+
+    def compare(self, op: str, value: int) -> Mask:
+        func = _OPS[op]
+        return _mask_of(self.data, lambda x: func(x, value),
+                        lambda view: func(view, value))
+
+    def isin(self, values: Iterable[int]) -> Mask:
+        values = frozenset(values)
+        return _mask_of(self.data, values.__contains__,
+                        lambda view: np.isin(view, list(values)))
+
+    def take(self, keep: List[int]) -> None:
+        self.data = array("q", map(self.data.__getitem__, keep))
+
+    def nbytes(self) -> int:
+        return self.data.itemsize * len(self.data)
+
+
+class _BoolColumn:
+    """Упакованная битовая карта: 1 бит на значение."""
+
+    __slots__ = ("bits", "size")
+
+    def __init__(self) -> None:
+        self.bits = bytearray()
+        self.size = 0
+
+    def append(self, value: bool) -> None:
+        if self.size & 7 == 0:
+            self.bits.append(0)
+        if value:
+            self.bits[self.size >> 3] |= 1 << (self.size & 7)
+        self.size += 1
+
+    def get(self, i: int) -> bool:
+        return bool(self.bits[i >> 3] >> (i & 7) & 1)
+
+    def set(self, i: int, value: bool) -> None:
+        if value:
+            self.bits[i >> 3] |= 1 << (i & 7)
+        else:
+            self.bits[i >> 3] &= ~(1 << (i & 7)) & 0xFF
+
+    def _values(self) -> Mask:
+        if np is not None and self.bits:
+            bits = np.unpackbits(np.frombuffer(self.bits, dtype=np.uint8),
+                                 bitorder="little")
+            return bits[:self.size].astype(bool)
+        return [self.get(i) for i in range(self.size)]
+
+    def compare(self, op: str, value: bool) -> Mask:
+        values = self._values()
+        if (op == "=") == value:
+            return values
+        return _not(values)
+
+    def isin(self, values: Iterable[bool]) -> Mask:
+        wanted = set(values)
+        if wanted == {True, False}:
+            return [True] * self.size
+        if not wanted:
+            return [False] * self.size
+        return self.compare("=", wanted.pop())
+
+    def take(self, keep: List[int]) -> None:
+        values = [self.get(i) for i in keep]
+        self.bits = bytearray()
+        self.size = 0
+        for v in values:
+            self.append(v)
+
+    def nbytes(self) -> int:
+        return len(self.bits)
+
+
+class _StrColumn:
+    """Словарное кодирование: массив кодов + список различных строк."""
+
+    __slots__ = ("codes", "values", "lookup", "heap_bytes")
+
+    def __init__(self) -> None:
+        self.codes = array("i")
+        self.values: List[str] = []
+        self.lookup: Dict[str, int] = {}
+        self.heap_bytes = 0
+
+    def _code(self, value: str) -> int:
+        code = self.lookup.get(value)
+        if code is None:
+            code = len(self.values)
+            self.values.append(value)
+            self.lookup[value] = code
+            self.heap_bytes += len(value)
+        return code
+
+    def append(self, value: str) -> None:
+        self.codes.append(self._code(value))
+
+    def get(self, i: int) -> str:
+        return self.values[self.codes[i]]
+
+    def set(self, i: int, value: str) -> None:
+        self.codes[i] = self._code(value)
+
+    def _dict_mask(self, test: Callable[[str], bool]) -> Mask:
+        # Условие проверяется один раз на каждую различную строку словаря,
+        # затем результат раскладывается по кодам
+        ok = [test(v) for v in self.values]
+        return _mask_of(self.codes, ok.__getitem__,
+                        lambda view: np.array(ok, dtype=bool)[view])
+
+    def compare(self, op: str, value: str) -> Mask:
+        func = _OPS[op]
+        return self._dict_mask(lambda v: func(v, value))
+
+    def isin(self, values: Iterable[str]) -> Mask:
+        return self._dict_mask(frozenset(values).__contains__)
+
+    def like(self, pattern: str) -> Mask:
+        match = like_regex(pattern).fullmatch
+        return self._dict_mask(lambda v: match(v) is not None)
+
+    def take(self, keep: List[int]) -> None:
+        self.codes = array("i", map(self.codes.__getitem__, keep))
+
+    def nbytes(self) -> int:
+        return self.codes.itemsize * len(self.codes) + self.heap_bytes
+
+
+_COLUMN_TYPES = {"int": _IntColumn, "bool": _BoolColumn, "str": _StrColumn}
+
+
+class ColumnarTable:
+    """
+    Колоночное представление таблицы: каждый столбец лежит в типизированном
+    хранилище по схеме (int -> array('q'), bool -> битовая карта,
+    str -> словарное кодирование). Условия where вычисляются масками по
+    столбцам целиком (векторно, если есть NumPy), а строки-словари
+    собираются только для результата.
+    """
+
+    def __init__(self, schema: List[Dict[str, str]]) -> None:
+        self.names = [c["name"] for c in schema]
+        self.columns = {c["name"]: _COLUMN_TYPES[c["type"]]() for c in schema}
+        self._size = 0
+
+    @classmethod
+    def from_rows(cls, schema: List[Dict[str, str]],
+                  rows: List[Dict[str, Any]]) -> "ColumnarTable":
+        table = cls(schema)
+        for row in rows:
+            table.append(row)
+        return table
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        for i in range(self._size):
+            yield self.row(i)
+
+    def __getitem__(self, idx):
+        if isinstance(idx, slice):
+            return [self.row(i) for i in range(*idx.indices(self._size))]
+        if idx < 0:
+            idx += self._size
+        if not 0 <= idx < self._size:
+            raise IndexError("Индекс строки вне диапазона")
+        return self.row(idx)
+
+    def row(self, i: int) -> Dict[str, Any]:
+        return {name: self.columns[name].get(i) for name in self.names}
+
+    def to_rows(self) -> List[Dict[str, Any]]:
+        return [self.row(i) for i in range(self._size)]
+
+    def append(self, row: Dict[str, Any]) -> None:
+        for name in self.names:
+            self.columns[name].append(row[name])
+        self._size += 1
+
+    def extend(self, rows: Iterable[Dict[str, Any]]) -> None:
+        for row in rows:
+            self.append(row)
+
+    def positions(self, where: Optional[Predicate]) -> List[int]:
+        """Позиции строк, удовлетворяющих where (по возрастанию)."""
+        if where is None:
+            return list(range(self._size))
+        if not self._size:
+            return []
+        if "ID" in where.equalities:
+            # Точечный поиск по ID, остальные условия — по найденной строке
+            return [i for i in self._id_positions(where.equalities["ID"])
+                    if where.matches(self.row(i))]
+        mask = self._mask(where.node)
+        if np is not None and not isinstance(mask, list):
+            return np.flatnonzero(mask).tolist()
+        return [i for i, m in enumerate(mask) if m]
+
+    def _mask(self, node: Node) -> Mask:
+        kind = node[0]
+        if kind == "cmp":
+            return self.columns[node[2]].compare(node[1], node[3])
+        if kind == "in":
+            return self.columns[node[1]].isin(node[2])
+        if kind == "like":
+            return self.columns[node[1]].like(node[2])
+        if kind == "not":
+            return _not(self._mask(node[1]))
+        return _combine(kind, [self._mask(n) for n in node[1]])
+
+    def _id_positions(self, value: Any) -> List[int]:
+        # ID строго возрастают вместе с позицией — ищем бинарным поиском
+        ids = self.columns["ID"].data
+        if not isinstance(value, int):
+            return []
+        i = bisect_left(ids, value)
+        return [i] if i < len(ids) and ids[i] == value else []
+
+    def select(self, where: Optional[Predicate]) -> List[Dict[str, Any]]:
+        return [self.row(i) for i in self.positions(where)]
+
+    def update(self, where: Optional[Predicate],
+               set_clause: Dict[str, Any]) -> List[int]:
+        """Обновить подходящие строки, вернуть их ID."""
+        positions = self.positions(where)
+        for col, val in set_clause.items():
+            column = self.columns[col]
+            for i in positions:
+                column.set(i, val)
+        id_col = self.columns["ID"]
+        return [id_col.get(i) for i in positions]
+
+    def delete(self, where: Optional[Predicate]) -> List[int]:
+        """Удалить подходящие строки, вернуть их ID."""
+        positions = self.positions(where)
+        if not positions:
+            return []
+        id_col = self.columns["ID"]
+        ids = [id_col.get(i) for i in positions]
+        removed = set(positions)
+        keep = [i for i in range(self._size) if i not in removed]
+        for column in self.columns.values():
+            column.take(keep)
+        self._size = len(keep)
+        return ids
+
+    def memory_bytes(self) -> int:
+        return sum(c.nbytes() for c in self.columns.values())
@@ -1,8 +1,38 @@
-from typing import Any, Dict, List, Optional, Tuple
+from bisect import bisect_left, bisect_right
+from operator import add, itemgetter
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
 
 from src.decorators import confirm_action, handle_db_errors, log_time
+from src.primitive_db.columnar import ColumnarTable
+from src.primitive_db.indexes import TableIndexes
+from src.primitive_db.predicates import Predicate, Range
+from src.primitive_db.stats import (
+    allocate_id,
+    init_stats,
+    on_delete,
+    on_insert,
+    on_update,
+    table_stats,
+)
 
 ALLOWED_TYPES = {"int": int, "str": str, "bool": bool}
+# Виды объявляемых индексов: хеш (равенства) и упорядоченный (диапазоны, order by)
+INDEX_KINDS = ("hash", "sorted")
+# Под каким ключом метаданных таблицы хранится список столбцов индексов вида
+_INDEX_KEYS = {"hash": "indexes", "sorted": "sorted_indexes"}
+# Представления таблиц в памяти: список строк-словарей или колоночное
+LAYOUTS = ("rows", "columnar")
+# Агрегатные функции select
+AGGREGATES = ("count", "sum", "min", "max", "avg")
+# Элемент списка select: (функция, столбец); функция None — столбец из group by,
+# столбец None — count(*)
+SelectItem = Tuple[Optional[str], Optional[str]]
+# Как накопленное значение агрегата сливается со значением очередной строки
+# (count берётся из счётчика строк группы, avg = сумма / счётчик)
+_FOLDS = {"sum": add, "avg": add, "min": min, "max": max}
+# Сколько найденных индексом строк удаляется по позициям: каждое удаление
+# сдвигает хвост списка, поэтому большие пачки удаляются одним проходом
+_DELETE_BY_POSITION_MAX = 32
 
 
 def _normalize_columns(columns: List[str]) -> List[Tuple[str, str]]:
@@ -33,8 +63,7 @@ def create_table(metadata: Dict[str, Any], table_name: str,
         metadata["tables"] = {}
 
     if table_name in metadata["tables"]:
-        print(f'Ошибка: Таблица "{table_name}" уже существует.')
-        return metadata
+        raise ValueError(f'Таблица "{table_name}" уже существует')
 
     parsed = _normalize_columns(columns)
     _validate_types(parsed)
@@ -44,7 +73,8 @@ def create_table(metadata: Dict[str, Any], table_name: str,
 
     # Сохраняем структуру как список словарей
     table_structure = [{"name": n, "type": t} for n, t in parsed_with_id]
-    metadata["tables"][table_name] = {"structure": table_structure}
+    metadata["tables"][table_name] = {"structure": table_structure,
+                                      "stats": init_stats(table_structure)}
 
     cols_str = ", ".join(f"{n}:{t}" for n, t in parsed_with_id)
     print(f'Таблица "{table_name}" успешно создана со столбцами: {cols_str}')
@@ -55,14 +85,70 @@ def create_table(metadata: Dict[str, Any], table_name: str,
 @confirm_action('удаление таблицы')
 def drop_table(metadata: Dict[str, Any], table_name: str) -> Dict[str, Any]:
     if "tables" not in metadata or table_name not in metadata["tables"]:
-        print(f'Ошибка: Таблица "{table_name}" не существует.')
-        return metadata
+        raise ValueError(f'Таблица "{table_name}" не существует')
 
     del metadata["tables"][table_name]
     print(f'Таблица "{table_name}" успешно удалена.')
     return metadata
 
 
+def _get_column_type(metadata: Dict[str, Any], table_name: str, column: str) -> str:
+    if "tables" not in metadata or table_name not in metadata["tables"]:
+        raise ValueError(f'Таблица "{table_name}" не существует')
+    for c in metadata["tables"][table_name]["structure"]:
+        if c["name"] == column:
+            return c["type"]
+    raise ValueError(f'Неизвестный столбец: {column}')
+
+
+@handle_db_errors
+def create_index(metadata: Dict[str, Any], table_name: str,
+                 column: str, kind: str = "hash") -> Dict[str, Any]:
+    _get_column_type(metadata, table_name, column)
+    if column == "ID":
+        raise ValueError("Столбец ID индексируется автоматически")
+    if kind not in INDEX_KINDS:
+        raise ValueError(f"Некорректный вид индекса: {kind} "
+                         f"(доступны: {', '.join(INDEX_KINDS)})")
+    indexes = metadata["tables"][table_name].setdefault(_INDEX_KEYS[kind], [])
+    if column in indexes:
+        raise ValueError(f'Индекс по столбцу "{column}" уже существует')
+    indexes.append(column)
+    print(f'Индекс ({kind}) по столбцу "{column}" таблицы "{table_name}" '
+          'успешно создан.')
+    return metadata
+
+
+@handle_db_errors
+def drop_index(metadata: Dict[str, Any], table_name: str,
+               column: str) -> Dict[str, Any]:
+    """Удалить все индексы по столбцу (и хеш, и упорядоченный)."""
+    _get_column_type(metadata, table_name, column)
+    table_meta = metadata["tables"][table_name]
+    dropped = False
+    for key in _INDEX_KEYS.values():
+        indexes = table_meta.get(key, [])
+        if column in indexes:
+            indexes.remove(column)
+            dropped = True
+    if not dropped:
+        raise ValueError(f'Индекса по столбцу "{column}" не существует')
+    print(f'Индекс по столбцу "{column}" таблицы "{table_name}" успешно удалён.')
+    return metadata
+
+
+@handle_db_errors
+def set_layout(metadata: Dict[str, Any], table_name: str,
+               layout: str) -> Dict[str, Any]:
+    _get_schema(metadata, table_name)
+    if layout not in LAYOUTS:
+        raise ValueError(f"Некорректное представление: {layout} "
+                         f"(доступны: {', '.join(LAYOUTS)})")
+    metadata["tables"][table_name]["layout"] = layout
+    print(f'Таблица "{table_name}" хранится в памяти как {layout}.')
+    return metadata
+
+
 @handle_db_errors
 def list_tables(metadata: Dict[str, Any]) -> List[str]:
     if "tables" not in metadata:
@@ -78,10 +164,28 @@ def help_text() -> str:
         "<command> list_tables - показать список всех таблиц\n"
         "<command> drop_table <имя_таблицы> - удалить таблицу\n"
         "<command> insert into <имя_таблицы> values (<v1>, <v2>, ...) - создать запись (без ID)\n"  # NOQA E501
-        "<command> select from <имя_таблицы> [where <столбец> = <значение>] - прочитать записи\n"   # NOQA E501
-        "<command> update <имя_таблицы> set <столбец>=<значение>[, ...] where <столбец>=<значение> - обновить\n"    # NOQA E501
-        "<command> delete from <имя_таблицы> where <столбец> = <значение> - удалить\n"  # NOQA E501
+        "<command> insert into <имя_таблицы> values (<v1>, ...), (<v1>, ...) - создать несколько записей\n"  # NOQA E501
+        "<command> load <имя_таблицы> from <файл.csv|файл.jsonl> - загрузить записи из файла\n"  # NOQA E501
+        "<command> select from <имя_таблицы> [where <условие>] [order by <столбец> [asc|desc]] [limit N] [offset M] - прочитать записи\n"   # NOQA E501
+        "<command> select from <таблица1> join <таблица2> on <таблица1.столбец> = <таблица2.столбец> [where ...] [order by ...] [limit N] - соединение таблиц\n"  # NOQA E501
+        "<command> select <столбец>, count(*)|sum|min|max|avg(<столбец>), ... from <имя_таблицы> [where <условие>] [group by <столбец>, ...] [order by ...] [limit N] - агрегаты\n"  # NOQA E501
+        "<command> update <имя_таблицы> set <столбец>=<значение>[, ...] where <условие> - обновить\n"    # NOQA E501
+        "<command> delete from <имя_таблицы> where <условие> - удалить\n"  # NOQA E501
+        "    условие: <столбец> =|!=|<|<=|>|>= <значение>, <столбец> [not] in (<v1>, ...), <столбец> [not] like <шаблон>; and, or, not, скобки\n"  # NOQA E501
+        "<command> explain [analyze] <select|update|delete> - план выполнения (с analyze — выполнить и замерить)\n"  # NOQA E501
         "<command> info <имя_таблицы> - информация о таблице\n"
+        "<command> create_index <имя_таблицы> <столбец> [hash|sorted] - создать индекс\n"  # NOQA E501
+        "<command> drop_index <имя_таблицы> <столбец> - удалить индекс\n"
+        "<command> set_layout <имя_таблицы> rows|columnar - представление таблицы в памяти\n"  # NOQA E501
+        "<command> convert <имя_таблицы> json|jsonl|binary - перевести таблицу в другой формат хранения\n"  # NOQA E501
+        "<command> compact <имя_таблицы> - слить журнал изменений со снимком таблицы\n"  # NOQA E501
+        "<command> prepare <имя> as <команда с параметрами ?> - подготовить запрос\n"  # NOQA E501
+        "<command> execute <имя> [(<v1>, <v2>, ...)] - выполнить подготовленный запрос\n"  # NOQA E501
+        "<command> begin - начать транзакцию\n"
+        "<command> commit - зафиксировать транзакцию\n"
+        "<command> rollback - отменить транзакцию\n"
+        "<command> format [table|csv|jsonl|tsv] [to <файл>] - формат вывода select\n"  # NOQA E501
+        "<command> sync (или flush) - записать отложенные изменения на диск\n"
         "<command> exit - выход из программы\n"
         "<command> help - справочная информация"
     )
@@ -104,19 +208,14 @@ def _validate_value(py_value: Any, expected_type_name: str) -> None:
     py_type = _type_name_to_type(expected_type_name)
     if not isinstance(py_value, py_type):
         raise ValueError(f"Ожидался тип {expected_type_name}, "
-                         "получено {type(py_value).__name__}")
-
-
-def _next_id(rows: List[Dict[str, Any]]) -> int:
-    if not rows:
-        return 1
-    return max(int(r.get("ID", 0)) for r in rows) + 1
+                         f"получено {type(py_value).__name__}")
 
 
 @handle_db_errors
 @log_time
 def insert(metadata: Dict[str, Any], table_name: str, rows: List[Dict[str, Any]], 
-           values: List[Any]) -> List[Dict[str, Any]]:
+           values: List[Any],
+           indexes: Optional[TableIndexes] = None) -> List[Dict[str, Any]]:
     
     schema = _get_schema(metadata, table_name)  
     # [{'name': 'ID','type':'int'}, {'name':'name','type':'str'}, ...]
@@ -124,42 +223,217 @@ def insert(metadata: Dict[str, Any], table_name: str, rows: List[Dict[str, Any]]
     non_id_cols = [c for c in schema if c["name"] != "ID"]
     if len(values) != len(non_id_cols):
         raise ValueError(f"Ожидалось значений: {len(non_id_cols)}, "
-                         "получено: {len(values)}")
+                         f"получено: {len(values)}")
 
     # Валидация типов по схеме
     for val, col in zip(values, non_id_cols):
         _validate_value(val, col["type"])
 
-    new_row = {"ID": _next_id(rows)}
+    stats = table_stats(metadata, table_name, rows)
+    new_row = {"ID": allocate_id(stats)}
     for val, col in zip(values, non_id_cols):
         new_row[col["name"]] = val
     rows.append(new_row)
+    on_insert(stats, new_row)
+    if indexes is not None:
+        indexes.add_row(new_row)
     return rows
 
 
-def _match_where(row: Dict[str, Any], where: Optional[Dict[str, Any]]) -> bool:
-    if not where:
-        return True
-    for k, v in where.items():
-        if row.get(k) != v:
-            return False
-    return True
+@handle_db_errors
+def insert_many(metadata: Dict[str, Any], table_name: str,
+                rows: List[Dict[str, Any]], values_list: List[List[Any]],
+                indexes: Optional[TableIndexes] = None) -> List[Dict[str, Any]]:
+    """
+    Пакетная вставка: вся пачка проверяется по схеме до изменения таблицы
+    (ошибка в любой строке отменяет пачку), ID выдаются одним диапазоном.
+    Возвращает добавленные строки.
+    """
+    schema = _get_schema(metadata, table_name)
+    non_id_cols = [c for c in schema if c["name"] != "ID"]
+    names = [c["name"] for c in non_id_cols]
+    types = [_type_name_to_type(c["type"]) for c in non_id_cols]
+    width = len(non_id_cols)
+    for n, values in enumerate(values_list, start=1):
+        if len(values) != width:
+            raise ValueError(f"Строка {n}: ожидалось значений: {width}, "
+                             f"получено: {len(values)}")
+        for val, py_type, col in zip(values, types, non_id_cols):
+            if not isinstance(val, py_type):
+                raise ValueError(f'Строка {n}: ожидался тип {col["type"]} '
+                                 f'для столбца {col["name"]}, '
+                                 f"получено {type(val).__name__}")
+
+    stats = table_stats(metadata, table_name, rows)
+    first_id = allocate_id(stats)
+    new_rows = []
+    for row_id, values in enumerate(values_list, start=first_id):
+        new_row = {"ID": row_id}
+        new_row.update(zip(names, values))
+        new_rows.append(new_row)
+        on_insert(stats, new_row)
+    rows.extend(new_rows)
+    if indexes is not None:
+        for new_row in new_rows:
+            indexes.add_row(new_row)
+    return new_rows
+
+
+def _id_slice(rows: List[Dict[str, Any]], rng: Range) -> List[Dict[str, Any]]:
+    """Строки с ID в диапазоне: строки таблицы упорядочены по ID."""
+    lo, lo_incl, hi, hi_incl = rng
+    key = itemgetter("ID")
+    start, stop = 0, len(rows)
+    if lo is not None:
+        start = (bisect_left if lo_incl else bisect_right)(rows, lo, key=key)
+    if hi is not None:
+        stop = (bisect_right if hi_incl else bisect_left)(rows, hi, key=key)
+    return rows[start:stop]
+
+
+def _candidates(rows: List[Dict[str, Any]], where: Predicate,
+                indexes: Optional[TableIndexes]) -> List[Dict[str, Any]]:
+    """
+    Строки, которые нужно проверить по where: найденные индексом
+    по равенствам или диапазону из where или вся таблица.
+    """
+    if indexes is not None:
+        found = indexes.lookup(where.equalities)
+        if found is not None:
+            return found
+    if "ID" in where.ranges and isinstance(rows, list):
+        return _id_slice(rows, where.ranges["ID"])
+    if indexes is not None:
+        found = indexes.range_lookup(where.ranges)
+        if found is not None:
+            return found
+    return rows
+
+
+def _filtered(rows: Iterable[Dict[str, Any]], where: Optional[Predicate],
+              indexes: Optional[TableIndexes]) -> Iterable[Dict[str, Any]]:
+    if where and isinstance(rows, ColumnarTable):
+        return rows.select(where)
+    if where:
+        return filter(where.matches, _candidates(rows, where, indexes))
+    return rows
+
+
+def item_label(item: SelectItem) -> str:
+    """Заголовок столбца результата: age, count(*), sum(age)."""
+    func, column = item
+    if func is None:
+        return column or ""
+    return f"{func}({column or '*'})"
+
+
+def check_aggregate(schema: List[Dict[str, str]], items: Tuple[SelectItem, ...],
+                    group_by: Tuple[str, ...]) -> None:
+    """Проверить список select и group by по схеме таблицы."""
+    col_types = {c["name"]: c["type"] for c in schema}
+    for column in group_by:
+        if column not in col_types:
+            raise ValueError(f"Неизвестный столбец: {column}")
+    for func, column in items:
+        if column is not None and column not in col_types:
+            raise ValueError(f"Неизвестный столбец: {column}")
+        if func is None and column not in group_by:
+            raise ValueError(f"Столбец {column} без агрегатной функции "
+                             "должен входить в group by")
+        if func in ("sum", "avg") and col_types[column] != "int":
+            raise ValueError(f"{func} применим только к столбцам типа int: {column}")
+
+
+def aggregate_states(rows: Iterable[Dict[str, Any]],
+                     items: Tuple[SelectItem, ...],
+                     group_by: Tuple[str, ...]) -> Dict[Any, List[Any]]:
+    """Состояния групп [число строк, накопленные значения] за один проход."""
+    folds = [(i, column, _FOLDS[func])
+             for i, (func, column) in enumerate(items, 1) if func in _FOLDS]
+    width = len(items) + 1
+    key_of = itemgetter(*group_by) if group_by else (lambda row: ())
+    groups: Dict[Any, List[Any]] = {}
+    for row in rows:
+        key = key_of(row)
+        state = groups.get(key)
+        if state is None:
+            state = groups[key] = [0] + [None] * (width - 1)
+        state[0] += 1
+        for i, column, fold in folds:
+            acc = state[i]
+            state[i] = row[column] if acc is None else fold(acc, row[column])
+    return groups
+
+
+def merge_states(groups: Dict[Any, List[Any]], other: Dict[Any, List[Any]],
+                 items: Tuple[SelectItem, ...]) -> None:
+    """Влить состояния групп other (по другой части строк) в groups."""
+    folds = [(i, _FOLDS[func])
+             for i, (func, _) in enumerate(items, 1) if func in _FOLDS]
+    for key, state in other.items():
+        acc = groups.get(key)
+        if acc is None:
+            groups[key] = state
+            continue
+        acc[0] += state[0]
+        for i, fold in folds:
+            if state[i] is not None:
+                acc[i] = state[i] if acc[i] is None else fold(acc[i], state[i])
+
+
+def aggregate_result(groups: Dict[Any, List[Any]], items: Tuple[SelectItem, ...],
+                     group_by: Tuple[str, ...]) -> List[Dict[str, Any]]:
+    """Строки результата агрегации по состояниям групп."""
+    if not group_by and not groups:
+        # Агрегаты по пустой выборке: count = 0, остальные не определены
+        groups[()] = [0] + [None] * len(items)
+
+    result = []
+    for key in sorted(groups) if group_by else groups:
+        state = groups[key]
+        out = dict(zip(group_by, key if len(group_by) > 1 else (key,)))
+        for i, (func, column) in enumerate(items, 1):
+            if func == "count":
+                value = state[0]
+            elif func == "avg":
+                value = state[i] / state[0] if state[0] else None
+            elif func is None:
+                value = out[column]
+            else:
+                value = state[i]
+            out[item_label((func, column))] = value
+        result.append(out)
+    return result
 
 
 @handle_db_errors
 @log_time
-def select(rows: List[Dict[str, Any]], 
-           where: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
-    if where is None:
-        return list(rows)
-    return [r for r in rows if _match_where(r, where)]
+def aggregate(rows: Iterable[Dict[str, Any]],
+              where: Optional[Predicate] = None,
+              indexes: Optional[TableIndexes] = None,
+              items: Tuple[SelectItem, ...] = (),
+              group_by: Tuple[str, ...] = ()) -> List[Dict[str, Any]]:
+    """
+    Хеш-агрегация за один проход: строки читаются потоком, на группу
+    хранится только её состояние [число строк, накопленные значения],
+    поэтому память пропорциональна числу групп, а не строк.
+    """
+    groups = aggregate_states(_filtered(rows, where, indexes), items, group_by)
+    return aggregate_result(groups, items, group_by)
 
 
 @handle_db_errors
 def update(metadata: Dict[str, Any], table_name: str,
            rows: List[Dict[str, Any]],
            set_clause: Dict[str, Any],
-           where: Dict[str, Any]) -> int:
+           where: Predicate,
+           affected: Optional[List[int]] = None,
+           indexes: Optional[TableIndexes] = None,
+           candidates: Optional[Iterable[Dict[str, Any]]] = None) -> int:
+    """
+    Обновить строки, подходящие под where. candidates — строки-кандидаты
+    по пути доступа, выбранному планировщиком (иначе выбирается здесь).
+    """
     schema = _get_schema(metadata, table_name)
     col_types = {c["name"]: c["type"] for c in schema}
     if "ID" in set_clause:
@@ -169,21 +443,95 @@ def update(metadata: Dict[str, Any], table_name: str,
         if k not in col_types:
             raise ValueError(f'Неизвестный столбец: {k}')
         _validate_value(v, col_types[k])
+    if isinstance(rows, ColumnarTable):
+        ids = rows.update(where, set_clause)
+        if affected is not None:
+            affected.extend(ids)
+        if ids:
+            on_update(table_stats(metadata, table_name, rows), set_clause)
+        return len(ids)
+    if candidates is None:
+        candidates = _candidates(rows, where, indexes)
     count = 0
-    for r in rows:
-        if _match_where(r, where):
+    matches = where.matches
+    for r in candidates:
+        if matches(r):
+            old_values = {k: r.get(k) for k in set_clause}
             for k, v in set_clause.items():
                 r[k] = v
+            if indexes is not None:
+                indexes.update_row(r, old_values)
             count += 1
+            if affected is not None:
+                affected.append(r["ID"])
+    if count:
+        on_update(table_stats(metadata, table_name, rows), set_clause)
     return count
 
 
+def _remove_rows(rows: List[Dict[str, Any]], matched: List[Dict[str, Any]],
+                 ids: Set[int]) -> None:
+    """
+    Удалить найденные строки из таблицы, упорядоченной по ID. Немногие
+    строки удаляются по позициям (бинарный поиск по ID), без обхода
+    таблицы; много строк — одним проходом.
+    """
+    if len(matched) > _DELETE_BY_POSITION_MAX:
+        rows[:] = [r for r in rows if r["ID"] not in ids]
+        return
+    key = itemgetter("ID")
+    positions = sorted((bisect_left(rows, r["ID"], key=key) for r in matched),
+                       reverse=True)
+    for i in positions:
+        del rows[i]
+
+
 @handle_db_errors
 @confirm_action('удаление записей')
-def delete(rows: List[Dict[str, Any]], where: Dict[str, Any]) -> int:
+def delete(rows: List[Dict[str, Any]], where: Predicate,
+           affected: Optional[List[int]] = None,
+           indexes: Optional[TableIndexes] = None,
+           stats: Optional[Dict[str, Any]] = None,
+           candidates: Optional[Iterable[Dict[str, Any]]] = None) -> int:
+    if isinstance(rows, ColumnarTable):
+        ids = rows.delete(where)
+        if affected is not None:
+            affected.extend(ids)
+        if stats is not None:
+            on_delete(stats, len(ids))
+        return len(ids)
+    found = candidates
+    if found is None:
+        found = _candidates(rows, where, indexes)
+    if found is not rows:
+        # Кандидатов нашёл индекс — удаляем их, не проверяя всю таблицу
+        matched = list(filter(where.matches, found))
+        if not matched:
+            return 0
+        ids = {r["ID"] for r in matched}
+        if indexes is not None:
+            for r in matched:
+                indexes.remove_row(r)
+        if affected is not None:
+            affected.extend(r["ID"] for r in matched)
+        _remove_rows(rows, matched, ids)
+        if stats is not None:
+            on_delete(stats, len(matched))
+        return len(matched)
     before = len(rows)
-    remaining = [r for r in rows if not _match_where(r, where)]
+    remaining = []
+    matches = where.matches
+    for r in rows:
+        if not matches(r):
+            remaining.append(r)
+        else:
+            if indexes is not None:
+                indexes.remove_row(r)
+            if affected is not None:
+                affected.append(r["ID"])
     deleted = before - len(remaining)
     rows.clear()
     rows.extend(remaining)
+    if stats is not None:
+        on_delete(stats, deleted)
     return deleted
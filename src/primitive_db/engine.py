@@ -1,165 +1,759 @@
-from typing import Any, Dict, List, Optional, Tuple
+import copy
+import inspect
+import logging
+import threading
+import time
+from typing import Any, Dict, Hashable, Iterable, Iterator, List, Optional, Tuple
 
 from prettytable import PrettyTable
 
-from src.decorators import create_cacher
+from src.decorators import errors_are_strict
+from src.primitive_db import metrics, parallel
+from src.primitive_db.buffer_pool import TablePool
 from src.primitive_db.core import (
     _get_schema,
+    create_index,
     create_table,
+    drop_index,
     drop_table,
     help_text,
     list_tables,
+    set_layout,
 )
 from src.primitive_db.core import delete as core_delete
 from src.primitive_db.core import insert as core_insert
-from src.primitive_db.core import select as core_select
+from src.primitive_db.core import insert_many as core_insert_many
 from src.primitive_db.core import update as core_update
-from src.primitive_db.parser import parse_command
+from src.primitive_db.flusher import (
+    DEFAULT_FLUSH_INTERVAL,
+    DEFAULT_MAX_DIRTY_BYTES,
+    Flusher,
+)
+from src.primitive_db.indexes import TableIndexes
+from src.primitive_db.ingest import iter_batches, iter_file_values
+from src.primitive_db.output import FORMATS as OUTPUT_FORMATS
+from src.primitive_db.output import write_rows
+from src.primitive_db.parser import bind_params, parse_command
+from src.primitive_db.planner import Plan, Planner
+from src.primitive_db.predicates import Node, Predicate, compile_where
+from src.primitive_db.result_cache import ResultCache
+from src.primitive_db.stats import distinct_estimate, table_stats
 from src.primitive_db.utils import (
     META_PATH,
+    can_stream,
+    convert_table,
+    iter_table_rows,
     load_metadata,
-    load_table_data,
-    save_metadata,
-    save_table_data,
+    recover,
+    table_segments,
 )
 
+# Сообщения сеанса, не относящиеся к выводу команд (восстановление после сбоя)
+logger = logging.getLogger(__name__)
 
-def _print_table(schema: List[Dict[str, str]], rows: List[Dict[str, Any]]) -> None:
-    headers = [c["name"] for c in schema]
-    t = PrettyTable()
-    t.field_names = headers
-    for r in rows:
-        t.add_row([r.get(h) for h in headers])
-    print(t)
 
+def _print_stats(snapshot: Dict[str, Any]) -> None:
+    """Напечатать метрики: задержки по операциям, счётчики и кэши."""
+    latency = snapshot["latency_seconds"]
+    if latency:
+        t = PrettyTable()
+        t.field_names = ["операция", "вызовов", "p50, мс", "p95, мс", "p99, мс",
+                         "max, мс"]
+        for op, h in latency.items():
+            t.add_row([op, h["count"]] + [f"{h[k] * 1000:.3f}"
+                                          for k in ("p50", "p95", "p99", "max")])
+        print(t)
+    for name, value in snapshot["counters"].items():
+        if not name.endswith(("_hits", "_misses")):
+            print(f"{name}: {value}")
+    for name, cache in snapshot["caches"].items():
+        rate = cache["hit_rate"]
+        rate_text = "—" if rate is None else f"{rate:.1%}"
+        print(f"{name}: попаданий {cache['hits']}, промахов {cache['misses']} "
+              f"({rate_text})")
 
-def run():
-    metadata: Dict[str, Any] = load_metadata(META_PATH)
-    # Кэшер для SELECT
-    select_cache = create_cacher()
 
-    print("База данных запущена. Введите команду. help для справки.")
+def _get_rows(pool: TablePool, metadata: Dict[str, Any],
+              table: str) -> List[Dict[str, Any]]:
+    table_meta = metadata.get("tables", {}).get(table, {})
+    if table_meta.get("layout") == "columnar":
+        return pool.get(table, columnar_schema=table_meta["structure"])
+    return pool.get(table)
+
+
+def _table_indexes(pool: TablePool, metadata: Dict[str, Any],
+                   table: str) -> Optional[TableIndexes]:
+    tables = metadata.get("tables", {})
+    if table not in tables or tables[table].get("layout") == "columnar":
+        # Колоночные таблицы фильтруются сканом столбцов, а не хеш-индексами
+        return None
+    return pool.indexes(table, tables[table].get("indexes", []),
+                        tables[table].get("sorted_indexes", []))
 
-    while True:
-        try:
-            user_input = input(">>> ").strip()
-        except (EOFError, KeyboardInterrupt):
-            print()
-            break
 
-        if not user_input:
+def _print_info(metadata: Dict[str, Any], table: str,
+                stats: Dict[str, Any]) -> None:
+    schema = metadata["tables"][table]["structure"]
+    cols = ", ".join(f'{c["name"]}:{c["type"]}' for c in schema)
+    idx_cols = metadata["tables"][table].get("indexes", []) + [
+        f"{c} (упорядоченный)"
+        for c in metadata["tables"][table].get("sorted_indexes", [])
+    ]
+    print(f"Таблица: {table}")
+    print(f"Столбцы: {cols}")
+    print("Индексы: " + ", ".join(["ID (первичный)"] + idx_cols))
+    print(f'Хранение: {metadata["tables"][table].get("storage", "json")}')
+    segments = table_segments(table)
+    if segments:
+        print(f"Сегментов: {len(segments)} (ID "
+              + ", ".join(f'{s["columns"]["ID"][0]}–{s["columns"]["ID"][1]}'
+                          for s in segments[:8])
+              + (", ..." if len(segments) > 8 else "") + ")")
+    print(f"Количество записей: {stats['rows']}")
+    for c in schema:
+        col_stats = stats["columns"][c["name"]]
+        if col_stats["min"] is None:
             continue
+        print(f'  {c["name"]}: min={col_stats["min"]}, max={col_stats["max"]}, '
+              f'различных ~{distinct_estimate(stats, c["name"])}')
+
+
+# Функции ядра без перехвата ошибок и подтверждения удаления
+_strict_update = inspect.unwrap(core_update)
+_strict_delete = inspect.unwrap(core_delete)
+
+
+def _insert_records(new_rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    return [{"op": "insert", "row": r} for r in new_rows]
+
+
+def bind_prepared(prepared: Dict[str, Tuple[Dict[str, Any], int]],
+                  cmd: Dict[str, Any]) -> Dict[str, Any]:
+    """Подготовленная команда с подставленными параметрами execute."""
+    if cmd["name"] not in prepared:
+        raise ValueError(f'Запрос "{cmd["name"]}" не подготовлен')
+    stmt, nparams = prepared[cmd["name"]]
+    if len(cmd["params"]) != nparams:
+        raise ValueError(f"Ожидалось параметров: {nparams}, "
+                         f'получено: {len(cmd["params"])}')
+    return bind_params(stmt, cmd["params"])
+
+
+class Session:
+    """
+    Сеанс работы с БД: метаданные, резидентные таблицы и кэш select.
+    Изменения каждой команды записываются одним атомарным коммитом (журналы
+    таблиц вместе с метаданными). Внутри begin ... commit коммит один на всю
+    транзакцию; при defer_writes=True изменения копятся в памяти
+    и записываются только в flush() (пакетный режим). При flush_interval > 0
+    изменения тоже копятся в памяти, а записывает их фоновый поток
+    (Flusher) — раз в flush_interval секунд или при превышении
+    max_dirty_bytes; команды выполняются под блокировкой lock.
+    """
+
+    def __init__(self, defer_writes: bool = False, flush_interval: float = 0.0,
+                 max_dirty_bytes: int = DEFAULT_MAX_DIRTY_BYTES) -> None:
+        if recover():
+            logger.warning("Восстановлен коммит, прерванный сбоем.")
+        self.metadata: Dict[str, Any] = load_metadata(META_PATH)
+        # Резидентные таблицы; изменения держатся в пуле до коммита
+        self.pool = TablePool(defer_writes=True, schema_of=self._table_schema)
+        # Кэш результатов SELECT
+        self.result_cache = ResultCache()
+        self.defer_writes = defer_writes
+        self._metadata_dirty = False
+        # Подготовленные команды: имя -> (разобранная команда, число параметров)
+        self.prepared: Dict[str, Tuple[Dict[str, Any], int]] = {}
+        # Формат вывода select и файл (None — stdout)
+        self.output_format = OUTPUT_FORMATS[0]
+        self.output_path: Optional[str] = None
+        # Копия метаданных на момент begin (None — транзакция не открыта)
+        self._tx_metadata: Optional[Dict[str, Any]] = None
+        # Команды и фоновая запись не выполняются одновременно
+        self.lock = threading.RLock()
+        self._flusher: Optional[Flusher] = None
+        if flush_interval > 0:
+            self.defer_writes = True
+            self._flusher = Flusher(self.flush, lambda: self.pool.pending_bytes,
+                                    self.lock, flush_interval, max_dirty_bytes)
+            self._flusher.start()
+
+    @property
+    def in_transaction(self) -> bool:
+        return self._tx_metadata is not None
+
+    def _save_metadata(self) -> None:
+        self._metadata_dirty = True
+
+    def _table_schema(self, table: str) -> Optional[List[Dict[str, str]]]:
+        """Объявленная схема таблицы по текущим метаданным (None — нет таблицы)."""
+        return self.metadata.get("tables", {}).get(table, {}).get("structure")
+
+    def flush(self) -> None:
+        """
+        Записать отложенные журналы таблиц и метаданные одним атомарным
+        коммитом. Внутри открытой транзакции ничего не пишет.
+        """
+        if self.in_transaction:
+            return
+        self.pool.commit(META_PATH, self.metadata if self._metadata_dirty else None)
+        self._metadata_dirty = False
+
+    def begin(self) -> None:
+        if self.in_transaction:
+            raise ValueError("Транзакция уже открыта")
+        # Изменения до begin не должны попасть под rollback
+        self.flush()
+        self._tx_metadata = copy.deepcopy(self.metadata)
+
+    def commit(self) -> None:
+        if not self.in_transaction:
+            raise ValueError("Нет открытой транзакции")
+        self._tx_metadata = None
+        self.flush()
 
-        # Парсинг команд
+    def rollback(self) -> None:
+        if not self.in_transaction:
+            raise ValueError("Нет открытой транзакции")
+        self.metadata = self._tx_metadata
+        self._tx_metadata = None
+        self._metadata_dirty = False
+        self.pool.rollback()
+        self.result_cache.clear()
+
+    def discard_changes(self) -> None:
+        """
+        Отбросить изменения, не записанные на диск (вне транзакции): метаданные
+        и таблицы с отложенными изменениями перечитываются с диска.
+        """
+        self.metadata = load_metadata(META_PATH)
+        self._metadata_dirty = False
+        self.pool.rollback()
+        self.result_cache.clear()
+
+    def close(self) -> None:
+        if self._flusher is not None:
+            # Остаток изменений записывается ниже, уже без фонового потока
+            self._flusher.stop()
+            self._flusher = None
+        if self.in_transaction:
+            self.rollback()
+            print("Транзакция не завершена — изменения отменены.")
+        self.flush()
+        # Сливаем накопленные журналы в снимки перед выходом
+        self.pool.flush_all()
+        metrics.REGISTRY.dump()
+
+    def _bulk_load(self, table: str, path: str) -> int:
+        """
+        Загрузить строки из файла пачками: каждая пачка проверяется и получает ID
+        целиком, а журнал и метаданные записываются один раз в конце.
+        """
+        schema = self.metadata["tables"][table]["structure"]
+        rows = _get_rows(self.pool, self.metadata, table)
+        indexes = _table_indexes(self.pool, self.metadata, table)
+        loaded: List[Dict[str, Any]] = []
+        start = time.monotonic()
+        try:
+            for batch in iter_batches(iter_file_values(path, schema)):
+                new_rows = core_insert_many(self.metadata, table, rows, batch,
+                                            indexes=indexes)
+                if not new_rows:
+                    print("Загрузка прервана.")
+                    break
+                loaded.extend(new_rows)
+                elapsed = time.monotonic() - start
+                print(f"Загружено строк: {len(loaded)} "
+                      f"({len(loaded) / max(elapsed, 1e-9):.0f} строк/с)")
+        except (ValueError, OSError) as e:
+            print(f"Ошибка: {e}")
+            print("Загрузка прервана.")
+        finally:
+            if loaded:
+                self.pool.log_many(table, _insert_records(loaded))
+                self._save_metadata()
+        elapsed = time.monotonic() - start
+        print(f'Загружено записей в таблицу "{table}": {len(loaded)} '
+              f"за {elapsed:.3f} с ({len(loaded) / max(elapsed, 1e-9):.0f} строк/с).")
+        return len(loaded)
+
+    def _compile_where(self, table: str, node: Optional[Node]) -> Optional[Predicate]:
+        """Проверить условие по схеме таблицы и скомпилировать его."""
+        tables = self.metadata.get("tables", {})
+        if node is None:
+            return None
+        if table not in tables:
+            raise ValueError(f'Таблица "{table}" не существует')
+        return compile_where(node, tables[table]["structure"])
+
+    def _scan_source(self, table: str, where: Optional[Predicate] = None
+                     ) -> Tuple[Iterable[Dict[str, Any]], Optional[TableIndexes]]:
+        """Строки таблицы для чтения и её индексы."""
+        if self._streamable(table):
+            # Холодную таблицу читаем с диска построчно, не загружая
+            return iter_table_rows(table, where), None
+        rows = _get_rows(self.pool, self.metadata, table)
+        return rows, _table_indexes(self.pool, self.metadata, table)
+
+    def _streamable(self, table: str) -> bool:
+        return not self.pool.is_resident(table) and can_stream(table)
+
+    def _planner(self) -> Planner:
+        return Planner(self.metadata, self._scan_source, self._streamable)
+
+    @staticmethod
+    def _cache_query(cmd: Dict[str, Any]) -> Optional[Hashable]:
+        """Ключ кэша результата select или None — результат не кэшируется."""
+        if cmd.get("join"):
+            return None
+        if cmd.get("items"):
+            # Результат агрегации мал и дорог — кэшируется и без where
+            return ("aggregate", cmd["items"], cmd.get("group_by", ()),
+                    cmd["where"], cmd.get("order"), cmd.get("limit"),
+                    cmd.get("offset", 0))
+        if cmd.get("where"):
+            # Ключ кэша: дерево условия вместе с порядком и limit/offset
+            return (cmd["where"], cmd.get("order"), cmd.get("limit"),
+                    cmd.get("offset", 0))
+        return None
+
+    def _select(self, plan: Plan, cmd: Dict[str, Any], analyze: bool = False
+                ) -> Tuple[Iterable[Dict[str, Any]], bool]:
+        """Строки результата select и признак того, что он взят из кэша."""
+        query = self._cache_query(cmd)
+        if query is None:
+            return plan.execute(analyze), False
+        # Отметка файлов сбрасывает результаты, если таблицу записали извне
+        table = cmd["table"]
+        return self.result_cache.lookup(table, query,
+                                        lambda: list(plan.execute(analyze)),
+                                        self.pool.stamp(table))
+
+    def _modify(self, cmd: Dict[str, Any], analyze: bool = False) -> Plan:
+        """Выполнить update или delete и напечатать число изменённых записей."""
+        plan, where, count = self.apply_modify(cmd, analyze)
+        table = cmd["table"]
+        single = count == 1 and "ID" in where.equalities
+        if cmd["cmd"] == "update":
+            if single:
+                print(f'Запись с ID={where.equalities["ID"]} '
+                      f'в таблице "{table}" '
+                      'успешно обновлена.')
+            else:
+                print(f"Обновлено записей: {count}.")
+        elif single:
+            print(f'Запись с ID={where.equalities["ID"]} успешно удалена '
+                  f'из таблицы "{table}".')
+        else:
+            print(f"Удалено записей: {count}.")
+        return plan
+
+    def apply_modify(self, cmd: Dict[str, Any], analyze: bool = False,
+                     strict: bool = False) -> Tuple[Plan, Predicate, int]:
+        """
+        Выполнить update или delete путём доступа, выбранным планировщиком;
+        вернуть план, условие и число изменённых записей.
+        При analyze строки-кандидаты читаются через инструментированный план.
+        strict=True — ошибки ядра не перехватываются, удаление
+        не подтверждается (встраиваемый API).
+        """
+        update_rows, delete_rows = ((_strict_update, _strict_delete) if strict
+                                    else (core_update, core_delete))
+        table = cmd["table"]
+        where = self._compile_where(table, cmd["where"])
+        rows = _get_rows(self.pool, self.metadata, table)
+        indexes = _table_indexes(self.pool, self.metadata, table)
+        access, plan = self._planner().modify(cmd, where)
+        if analyze:
+            candidates = list(plan.execute(analyze=True))
+        elif access.kind == "scan" and parallel.eligible(access.estimate):
+            # Полный просмотр большой таблицы — по разделам в процессах
+            candidates = list(parallel.filter_rows(rows, where))
+            metrics.inc("rows_scanned", len(rows))
+        else:
+            candidates = access.candidates(rows, indexes)
+            # Кандидаты — список найденных индексом строк или вся таблица
+            metrics.inc("rows_scanned", len(candidates))
+        ids: List[int] = []
+        if cmd["cmd"] == "update":
+            set_clause = cmd["set"]
+            count = update_rows(self.metadata, table, rows, set_clause, where,
+                                affected=ids, indexes=indexes,
+                                candidates=candidates)
+            record = {"op": "update", "ids": ids, "set": set_clause}
+        else:
+            stats = table_stats(self.metadata, table, rows)
+            count = delete_rows(rows, where, affected=ids, indexes=indexes,
+                                stats=stats, candidates=candidates)
+            record = {"op": "delete", "ids": ids}
+        if ids:
+            self.pool.log(table, record)
+            self._save_metadata()
+        # Сброс кэша таблицы после изменения данных
+        self.result_cache.invalidate(table)
+        return plan, where, count
+
+    def _explain(self, stmt: Dict[str, Any], analyze: bool) -> None:
+        """Напечатать план команды; с analyze — выполнить её и дать счётчики."""
+        if stmt["cmd"] == "execute":
+            stmt = self._bind(stmt)
+        if stmt["cmd"] not in ("select", "update", "delete"):
+            raise ValueError("explain применим к select, update и delete")
+        start = time.perf_counter()
+        cached = False
+        returned = 0
+        if stmt["cmd"] == "select":
+            plan = self._planner().select(stmt)
+            if analyze:
+                result, cached = self._select(plan, stmt, analyze=True)
+                returned = sum(1 for _ in result)
+        elif analyze:
+            plan = self._modify(stmt, analyze=True)
+            returned = plan.root.rows
+        else:
+            where = self._compile_where(stmt["table"], stmt["where"])
+            # Как и при выполнении, план строится по резидентной таблице
+            _get_rows(self.pool, self.metadata, stmt["table"])
+            plan = self._planner().modify(stmt, where)[1]
+        elapsed = time.perf_counter() - start
+        print("\n".join(plan.lines(analyze and not cached)))
+        if not analyze:
+            return
+        if cached:
+            print("Результат взят из кэша: план не выполнялся.")
+        else:
+            print(f"Просмотрено строк: {plan.root.scanned_rows()}, "
+                  f"возвращено: {returned}.")
+        print(f"Время выполнения: {elapsed * 1000:.3f} мс.")
+        cache = self.result_cache
+        if stmt["cmd"] == "select" and self._cache_query(stmt) is not None:
+            print(f"Кэш select: {'попадание' if cached else 'промах'} "
+                  f"(всего попаданий {cache.hits}, промахов {cache.misses}).")
+
+    def _bind(self, cmd: Dict[str, Any]) -> Dict[str, Any]:
+        return bind_prepared(self.prepared, cmd)
+
+    def execute_line(self, line: str) -> bool:
+        """Разобрать и выполнить команду. False — получена команда exit."""
         try:
-            cmd = parse_command(user_input)
+            cmd = parse_command(line)
         except ValueError as ve:
             print(f"Ошибка: {ve}")
-            continue
+            return True
+        return self.execute(cmd)
+
+    def execute(self, cmd: Dict[str, Any],
+                output_format: Optional[str] = None) -> bool:
+        """
+        Выполнить разобранную команду. False — получена команда exit.
+        output_format — формат вывода select только для этой команды
+        (в stdout); формат сеанса не меняется.
+        """
+        with self.lock:
+            result = self._timed(cmd, output_format)
+        if self._flusher is not None:
+            self._flusher.notify()
+        return result
 
-        # Выполнение команд
+    def execute_read(self, cmd: Dict[str, Any],
+                     output_format: Optional[str] = None) -> bool:
+        """
+        Выполнить команду чтения без блокировки сеанса, одновременно с другими
+        чтениями. Вызывающий отвечает за то, что изменения в это время
+        не выполняются (сервер держит блокировку чтения-записи).
+        """
+        return self._timed(cmd, output_format)
+
+    def _timed(self, cmd: Dict[str, Any], output_format: Optional[str]) -> bool:
+        if not metrics.enabled():
+            return self._execute(cmd, output_format)
+        start = time.perf_counter()
         try:
+            return self._execute(cmd, output_format)
+        finally:
+            metrics.observe(cmd["cmd"], time.perf_counter() - start)
+            metrics.REGISTRY.maybe_dump()
+
+    def _check_background_write(self) -> None:
+        """Выдать команде ошибку фоновой записи, случившуюся после прошлой."""
+        error = self._flusher.take_error() if self._flusher is not None else None
+        if error is not None:
+            raise ValueError(f"Фоновая запись не удалась: {error}. "
+                             "Изменения остались в памяти") from error
+
+    def _execute(self, cmd: Dict[str, Any],
+                 output_format: Optional[str] = None) -> bool:
+        try:
+            self._check_background_write()
             ctype = cmd["cmd"]
             match ctype:
                 case "help":
                     print(help_text())
 
                 case "exit":
-                    break
+                    return False
+
+                case "prepare":
+                    self.prepared[cmd["name"]] = (cmd["statement"], cmd["params"])
+                    print(f'Запрос "{cmd["name"]}" подготовлен '
+                          f'(параметров: {cmd["params"]}).')
+
+                case "execute":
+                    return self.execute(self._bind(cmd))
+
+                case "explain":
+                    self._explain(cmd["statement"], cmd["analyze"])
+
+                case "begin":
+                    self.begin()
+                    print("Транзакция начата.")
+
+                case "commit":
+                    self.commit()
+                    print("Транзакция зафиксирована.")
+
+                case "rollback":
+                    self.rollback()
+                    print("Транзакция отменена.")
+
+                case "sync" | "flush":
+                    if self.in_transaction:
+                        print("Внутри транзакции изменения записываются "
+                              "при commit.")
+                    else:
+                        self.flush()
+                        print("Изменения записаны на диск.")
+
+                case "stats":
+                    if cmd["reset"]:
+                        metrics.REGISTRY.reset()
+                        print("Метрики сброшены.")
+                    else:
+                        _print_stats(metrics.REGISTRY.snapshot())
 
                 case "list_tables":
-                    tabs = list_tables(metadata)
+                    tabs = list_tables(self.metadata)
                     print("tables - " + (", ".join(tabs) if tabs else ""))
 
                 case "create_table":
                     table_name = cmd["table"]
                     columns = cmd["columns"]
-                    metadata = create_table(metadata, table_name, columns)
-                    save_metadata(META_PATH, metadata)
+                    self.metadata = create_table(self.metadata, table_name, columns)
+                    self._save_metadata()
 
                 case "drop_table":
                     table_name = cmd["table"]
-                    metadata = drop_table(metadata, table_name)
-                    save_metadata(META_PATH, metadata)
-                    # Сброс кэша на всякий случай
-                    select_cache = create_cacher()
+                    self.metadata = drop_table(self.metadata, table_name)
+                    self._save_metadata()
+                    if table_name not in list_tables(self.metadata):
+                        self.pool.discard(table_name)
+                        self.result_cache.invalidate(table_name)
+
+                case "create_index":
+                    self.metadata = create_index(self.metadata, cmd["table"],
+                                                 cmd["column"], cmd["kind"])
+                    self._save_metadata()
+
+                case "drop_index":
+                    self.metadata = drop_index(self.metadata, cmd["table"],
+                                               cmd["column"])
+                    self._save_metadata()
+
+                case "set_layout":
+                    self.metadata = set_layout(self.metadata, cmd["table"],
+                                               cmd["layout"])
+                    self._save_metadata()
 
                 case "insert":
                     table = cmd["table"]
                     values = cmd["values"]  # уже приведены к Python типам парсером
-                    rows = load_table_data(table)
-                    rows = core_insert(metadata, table, rows, values)
-                    save_table_data(table, rows)
-                    # Сброс кэша после изменения данных
-                    select_cache = create_cacher()
-                    if rows:
+                    rows = _get_rows(self.pool, self.metadata, table)
+                    before = len(rows)
+                    indexes = _table_indexes(self.pool, self.metadata, table)
+                    rows = core_insert(self.metadata, table, rows, values,
+                                       indexes=indexes)
+                    if len(rows) > before:
+                        # Дописываем только новую строку, без перезаписи таблицы
+                        self.pool.log(table, {"op": "insert", "row": rows[-1]})
+                        self._save_metadata()
+                    # Сброс кэша таблицы после изменения данных
+                    self.result_cache.invalidate(table)
+                    if len(rows) > before:
                         new_id = rows[-1]["ID"]
                         print(f'Запись с ID={new_id} успешно добавлена '
-                              'в таблицу "{table}".')
+                              f'в таблицу "{table}".')
 
-                case "select":
+                case "insert_many":
                     table = cmd["table"]
-                    where = cmd.get("where")
-                    rows = load_table_data(table)
-                    schema = _get_schema(metadata, table)
-                    # Ключ кэша: (table, where-как-кортеж)
-                    where_key: Optional[Tuple[Tuple[str, Any], ...]] = None
-                    if where:
-                        where_key = tuple(sorted(where.items()))
-                    key = (table, where_key)
-
-                    def _value():
-                        return core_select(rows, where)
-
-                    result = select_cache(key, _value)
-                    if result:
-                        _print_table(schema, result)
-                    else:
-                        print("Нет данных по заданному запросу.")
+                    rows = _get_rows(self.pool, self.metadata, table)
+                    indexes = _table_indexes(self.pool, self.metadata, table)
+                    new_rows = core_insert_many(self.metadata, table, rows, cmd["rows"],
+                                                indexes=indexes)
+                    if new_rows:
+                        self.pool.log_many(table, _insert_records(new_rows))
+                        self._save_metadata()
+                        self.result_cache.invalidate(table)
+                        print(f"Добавлено записей: {len(new_rows)} "
+                              f'(ID {new_rows[0]["ID"]}-{new_rows[-1]["ID"]}) '
+                              f'в таблицу "{table}".')
 
-                case "update":
+                case "load":
                     table = cmd["table"]
-                    set_clause = cmd["set"]
-                    where = cmd["where"]
-                    rows = load_table_data(table)
-                    changed = core_update(metadata, table, rows, set_clause, where)
-                    save_table_data(table, rows)
-                    # Сброс кэша после изменения данных
-                    select_cache = create_cacher()
-                    if changed == 1 and "ID" in where:
-                        print(f'Запись с ID={where["ID"]} в таблице "{table}" '
-                              'успешно обновлена.')
-                    else:
-                        print(f"Обновлено записей: {changed}.")
+                    if _get_schema(self.metadata, table):
+                        if self._bulk_load(table, cmd["path"]):
+                            self.result_cache.invalidate(table)
 
-                case "delete":
-                    table = cmd["table"]
-                    where = cmd["where"]
-                    rows = load_table_data(table)
-                    deleted = core_delete(rows, where)
-                    save_table_data(table, rows)
-                    # Сброс кэша после изменения данных
-                    select_cache = create_cacher()
-                    if deleted == 1 and "ID" in where:
-                        print(f'Запись с ID={where["ID"]} успешно удалена '
-                              'из таблицы "{table}".')
-                    else:
-                        print(f"Удалено записей: {deleted}.")
+                case "select":
+                    plan = self._planner().select(cmd)
+                    result, cached = self._select(plan, cmd)
+                    headers = [c["name"] for c in plan.columns]
+                    fmt, path = ((self.output_format, self.output_path)
+                                 if output_format is None else (output_format, None))
+                    returned = write_rows(fmt, headers, result, path)
+                    metrics.inc("rows_returned", returned)
+                    if path is not None:
+                        print(f"Записано строк: {returned} в файл "
+                              f"{path} ({fmt}).")
+                    elif fmt == "table":
+                        # В csv/tsv/jsonl пояснения испортили бы вывод
+                        if not returned:
+                            print("Нет данных по заданному запросу.")
+                        if cached:
+                            print("(результат из кэша)")
+
+                case "format":
+                    if cmd["format"] is not None:
+                        self.output_format = cmd["format"]
+                        self.output_path = cmd["path"]
+                    target = self.output_path or "stdout"
+                    print(f"Формат вывода select: {self.output_format}, "
+                          f"вывод: {target}.")
+
+                case "update" | "delete":
+                    self._modify(cmd)
 
                 case "info":
                     table = cmd["table"]
-                    schema = _get_schema(metadata, table)
-                    rows = load_table_data(table)
-                    cols = ", ".join(f'{c["name"]}:{c["type"]}' for c in schema)
-                    print(f"Таблица: {table}")
-                    print(f"Столбцы: {cols}")
-                    print(f"Количество записей: {len(rows)}")
+                    if _get_schema(self.metadata, table):
+                        table_meta = self.metadata["tables"][table]
+                        if "stats" not in table_meta:
+                            # Таблица создана до появления статистики
+                            rows = _get_rows(self.pool, self.metadata, table)
+                            table_stats(self.metadata, table, rows)
+                            self._save_metadata()
+                        _print_info(self.metadata, table, table_meta["stats"])
+                        cache = self.result_cache
+                        print(f"Кэш select: результатов таблицы "
+                              f"{cache.table_entries(table)}, версия "
+                              f"{cache.version(table)}; всего попаданий "
+                              f"{cache.hits}, промахов {cache.misses}, "
+                              f"вытеснений {cache.evictions}")
+
+                case "compact":
+                    table = cmd["table"]
+                    self._check_no_transaction(ctype)
+                    if _get_schema(self.metadata, table):
+                        self.pool.flush(table)
+                        print(f'Журнал таблицы "{table}" слит со снимком.')
+
+                case "convert":
+                    table = cmd["table"]
+                    self._check_no_transaction(ctype)
+                    if _get_schema(self.metadata, table):
+                        # Сначала сливаем резидентную копию, затем переписываем файл
+                        self.pool.flush(table)
+                        convert_table(table, cmd["backend"],
+                                      self._table_schema(table))
+                        self.pool.discard(table)
+                        self.metadata["tables"][table]["storage"] = cmd["backend"]
+                        self._save_metadata()
+                        print(f'Таблица "{table}" переведена в формат '
+                              f'{cmd["backend"]}.')
 
                 case _:
                     print("Неизвестная команда. help для справки.")
 
         except ValueError as ve:
+            if errors_are_strict():
+                raise
             # На случай ошибок парсинга/валидации вне ядра
             print(f"Ошибка: {ve}")
+        if not self.defer_writes:
+            # Вне транзакции каждая команда фиксируется сразу
+            self.flush()
+        return True
+
+    def _check_no_transaction(self, command: str) -> None:
+        # Эти команды переписывают файлы таблицы целиком, минуя коммит
+        if self.in_transaction:
+            raise ValueError(f"Команда {command} недоступна внутри транзакции")
+
 
+def run(flush_interval: float = DEFAULT_FLUSH_INTERVAL,
+        max_dirty_bytes: int = DEFAULT_MAX_DIRTY_BYTES):
+    """
+    Интерактивный режим. Изменения записываются фоновым потоком
+    (flush_interval = 0 — сразу после каждой команды); при exit, EOF
+    и Ctrl+C сеанс закрывается, и всё накопленное записывается на диск.
+    """
+    session = Session(flush_interval=flush_interval,
+                      max_dirty_bytes=max_dirty_bytes)
+    print("База данных запущена. Введите команду. help для справки.")
+
+    try:
+        while True:
+            try:
+                user_input = input(">>> ").strip()
+            except (EOFError, KeyboardInterrupt):
+                print()
+                break
+
+            if not user_input:
+                continue
+
+            if not session.execute_line(user_input):
+                break
+    finally:
+        session.close()
     print("Выход из программы.")
+
+
+def _script_statements(lines: Iterable[str]) -> Iterator[str]:
+    """Команды скрипта: по одной на строку, пустые строки и комментарии (--, #)
+    пропускаются, завершающая ; отбрасывается."""
+    for line in lines:
+        stmt = line.strip()
+        if not stmt or stmt.startswith(("--", "#")):
+            continue
+        if stmt.endswith(";"):
+            stmt = stmt[:-1].rstrip()
+        if stmt:
+            yield stmt
+
+
+def run_script(lines: Iterable[str], flush_every: int = 0,
+               quiet: bool = False, output_format: str = OUTPUT_FORMATS[0],
+               output_path: Optional[str] = None) -> None:
+    """
+    Пакетный режим: команды выполняются подряд без приглашения, а журналы
+    таблиц и метаданные записываются раз в flush_every команд
+    (0 — один раз в конце). Результаты select выводятся в формате
+    output_format (в файл output_path или в stdout).
+    """
+    session = Session(defer_writes=True)
+    session.output_format = output_format
+    session.output_path = output_path
+    executed = 0
+    start = time.monotonic()
+    try:
+        for stmt in _script_statements(lines):
+            if not session.execute_line(stmt):
+                break
+            executed += 1
+            if flush_every and executed % flush_every == 0:
+                # Внутри транзакции flush() ничего не пишет до commit
+                session.flush()
+    finally:
+        session.close()
+    if not quiet:
+        print(f"Выполнено команд: {executed} за {time.monotonic() - start:.3f} с.")
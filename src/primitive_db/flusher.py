@@ -0,0 +1,72 @@
+import logging
+import threading
+from typing import Callable, Optional
+
+# Ошибки фоновой записи пишутся в журнал приложения
+logger = logging.getLogger(__name__)
+# Интервал фоновой записи по умолчанию, секунд
+DEFAULT_FLUSH_INTERVAL = 1.0
+# Объём отложенных изменений, при котором запись начинается не дожидаясь
+# интервала
+DEFAULT_MAX_DIRTY_BYTES = 8 * 1024 * 1024
+
+
+class Flusher:
+    """
+    Фоновая запись (write-behind): поток раз в interval секунд или как только
+    отложенных изменений набирается больше max_dirty_bytes вызывает flush()
+    под блокировкой lock — все изменения, накопившиеся с прошлой записи,
+    ложатся на диск одним групповым коммитом. Команды не ждут диска,
+    пока их выполнение не совпало с записью. Ошибка записи сохраняется
+    в error и выдаётся следующей команде (take_error).
+    """
+
+    def __init__(self, flush: Callable[[], None], dirty_bytes: Callable[[], int],
+                 lock: threading.RLock,
+                 interval: float = DEFAULT_FLUSH_INTERVAL,
+                 max_dirty_bytes: int = DEFAULT_MAX_DIRTY_BYTES) -> None:
+        self._flush = flush
+        self._dirty_bytes = dirty_bytes
+        self._lock = lock
+        self.interval = interval
+        self.max_dirty_bytes = max_dirty_bytes
+        self._wake = threading.Event()
+        self._stopping = False
+        # Ошибка последней фоновой записи, ещё не выданная команде
+        self.error: Optional[Exception] = None
+        self._thread = threading.Thread(target=self._run, name="flusher",
+                                        daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def notify(self) -> None:
+        """Вызывается после каждой команды: разбудить поток при превышении порога."""
+        if self._dirty_bytes() >= self.max_dirty_bytes:
+            self._wake.set()
+
+    def _run(self) -> None:
+        while not self._stopping:
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            if self._stopping:
+                break
+            try:
+                with self._lock:
+                    self._flush()
+            except Exception as e:
+                # Изменения остаются в памяти: запись повторится в следующий раз
+                logger.exception("Ошибка фоновой записи")
+                self.error = e
+
+    def take_error(self) -> Optional[Exception]:
+        """Ошибка фоновой записи (если была); после вызова сбрасывается."""
+        error, self.error = self.error, None
+        return error
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        """Остановить поток; последнюю запись делает вызывающий (close)."""
+        self._stopping = True
+        self._wake.set()
+        if self._thread.is_alive():
+            self._thread.join(timeout)
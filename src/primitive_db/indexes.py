@@ -0,0 +1,174 @@
+from bisect import bisect_left, insort
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from src.primitive_db.predicates import Range
+
+# Больше любого ID: ключ (value, _AFTER) стоит после всех пар с этим value
+_AFTER = float("inf")
+
+
+class SortedIndex:
+    """
+    Упорядоченный индекс столбца: отсортированный список пар (значение, ID).
+    Поиск границ диапазона — бинарный (bisect), обход — в порядке значений
+    без сортировки.
+    """
+
+    __slots__ = ("keys",)
+
+    def __init__(self, column: str, rows: Iterable[Dict[str, Any]]) -> None:
+        self.keys: List[Tuple[Any, int]] = sorted(
+            (row[column], row["ID"]) for row in rows
+        )
+
+    def add(self, value: Any, row_id: int) -> None:
+        insort(self.keys, (value, row_id))
+
+    def remove(self, value: Any, row_id: int) -> None:
+        i = bisect_left(self.keys, (value, row_id))
+        if i < len(self.keys) and self.keys[i] == (value, row_id):
+            del self.keys[i]
+
+    def ids(self, rng: Optional[Range] = None,
+            descending: bool = False) -> Iterator[int]:
+        """ID строк в порядке значений (в пределах диапазона rng)."""
+        keys = self.keys
+        start, stop = 0, len(keys)
+        if rng is not None:
+            lo, lo_incl, hi, hi_incl = rng
+            if lo is not None:
+                start = bisect_left(keys, (lo,) if lo_incl else (lo, _AFTER))
+            if hi is not None:
+                stop = bisect_left(keys, (hi, _AFTER) if hi_incl else (hi,))
+        positions = range(start, stop)
+        if descending:
+            positions = reversed(positions)
+        for i in positions:
+            yield keys[i][1]
+
+
+class TableIndexes:
+    """
+    Индексы резидентной таблицы: неявный первичный индекс ID -> строка,
+    хеш-индексы значение -> множество ID и упорядоченные индексы
+    по объявленным столбцам.
+    """
+
+    def __init__(self, rows: Iterable[Dict[str, Any]],
+                 columns: Iterable[str] = (),
+                 sorted_columns: Iterable[str] = ()) -> None:
+        self.pk: Dict[int, Dict[str, Any]] = {}
+        self.hash: Dict[str, Dict[Any, Set[int]]] = {
+            c: {} for c in columns if c != "ID"
+        }
+        # Упорядоченные индексы строятся после первичного одной сортировкой
+        self.sorted: Dict[str, SortedIndex] = {}
+        for row in rows:
+            self.add_row(row)
+        self.sorted = {
+            c: SortedIndex(c, self.pk.values()) for c in sorted_columns if c != "ID"
+        }
+
+    def ensure(self, rows: Iterable[Dict[str, Any]], columns: Iterable[str],
+               sorted_columns: Iterable[str] = ()) -> None:
+        """Привести набор индексов к спискам столбцов из метаданных."""
+        wanted_sorted = {c for c in sorted_columns if c != "ID"}
+        for col in list(self.sorted):
+            if col not in wanted_sorted:
+                del self.sorted[col]
+        for col in wanted_sorted - set(self.sorted):
+            self.sorted[col] = SortedIndex(col, self.pk.values())
+
+        wanted = {c for c in columns if c != "ID"}
+        for col in list(self.hash):
+            if col not in wanted:
+                del self.hash[col]
+        missing = [c for c in wanted if c not in self.hash]
+        if not missing:
+            return
+        for col in missing:
+            self.hash[col] = {}
+        for row in rows:
+            for col in missing:
+                self.hash[col].setdefault(row.get(col), set()).add(row["ID"])
+
+    def add_row(self, row: Dict[str, Any]) -> None:
+        row_id = row["ID"]
+        self.pk[row_id] = row
+        for col, idx in self.hash.items():
+            idx.setdefault(row.get(col), set()).add(row_id)
+        for col, sidx in self.sorted.items():
+            sidx.add(row[col], row_id)
+
+    def remove_row(self, row: Dict[str, Any]) -> None:
+        row_id = row["ID"]
+        self.pk.pop(row_id, None)
+        for col, idx in self.hash.items():
+            self._discard(idx, row.get(col), row_id)
+        for col, sidx in self.sorted.items():
+            sidx.remove(row[col], row_id)
+
+    def update_row(self, row: Dict[str, Any], old_values: Dict[str, Any]) -> None:
+        """Перенести ID строки между корзинами по изменившимся столбцам."""
+        row_id = row["ID"]
+        for col, old in old_values.items():
+            if row.get(col) == old:
+                continue
+            idx = self.hash.get(col)
+            if idx is not None:
+                self._discard(idx, old, row_id)
+                idx.setdefault(row.get(col), set()).add(row_id)
+            sidx = self.sorted.get(col)
+            if sidx is not None:
+                sidx.remove(old, row_id)
+                sidx.add(row[col], row_id)
+
+    def lookup(self, where: Optional[Dict[str, Any]]) -> Optional[List[Dict[str, Any]]]:
+        """
+        Кандидаты по индексированным равенствам из where в порядке ID
+        (он совпадает с порядком строк в таблице). None — индекс не применим.
+        Остальные условия where вызывающий проверяет сам.
+        """
+        if not where:
+            return None
+        ids: Optional[Set[int]] = None
+        for col, val in where.items():
+            if col == "ID":
+                found = {val} if val in self.pk else set()
+            elif col in self.hash:
+                found = self.hash[col].get(val, set())
+            else:
+                continue
+            ids = found if ids is None else ids & found
+        if ids is None:
+            return None
+        return [self.pk[i] for i in sorted(ids)]
+
+    def range_lookup(self, ranges: Dict[str, Range]
+                     ) -> Optional[List[Dict[str, Any]]]:
+        """
+        Кандидаты по диапазону столбца с упорядоченным индексом, в порядке ID.
+        None — ни для одного диапазона нет упорядоченного индекса.
+        """
+        for col, rng in ranges.items():
+            sidx = self.sorted.get(col)
+            if sidx is not None:
+                return [self.pk[i] for i in sorted(sidx.ids(rng))]
+        return None
+
+    def ordered(self, column: str, rng: Optional[Range] = None,
+                descending: bool = False) -> Optional[Iterator[Dict[str, Any]]]:
+        """Строки в порядке столбца по упорядоченному индексу или None."""
+        sidx = self.sorted.get(column)
+        if sidx is None:
+            return None
+        return map(self.pk.__getitem__, sidx.ids(rng, descending))
+
+    @staticmethod
+    def _discard(idx: Dict[Any, Set[int]], value: Any, row_id: int) -> None:
+        bucket = idx.get(value)
+        if bucket is None:
+            return
+        bucket.discard(row_id)
+        if not bucket:
+            del idx[value]
@@ -0,0 +1,101 @@
+import csv
+import json
+import os
+from typing import Any, Callable, Dict, Iterator, List
+
+# Строк в одной пачке при загрузке файла
+BATCH_ROWS = 10000
+
+_BOOL_VALUES = {"true": True, "1": True, "false": False, "0": False}
+
+
+def _to_bool(text: str) -> bool:
+    try:
+        return _BOOL_VALUES[text.strip().lower()]
+    except KeyError:
+        raise ValueError(f"Некорректное логическое значение: {text}") from None
+
+
+# Преобразование текста ячейки CSV к типу столбца
+_CSV_CONVERTERS: Dict[str, Callable[[str], Any]] = {
+    "int": lambda text: int(text.strip()),
+    "bool": _to_bool,
+    "str": lambda text: text,
+}
+
+
+def _user_columns(schema: List[Dict[str, str]]) -> List[Dict[str, str]]:
+    return [c for c in schema if c["name"] != "ID"]
+
+
+def _iter_csv(path: str, schema: List[Dict[str, str]]) -> Iterator[List[Any]]:
+    columns = _user_columns(schema)
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        reader = csv.reader(f)
+        header = next(reader, None)
+        if header is None:
+            return
+        header = [h.strip() for h in header]
+        unknown = set(header) - {c["name"] for c in schema}
+        if unknown:
+            raise ValueError(f"Неизвестные столбцы в файле: {', '.join(unknown)}")
+        try:
+            positions = [header.index(c["name"]) for c in columns]
+        except ValueError:
+            raise ValueError("В заголовке файла должны быть все столбцы, "
+                             "кроме ID") from None
+        converters = [_CSV_CONVERTERS[c["type"]] for c in columns]
+        for line_no, record in enumerate(reader, start=2):
+            if not record:
+                continue
+            try:
+                yield [conv(record[pos]) for pos, conv in zip(positions, converters)]
+            except (ValueError, IndexError) as e:
+                raise ValueError(f"Строка {line_no} файла: {e}") from None
+
+
+def _iter_jsonl(path: str, schema: List[Dict[str, str]]) -> Iterator[List[Any]]:
+    names = [c["name"] for c in _user_columns(schema)]
+    with open(path, "r", encoding="utf-8") as f:
+        for line_no, line in enumerate(f, start=1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError as e:
+                raise ValueError(f"Строка {line_no} файла: {e}") from None
+            if isinstance(record, list):
+                yield record
+            elif isinstance(record, dict):
+                try:
+                    yield [record[n] for n in names]
+                except KeyError as e:
+                    raise ValueError(f"Строка {line_no} файла: нет столбца "
+                                     f"{e.args[0]}") from None
+            else:
+                raise ValueError(f"Строка {line_no} файла: ожидался объект "
+                                 "или список значений")
+
+
+def iter_file_values(path: str,
+                     schema: List[Dict[str, str]]) -> Iterator[List[Any]]:
+    """Значения строк (без ID, в порядке схемы) из файла CSV или JSON Lines."""
+    ext = os.path.splitext(path)[1].lower()
+    if ext == ".csv":
+        return _iter_csv(path, schema)
+    if ext in (".jsonl", ".ndjson"):
+        return _iter_jsonl(path, schema)
+    raise ValueError(f"Неподдерживаемый формат файла: {path} (ожидался .csv "
+                     "или .jsonl)")
+
+
+def iter_batches(values: Iterator[List[Any]],
+                 size: int = BATCH_ROWS) -> Iterator[List[List[Any]]]:
+    batch: List[List[Any]] = []
+    for v in values:
+        batch.append(v)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
@@ -0,0 +1,144 @@
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Set,
+    Tuple,
+)
+
+from src.primitive_db.core import SelectItem
+from src.primitive_db.predicates import Node
+
+# Столбцы результата соединения называются <таблица>.<столбец>
+SEP = "."
+
+
+def qualified_schema(table_name: str,
+                     schema: List[Dict[str, str]]) -> List[Dict[str, str]]:
+    return [{"name": f"{table_name}{SEP}{c['name']}", "type": c["type"]}
+            for c in schema]
+
+
+class JoinColumns:
+    """
+    Разрешение имён столбцов соединения: столбец без имени таблицы
+    допускается, если он есть только в одной из таблиц.
+    """
+
+    def __init__(self, tables: List[Tuple[str, List[Dict[str, str]]]]) -> None:
+        self.schema: List[Dict[str, str]] = []
+        self._owners: Dict[str, List[str]] = {}
+        for table_name, schema in tables:
+            self.schema.extend(qualified_schema(table_name, schema))
+            for c in schema:
+                self._owners.setdefault(c["name"], []).append(table_name)
+        self.names = {c["name"] for c in self.schema}
+
+    def resolve(self, column: str) -> str:
+        if SEP in column:
+            if column not in self.names:
+                raise ValueError(f"Неизвестный столбец: {column}")
+            return column
+        owners = self._owners.get(column)
+        if not owners:
+            raise ValueError(f"Неизвестный столбец: {column}")
+        if len(owners) > 1:
+            raise ValueError(f"Неоднозначный столбец {column}: укажите таблицу "
+                             f"({', '.join(f'{t}{SEP}{column}' for t in owners)})")
+        return f"{owners[0]}{SEP}{column}"
+
+    def resolve_item(self, item: SelectItem) -> SelectItem:
+        func, column = item
+        return func, None if column is None else self.resolve(column)
+
+
+def map_columns(node: Node, func: Callable[[str], str]) -> Node:
+    """Дерево условия с заменёнными func именами столбцов."""
+    kind = node[0]
+    if kind == "cmp":
+        return ("cmp", node[1], func(node[2]), node[3])
+    if kind in ("in", "like"):
+        return (kind, func(node[1]), node[2])
+    if kind == "not":
+        return ("not", map_columns(node[1], func))
+    return (kind, tuple(map_columns(n, func) for n in node[1]))
+
+
+def _node_tables(node: Node) -> Set[str]:
+    """Таблицы, столбцы которых встречаются в (уже разрешённом) условии."""
+    kind = node[0]
+    if kind == "cmp":
+        return {node[2].split(SEP, 1)[0]}
+    if kind in ("in", "like"):
+        return {node[1].split(SEP, 1)[0]}
+    if kind == "not":
+        return _node_tables(node[1])
+    res: Set[str] = set()
+    for n in node[1]:
+        res |= _node_tables(n)
+    return res
+
+
+def _and(nodes: List[Node]) -> Optional[Node]:
+    if not nodes:
+        return None
+    return nodes[0] if len(nodes) == 1 else ("and", tuple(nodes))
+
+
+def split_where(node: Optional[Node], tables: Tuple[str, str]
+                ) -> Tuple[Dict[str, Optional[Node]], Optional[Node]]:
+    """
+    Разделить условие на части по таблицам и остаток. Условия верхнего
+    уровня (через and), касающиеся одной таблицы, проверяются до соединения
+    (и могут использовать её индексы) — имена их столбцов возвращаются без
+    имени таблицы. Остаток проверяется на соединённых строках.
+    """
+    parts: Dict[str, List[Node]] = {t: [] for t in tables}
+    rest: List[Node] = []
+    if node is not None:
+        for child in (node[1] if node[0] == "and" else (node,)):
+            owners = _node_tables(child)
+            if len(owners) == 1:
+                owner = owners.pop()
+                parts[owner].append(
+                    map_columns(child, lambda c: c.split(SEP, 1)[1]))
+            else:
+                rest.append(child)
+    return {t: _and(nodes) for t, nodes in parts.items()}, _and(rest)
+
+
+def _prefixed(table_name: str, row: Dict[str, Any]) -> Dict[str, Any]:
+    return {f"{table_name}{SEP}{k}": v for k, v in row.items()}
+
+
+def hash_join(build: Iterable[Dict[str, Any]], probe: Iterable[Dict[str, Any]],
+              build_table: str, probe_table: str,
+              build_key: str, probe_key: str,
+              build_first: bool) -> Iterator[Dict[str, Any]]:
+    """
+    Соединение по равенству за O(|build| + |probe|): строки build (меньшей
+    таблицы) раскладываются в хеш-таблицу по ключу, строки probe читаются
+    потоком, и для каждой выдаются пары с совпадающим ключом. Строки
+    результата идут в порядке probe; build_first — столбцы build идут первыми.
+    """
+    buckets: Dict[Any, List[Dict[str, Any]]] = {}
+    for row in build:
+        key = row[build_key]
+        if key is not None:
+            buckets.setdefault(key, []).append(_prefixed(build_table, row))
+    if not buckets:
+        return
+    for row in probe:
+        matched = buckets.get(row[probe_key])
+        if matched is None:
+            continue
+        probe_row = _prefixed(probe_table, row)
+        for build_row in matched:
+            if build_first:
+                yield {**build_row, **probe_row}
+            else:
+                yield {**probe_row, **build_row}
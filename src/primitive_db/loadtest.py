@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Нагрузочный тест сервера: несколько соединений одновременно выполняют
+точечные select и insert, в конце печатаются пропускная способность
+и задержки. python -m src.primitive_db.loadtest [--connections 16].
+"""
+import argparse
+import asyncio
+import random
+import time
+from typing import Dict, List, Optional
+
+from src.primitive_db.client import DEFAULT_HOST, DEFAULT_PORT, AsyncClient
+
+TABLE = "loadtest"
+_SCHEMA = "name:str age:int"
+# Строк в одной команде insert при заполнении таблицы
+_SEED_BATCH = 1000
+
+
+def _percentile(sorted_values: List[float], q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(q * len(sorted_values)))]
+
+
+class _LoadTest:
+    def __init__(self, args: argparse.Namespace) -> None:
+        self.args = args
+        self.latencies: Dict[str, List[float]] = {"select": [], "insert": [],
+                                                   "connect": []}
+        self.errors = 0
+
+    async def connect(self) -> AsyncClient:
+        args = self.args
+        return await AsyncClient.connect(args.host, args.port, unix_path=args.unix)
+
+    async def prepare_table(self) -> None:
+        client = await self.connect()
+        try:
+            if TABLE in await client.execute("list_tables"):
+                await client.execute(f"drop_table {TABLE}")
+            await client.execute(f"create_table {TABLE} {_SCHEMA}")
+            for start in range(0, self.args.rows, _SEED_BATCH):
+                count = min(_SEED_BATCH, self.args.rows - start)
+                values = ", ".join(f'("user{start + i}", {18 + i % 70})'
+                                   for i in range(count))
+                await client.execute(f"insert into {TABLE} values {values}")
+        finally:
+            await client.close()
+
+    async def worker(self, seed: int, deadline: float) -> None:
+        rng = random.Random(seed)
+        clock = time.perf_counter
+        start = clock()
+        client = await self.connect()
+        await client.execute(f"prepare point as select from {TABLE} where ID = ?")
+        self.latencies["connect"].append(clock() - start)
+        try:
+            while clock() < deadline:
+                if rng.random() < self.args.write_ratio:
+                    op = "insert"
+                    stmt = (f'insert into {TABLE} values '
+                            f'("w{seed}", {rng.randint(18, 90)})')
+                else:
+                    op = "select"
+                    stmt = f"execute point({rng.randint(1, self.args.rows)})"
+                start = clock()
+                output = await client.execute(stmt)
+                self.latencies[op].append(clock() - start)
+                if output.startswith("Ошибка"):
+                    self.errors += 1
+        finally:
+            await client.close()
+
+    async def run(self) -> None:
+        args = self.args
+        await self.prepare_table()
+        start = time.perf_counter()
+        deadline = start + args.duration
+        await asyncio.gather(*(self.worker(args.seed + i, deadline)
+                               for i in range(args.connections)))
+        self.report(time.perf_counter() - start)
+
+    def report(self, elapsed: float) -> None:
+        total = sum(len(v) for op, v in self.latencies.items() if op != "connect")
+        print(f"Соединений: {self.args.connections}, длительность: {elapsed:.2f} с, "
+              f"команд: {total} ({total / elapsed:.1f} в секунду), "
+              f"ошибок: {self.errors}.")
+        for op, values in self.latencies.items():
+            if not values:
+                continue
+            values.sort()
+            print(f"  {op:<8} {len(values):>8}  "
+                  f"p50 {_percentile(values, 0.5) * 1000:>8.3f} мс  "
+                  f"p95 {_percentile(values, 0.95) * 1000:>8.3f} мс  "
+                  f"p99 {_percentile(values, 0.99) * 1000:>8.3f} мс")
+
+
+def _parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        prog="loadtest", description="Нагрузочный тест сервера БД.")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--unix", metavar="PATH", help="Unix-сокет сервера")
+    parser.add_argument("--connections", type=int, default=16,
+                        help="одновременных соединений (по умолчанию 16)")
+    parser.add_argument("--duration", type=float, default=10.0,
+                        help="длительность в секундах (по умолчанию 10)")
+    parser.add_argument("--write-ratio", type=float, default=0.1,
+                        help="доля insert среди команд (по умолчанию 0.1)")
+    parser.add_argument("--rows", type=int, default=10_000,
+                        help=f"строк в таблице {TABLE} перед тестом "
+                             "(по умолчанию 10000)")
+    parser.add_argument("--seed", type=int, default=1)
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    asyncio.run(_LoadTest(_parse_args(argv)).run())
+
+
+if __name__ == "__main__":
+    main()
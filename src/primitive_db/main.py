@@ -1,9 +1,111 @@
 #!/usr/bin/env python3
-from src.primitive_db.engine import run
+import argparse
+import sys
+
+from src.decorators import set_confirm_policy
+from src.primitive_db import metrics, parallel
+from src.primitive_db.client import DEFAULT_HOST, DEFAULT_PORT
+from src.primitive_db.engine import run, run_script
+from src.primitive_db.flusher import DEFAULT_FLUSH_INTERVAL, DEFAULT_MAX_DIRTY_BYTES
+from src.primitive_db.output import FORMATS as OUTPUT_FORMATS
+from src.primitive_db.server import run_server
+
+_CONFIRM_CHOICES = {"yes": True, "no": False, "ask": None}
+
+
+def _parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        prog="project", description="Минималистичная файловая СУБД.")
+    parser.add_argument("-f", "--file",
+                        help="выполнить команды из файла (пакетный режим)")
+    parser.add_argument("--confirm", choices=list(_CONFIRM_CHOICES), default="yes",
+                        help="подтверждения в пакетном режиме (по умолчанию yes)")
+    parser.add_argument("-q", "--quiet", action="store_true",
+                        help="не печатать итоги выполнения скрипта")
+    parser.add_argument("--flush-every", type=int, default=0, metavar="N",
+                        help="записывать изменения на диск каждые N команд "
+                             "(по умолчанию — один раз в конце)")
+    parser.add_argument("--no-metrics", action="store_true",
+                        help="не собирать метрики (команда stats будет пустой)")
+    parser.add_argument("--metrics-file", metavar="PATH",
+                        help="записывать метрики в файл")
+    parser.add_argument("--metrics-format", choices=metrics.FORMATS, default="json",
+                        help="формат файла метрик (по умолчанию json)")
+    parser.add_argument("--metrics-interval", type=float, default=60.0,
+                        metavar="SECONDS",
+                        help="интервал записи файла метрик (по умолчанию 60 с; "
+                             "0 — только при выходе)")
+    parser.add_argument("--format", choices=OUTPUT_FORMATS, default=OUTPUT_FORMATS[0],
+                        help="пакетный режим: формат вывода select "
+                             "(по умолчанию table)")
+    parser.add_argument("-o", "--output", metavar="PATH",
+                        help="пакетный режим: записывать результаты select "
+                             "в файл PATH вместо stdout")
+    parser.add_argument("--flush-interval", type=float,
+                        default=DEFAULT_FLUSH_INTERVAL, metavar="SECONDS",
+                        help="интерактивный режим: записывать изменения "
+                             "в фоне раз в SECONDS секунд (по умолчанию "
+                             f"{DEFAULT_FLUSH_INTERVAL:g}; 0 — после каждой "
+                             "команды)")
+    parser.add_argument("--max-dirty-bytes", type=int,
+                        default=DEFAULT_MAX_DIRTY_BYTES, metavar="BYTES",
+                        help="начинать фоновую запись, не дожидаясь интервала, "
+                             "когда изменений накопилось больше BYTES "
+                             "(по умолчанию 8 МБ)")
+    parser.add_argument("--workers", type=int, metavar="N",
+                        help="процессов для параллельного просмотра больших "
+                             "таблиц (по умолчанию 1 — отключён); работает, "
+                             "пока у процесса нет других потоков: в пакетном "
+                             "режиме или с --flush-interval 0")
+    parser.add_argument("--parallel-threshold", type=int, metavar="ROWS",
+                        default=parallel.DEFAULT_THRESHOLD,
+                        help="просматривать параллельно таблицы от ROWS строк "
+                             f"(по умолчанию {parallel.DEFAULT_THRESHOLD})")
+    parser.add_argument("--serve", action="store_true",
+                        help="запустить сервер вместо интерактивного режима")
+    parser.add_argument("--host", default=DEFAULT_HOST,
+                        help=f"адрес сервера (по умолчанию {DEFAULT_HOST})")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT,
+                        help=f"порт сервера (по умолчанию {DEFAULT_PORT})")
+    parser.add_argument("--unix", metavar="PATH",
+                        help="слушать Unix-сокет вместо TCP")
+    parser.add_argument("--commit-delay", type=float, default=0.0, metavar="MS",
+                        help="пауза перед групповым коммитом в миллисекундах "
+                             "(по умолчанию 0)")
+    args = parser.parse_args(argv)
+    if args.workers is not None and args.workers < 1:
+        parser.error("--workers должно быть не меньше 1")
+    if args.parallel_threshold < 0:
+        parser.error("--parallel-threshold не может быть отрицательным")
+    if args.serve and args.confirm == "ask":
+        parser.error("--confirm ask недоступно в режиме сервера")
+    return args
 
 
 def main():
-    run()
+    args = _parse_args()
+    metrics.set_enabled(not args.no_metrics)
+    parallel.configure(args.workers, args.parallel_threshold)
+    if args.metrics_file is not None:
+        metrics.configure_dump(args.metrics_file, args.metrics_format,
+                               args.metrics_interval)
+    if args.serve:
+        run_server(args.host, args.port, unix_path=args.unix,
+                   commit_delay=args.commit_delay / 1000,
+                   confirm=_CONFIRM_CHOICES[args.confirm])
+        return
+    # Скрипт из файла или команды через конвейер — пакетный режим
+    if args.file is None and sys.stdin.isatty():
+        run(args.flush_interval, args.max_dirty_bytes)
+        return
+    set_confirm_policy(_CONFIRM_CHOICES[args.confirm])
+    if args.file is not None:
+        with open(args.file, "r", encoding="utf-8") as f:
+            run_script(f, flush_every=args.flush_every, quiet=args.quiet,
+                       output_format=args.format, output_path=args.output)
+    else:
+        run_script(sys.stdin, flush_every=args.flush_every, quiet=args.quiet,
+                   output_format=args.format, output_path=args.output)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,207 @@
+import json
+import math
+import os
+import threading
+import time
+from typing import Any, Dict, Iterable, Iterator, List, Optional, TypeVar
+
+# Гистограммы задержек: 4 корзины на каждое удвоение, начиная с 1 мкс
+# (погрешность квантилей — не больше ~19%), последняя корзина — всё,
+# что дольше ~17 минут
+_BASE_SECONDS = 1e-6
+_BUCKETS_PER_DOUBLING = 4
+_BUCKETS = 30 * _BUCKETS_PER_DOUBLING
+QUANTILES = (0.5, 0.95, 0.99)
+# Форматы файла метрик
+FORMATS = ("json", "prometheus")
+# Пары счётчиков попаданий/промахов, для которых считается доля попаданий
+_CACHES = ("result_cache", "table_pool", "parse_cache")
+_PROM_PREFIX = "primitive_db"
+
+T = TypeVar("T")
+
+
+class Histogram:
+    """Гистограмма задержек с логарифмическими корзинами."""
+
+    __slots__ = ("counts", "count", "total", "max")
+
+    def __init__(self) -> None:
+        self.counts = [0] * _BUCKETS
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds: float) -> None:
+        if seconds > _BASE_SECONDS:
+            i = int(math.log2(seconds / _BASE_SECONDS) * _BUCKETS_PER_DOUBLING)
+            self.counts[min(i, _BUCKETS - 1)] += 1
+        else:
+            self.counts[0] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def quantile(self, q: float) -> float:
+        """Верхняя граница корзины, в которую попадает квантиль q."""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            seen += n
+            if seen >= rank and n:
+                upper = _BASE_SECONDS * 2 ** ((i + 1) / _BUCKETS_PER_DOUBLING)
+                return min(upper, self.max)
+        return self.max
+
+    def summary(self) -> Dict[str, float]:
+        res = {"count": self.count, "sum": self.total, "max": self.max}
+        for q in QUANTILES:
+            res[f"p{round(q * 100)}"] = self.quantile(q)
+        return res
+
+
+class Registry:
+    """
+    Реестр метрик процесса: счётчики и гистограммы задержек по операциям.
+    Выключенный реестр ничего не считает: вызывающий код проверяет
+    enabled до того, как замерять время.
+    """
+
+    def __init__(self) -> None:
+        self.enabled = True
+        self.counters: Dict[str, int] = {}
+        self.latency: Dict[str, Histogram] = {}
+        self.started = time.time()
+        # Периодическая запись в файл: путь, формат, интервал в секундах
+        self.dump_path: Optional[str] = None
+        self.dump_format = "json"
+        self.dump_interval = 0.0
+        self._last_dump = time.monotonic()
+        # Счётчики обновляются и из потоков чтения сервера
+        self.lock = threading.Lock()
+        self._dump_lock = threading.Lock()
+
+    def reset(self) -> None:
+        with self.lock:
+            self.counters.clear()
+            self.latency.clear()
+            self.started = time.time()
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self.lock:
+            return self._snapshot()
+
+    def _snapshot(self) -> Dict[str, Any]:
+        caches = {}
+        for name in _CACHES:
+            hits = self.counters.get(f"{name}_hits", 0)
+            misses = self.counters.get(f"{name}_misses", 0)
+            total = hits + misses
+            caches[name] = {"hits": hits, "misses": misses,
+                            "hit_rate": hits / total if total else None}
+        return {
+            "uptime_seconds": time.time() - self.started,
+            "counters": dict(sorted(self.counters.items())),
+            "latency_seconds": {op: h.summary()
+                                for op, h in sorted(self.latency.items())},
+            "caches": caches,
+        }
+
+    def to_json(self) -> str:
+        return json.dumps(self.snapshot(), ensure_ascii=False, indent=2)
+
+    def to_prometheus(self) -> str:
+        with self.lock:
+            return self._to_prometheus()
+
+    def _to_prometheus(self) -> str:
+        lines: List[str] = []
+        for name, value in sorted(self.counters.items()):
+            metric = f"{_PROM_PREFIX}_{name}_total"
+            lines.append(f"# TYPE {metric} counter")
+            lines.append(f"{metric} {value}")
+        metric = f"{_PROM_PREFIX}_latency_seconds"
+        if self.latency:
+            lines.append(f"# TYPE {metric} summary")
+        for op, hist in sorted(self.latency.items()):
+            for q in QUANTILES:
+                lines.append(f'{metric}{{op="{op}",quantile="{q}"}} '
+                             f"{hist.quantile(q):.9f}")
+            lines.append(f'{metric}_sum{{op="{op}"}} {hist.total:.9f}')
+            lines.append(f'{metric}_count{{op="{op}"}} {hist.count}')
+        return "\n".join(lines) + "\n"
+
+    def dump(self, path: Optional[str] = None, fmt: Optional[str] = None) -> None:
+        """Записать метрики в файл (атомарно: временный файл и rename)."""
+        path = path or self.dump_path
+        fmt = fmt or self.dump_format
+        if path is None:
+            return
+        if fmt not in FORMATS:
+            raise ValueError(f"Неизвестный формат метрик: {fmt} "
+                             f"(доступны: {', '.join(FORMATS)})")
+        text = self.to_json() if fmt == "json" else self.to_prometheus()
+        tmp_path = path + ".tmp"
+        # Временный файл общий: два потока не должны писать его одновременно
+        with self._dump_lock:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write(text)
+            os.replace(tmp_path, path)
+            self._last_dump = time.monotonic()
+
+    def maybe_dump(self) -> None:
+        """Записать метрики, если с прошлой записи прошёл интервал."""
+        if (self.dump_path is not None and self.dump_interval > 0
+                and time.monotonic() - self._last_dump >= self.dump_interval):
+            self.dump()
+
+
+REGISTRY = Registry()
+
+
+def enabled() -> bool:
+    return REGISTRY.enabled
+
+
+def set_enabled(flag: bool) -> None:
+    REGISTRY.enabled = flag
+
+
+def configure_dump(path: Optional[str], fmt: str = "json",
+                   interval: float = 0.0) -> None:
+    """Писать метрики в path раз в interval секунд (0 — только при выходе)."""
+    if fmt not in FORMATS:
+        raise ValueError(f"Неизвестный формат метрик: {fmt}")
+    REGISTRY.dump_path = path
+    REGISTRY.dump_format = fmt
+    REGISTRY.dump_interval = interval
+
+
+def inc(name: str, value: int = 1) -> None:
+    if REGISTRY.enabled:
+        with REGISTRY.lock:
+            counters = REGISTRY.counters
+            counters[name] = counters.get(name, 0) + value
+
+
+def observe(op: str, seconds: float) -> None:
+    if REGISTRY.enabled:
+        with REGISTRY.lock:
+            hist = REGISTRY.latency.get(op)
+            if hist is None:
+                hist = REGISTRY.latency[op] = Histogram()
+            hist.observe(seconds)
+
+
+def counted(name: str, rows: Iterable[T]) -> Iterator[T]:
+    """Поток rows с подсчётом прочитанных элементов в счётчике name."""
+    n = 0
+    try:
+        for row in rows:
+            n += 1
+            yield row
+    finally:
+        inc(name, n)
@@ -0,0 +1,129 @@
+"""
+Вывод результатов select. Строки пишутся потоком, порциями по мере
+получения, и никогда не собираются целиком: таблица (table) печатается
+страницами с шириной столбцов по уже выведенным строкам, csv, tsv и jsonl
+пишутся пакетами строк в stdout или в файл с буферизацией.
+"""
+import csv
+import json
+import sys
+from typing import IO, Any, Dict, Iterable, List, Optional
+
+# Форматы вывода, первый — по умолчанию
+FORMATS = ("table", "csv", "jsonl", "tsv")
+# Строк на странице table: ширина столбцов считается по странице
+PAGE_ROWS = 100
+# Строк в одном пакете записи csv/tsv/jsonl
+WRITE_BATCH_ROWS = 1000
+# Буфер файла вывода
+FILE_BUFFER_BYTES = 1024 * 1024
+
+
+def _border(widths: List[int]) -> str:
+    return "+" + "+".join("-" * (w + 2) for w in widths) + "+\n"
+
+
+def _line(cells: List[str], widths: List[int]) -> str:
+    return "|" + "|".join(f" {c.center(w)} " for c, w in zip(cells, widths)) + "|\n"
+
+
+def write_table(out: IO[str], headers: List[str],
+                rows: Iterable[Dict[str, Any]]) -> int:
+    """
+    Таблица с рамкой по страницам из PAGE_ROWS строк. Ширина столбцов
+    берётся по заголовкам и строкам первой страницы и только растёт,
+    если на следующей странице встретится более длинное значение.
+    """
+    widths = [len(h) for h in headers]
+    page: List[List[str]] = []
+    written = 0
+
+    def flush_page() -> None:
+        for cells in page:
+            for i, c in enumerate(cells):
+                if len(c) > widths[i]:
+                    widths[i] = len(c)
+        border = _border(widths)
+        parts = [border, _line(headers, widths), border]
+        parts.extend(_line(cells, widths) for cells in page)
+        parts.append(border)
+        out.write("".join(parts))
+        page.clear()
+
+    for r in rows:
+        page.append([str(r.get(h)) for h in headers])
+        written += 1
+        if len(page) == PAGE_ROWS:
+            flush_page()
+    if page:
+        flush_page()
+    return written
+
+
+def _write_delimited(out: IO[str], headers: List[str],
+                     rows: Iterable[Dict[str, Any]], dialect: str) -> int:
+    writer = csv.writer(out, dialect=dialect, lineterminator="\n")
+    writer.writerow(headers)
+    batch: List[List[Any]] = []
+    written = 0
+    for r in rows:
+        batch.append([r.get(h) for h in headers])
+        if len(batch) == WRITE_BATCH_ROWS:
+            writer.writerows(batch)
+            written += len(batch)
+            batch.clear()
+    writer.writerows(batch)
+    return written + len(batch)
+
+
+def write_csv(out: IO[str], headers: List[str],
+              rows: Iterable[Dict[str, Any]]) -> int:
+    return _write_delimited(out, headers, rows, "excel")
+
+
+def write_tsv(out: IO[str], headers: List[str],
+              rows: Iterable[Dict[str, Any]]) -> int:
+    return _write_delimited(out, headers, rows, "excel-tab")
+
+
+def write_jsonl(out: IO[str], headers: List[str],
+                rows: Iterable[Dict[str, Any]]) -> int:
+    """Одна строка JSON на запись, ключи в порядке столбцов результата."""
+    encode = json.JSONEncoder(ensure_ascii=False).encode
+    batch: List[str] = []
+    written = 0
+    for r in rows:
+        batch.append(encode({h: r.get(h) for h in headers}))
+        batch.append("\n")
+        if len(batch) == 2 * WRITE_BATCH_ROWS:
+            out.write("".join(batch))
+            written += WRITE_BATCH_ROWS
+            batch.clear()
+    out.write("".join(batch))
+    return written + len(batch) // 2
+
+
+_WRITERS = {
+    "table": write_table,
+    "csv": write_csv,
+    "jsonl": write_jsonl,
+    "tsv": write_tsv,
+}
+
+
+def write_rows(fmt: str, headers: List[str], rows: Iterable[Dict[str, Any]],
+               path: Optional[str] = None) -> int:
+    """
+    Записать строки в формате fmt в файл path (перезаписывается)
+    или в stdout; вернуть число строк.
+    """
+    write = _WRITERS.get(fmt)
+    if write is None:
+        raise ValueError(f"Неизвестный формат вывода: {fmt}. "
+                         f"Допустимы: {', '.join(FORMATS)}")
+    if path is None:
+        # sys.stdout читается при вызове: сервер подменяет его на время команды
+        return write(sys.stdout, headers, rows)
+    with open(path, "w", encoding="utf-8", newline="",
+              buffering=FILE_BUFFER_BYTES) as f:
+        return write(f, headers, rows)
@@ -0,0 +1,128 @@
+"""
+Параллельный просмотр больших таблиц. Строки делятся на непрерывные
+разделы, каждый раздел проверяется условием where (и агрегируется)
+в отдельном процессе ProcessPoolExecutor. Процессы создаются через fork
+на время одного запроса и видят таблицу и скомпилированное условие
+в унаследованной памяти (copy-on-write), поэтому строки не сериализуются:
+обратно передаются только номера подходящих строк или состояния групп
+агрегатов. Результаты собираются в порядке разделов — порядок строк тот же,
+что у обычного просмотра. Режим включается явно (configure, --workers)
+и работает только в однопоточном процессе: fork при работающем потоке
+(фоновая запись, сервер) может унаследовать чужую захваченную блокировку.
+"""
+import gc
+import multiprocessing
+import threading
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from src.primitive_db.core import (
+    SelectItem,
+    aggregate_result,
+    aggregate_states,
+    merge_states,
+)
+from src.primitive_db.predicates import Predicate
+
+# Таблицы меньше этого числа строк просматриваются в одном процессе:
+# запуск процессов дороже выигрыша
+DEFAULT_THRESHOLD = 200_000
+# Разделов на процесс: мелкие разделы выравнивают нагрузку процессов
+_PARTITIONS_PER_WORKER = 4
+
+# По умолчанию один процесс: параллельный просмотр включается явно
+_workers = 1
+_threshold = DEFAULT_THRESHOLD
+# Данные текущего запроса; процессы получают их при fork
+_task: Optional[Tuple[Any, ...]] = None
+
+
+def configure(workers: Optional[int] = None,
+              threshold: Optional[int] = None) -> None:
+    """Число процессов (1 — только последовательный просмотр) и порог строк."""
+    global _workers, _threshold
+    if workers is not None:
+        if workers < 1:
+            raise ValueError("Число процессов должно быть не меньше 1")
+        _workers = workers
+    if threshold is not None:
+        if threshold < 0:
+            raise ValueError("Порог строк не может быть отрицательным")
+        _threshold = threshold
+
+
+def workers() -> int:
+    return _workers
+
+
+def eligible(rows: int) -> bool:
+    """
+    Просматривать ли таблицу из rows строк параллельно. При других потоках
+    процесса fork небезопасен — тогда просмотр последовательный.
+    """
+    return (_workers > 1 and rows >= _threshold
+            and threading.active_count() == 1
+            and "fork" in multiprocessing.get_all_start_methods())
+
+
+def _partitions(size: int) -> List[Tuple[int, int]]:
+    parts = min(size, _workers * _PARTITIONS_PER_WORKER) or 1
+    step = -(-size // parts)
+    return [(start, min(start + step, size)) for start in range(0, size, step)]
+
+
+def _run(task: Tuple[Any, ...], func: Callable[[Tuple[int, int]], Any],
+         size: int) -> Iterator[Any]:
+    """Результаты func по разделам в порядке разделов."""
+    global _task
+    parts = _partitions(size)
+    # gc в процессах отключён: обход всех объектов копировал бы страницы памяти
+    pool = ProcessPoolExecutor(max_workers=min(_workers, len(parts)),
+                               mp_context=multiprocessing.get_context("fork"),
+                               initializer=gc.disable)
+    try:
+        _task = task
+        try:
+            # При fork все процессы запускаются при первой отправке задачи
+            results = pool.map(func, parts)
+        finally:
+            _task = None
+        yield from results
+    finally:
+        pool.shutdown(wait=True, cancel_futures=True)
+
+
+def _match_partition(bounds: Tuple[int, int]) -> array:
+    rows, where = _task
+    matches = where.matches
+    start, stop = bounds
+    return array("q", (i for i in range(start, stop) if matches(rows[i])))
+
+
+def filter_rows(rows: List[Dict[str, Any]],
+                where: Predicate) -> Iterator[Dict[str, Any]]:
+    """Строки rows, подходящие под where, в исходном порядке."""
+    for found in _run((rows, where), _match_partition, len(rows)):
+        for i in found:
+            yield rows[i]
+
+
+def _aggregate_partition(bounds: Tuple[int, int]) -> Dict[Any, List[Any]]:
+    rows, where, items, group_by = _task
+    start, stop = bounds
+    part = (rows[i] for i in range(start, stop))
+    if where is not None:
+        part = filter(where.matches, part)
+    return aggregate_states(part, items, group_by)
+
+
+def aggregate(rows: List[Dict[str, Any]], where: Optional[Predicate],
+              items: Tuple[SelectItem, ...],
+              group_by: Tuple[str, ...]) -> List[Dict[str, Any]]:
+    """Агрегаты по разделам в процессах, слитые в один результат."""
+    groups: Dict[Any, List[Any]] = {}
+    for states in _run((rows, where, items, group_by), _aggregate_partition,
+                       len(rows)):
+        merge_states(groups, states, items)
+    return aggregate_result(groups, items, group_by)
@@ -1,5 +1,49 @@
 import re
-from typing import Any, Dict, List, Optional
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from src.primitive_db import metrics
+from src.primitive_db.core import AGGREGATES, SelectItem, item_label
+from src.primitive_db.output import FORMATS as OUTPUT_FORMATS
+from src.primitive_db.predicates import COMPARE_OPS, Node
+
+# Сколько разобранных команд хранит кэш разбора
+PARSE_CACHE_SIZE = 512
+
+# Все лексемы строки выделяются одним регулярным выражением за один проход:
+# строка в кавычках, целое число, столбец с именем таблицы (users.age), слово,
+# ?, знак или оператор сравнения;
+# всё остальное (например, путь к файлу или незакрытая кавычка) — отдельной
+# лексемой до разделителя
+_TOKEN_RE = re.compile(r"""'[^']*'|"[^"]*"|[+-]?\d+(?!\w)|\w+\.\w+|\w+"""
+                       r"""|!=|<>|<=|>=|[?=,();<>]|[^\s?=,();<>]+""")
+_NAME_RE = re.compile(r"\w+")
+# Имя столбца, возможно с именем таблицы: age, users.age
+_COLUMN_RE = re.compile(r"\w+(?:\.\w+)?")
+_INT_RE = re.compile(r"[+-]?\d+")
+
+# Команды вида "<команда> <таблица>"
+_TABLE_COMMANDS = ("info", "compact", "drop_table")
+# Команды вида "<команда> <таблица> <имя>" и название их аргумента
+_TABLE_ARG_COMMANDS = {
+    "convert": "backend",
+    "set_layout": "layout",
+    "drop_index": "column",
+}
+_SIMPLE_COMMANDS = ("list_tables", "help", "exit", "begin", "commit", "rollback",
+                    "sync", "flush")
+
+
+class Param:
+    """Позиционный параметр ? подготовленной команды."""
+    __slots__ = ("index",)
+
+    def __init__(self, index: int) -> None:
+        self.index = index
+
+    def __repr__(self) -> str:
+        return f"Param({self.index})"
 
 
 def _unquote(s: str) -> str:
@@ -9,144 +53,467 @@ def _unquote(s: str) -> str:
     return s
 
 
-def parse_scalar(token: str) -> Any:
-    t = token.strip()
-    # bool
-    low = t.lower()
-    if low == "true":
-        return True
-    if low == "false":
+class _Parser:
+    """
+    Разбор команды рекурсивным спуском по списку лексем. Пустая строка
+    в конце списка обозначает конец команды.
+    """
+
+    def __init__(self, text: str, allow_params: bool = False) -> None:
+        self.text = text
+        self.tokens: List[str] = _TOKEN_RE.findall(text)
+        self.tokens.append("")
+        self.i = 0
+        self.allow_params = allow_params
+        self.params = 0
+
+    def peek(self) -> str:
+        return self.tokens[self.i]
+
+    def next(self) -> str:
+        tok = self.tokens[self.i]
+        if tok:
+            self.i += 1
+        return tok
+
+    def at_keyword(self, word: str) -> bool:
+        return self.tokens[self.i].lower() == word
+
+    def keyword(self, word: str) -> bool:
+        """Съесть ключевое слово, если оно следующее."""
+        if self.tokens[self.i].lower() == word:
+            self.i += 1
+            return True
         return False
-    # int
-    if re.fullmatch(r"[+-]?\d+", t):
-        return int(t)
-    # string (требуем кавычки для строк)
-    if (len(t) >= 2) and (t[0] in ("'", '"') and t[-1] == t[0]):
-        return _unquote(t)
-    # иначе — ошибка
-    raise ValueError(f"Некорректное значение: {token} (строки должны быть в кавычках)")
-
-
-def _split_csv_outside_quotes(s: str) -> List[str]:
-    parts = []
-    cur = []
-    q = None
-    for ch in s:
-        if q:
-            if ch == q:
-                q = None
-            cur.append(ch)
+
+    def expect_keyword(self, word: str) -> None:
+        if not self.keyword(word):
+            raise ValueError(f"Ожидалось ключевое слово {word}")
+
+    def at_op(self, op: str) -> bool:
+        return self.tokens[self.i] == op
+
+    def expect_op(self, op: str) -> None:
+        if self.tokens[self.i] != op:
+            raise ValueError(f"Ожидался символ {op}")
+        self.i += 1
+
+    def name(self, what: str = "имя таблицы") -> str:
+        tok = self.next()
+        if not _NAME_RE.fullmatch(tok):
+            raise ValueError(f"Ожидалось {what}")
+        return tok
+
+    def column(self) -> str:
+        tok = self.next()
+        if not _COLUMN_RE.fullmatch(tok):
+            raise ValueError("Ожидалось имя столбца")
+        return tok
+
+    def value(self) -> Any:
+        tok = self.next()
+        if not tok:
+            raise ValueError("Ожидалось значение")
+        first = tok[0]
+        if first in ("'", '"'):
+            if len(tok) < 2 or tok[-1] != first:
+                raise ValueError(f"Незакрытая кавычка: {self.rest_from(self.i - 1)}")
+            return tok[1:-1]
+        if _INT_RE.fullmatch(tok):
+            return int(tok)
+        low = tok.lower()
+        if low == "true":
+            return True
+        if low == "false":
+            return False
+        if tok == "?":
+            return self._param()
+        raise ValueError(f"Некорректное значение: {tok} "
+                         "(строки должны быть в кавычках)")
+
+    def count(self) -> Any:
+        """Неотрицательное целое (limit/offset) или параметр."""
+        tok = self.next()
+        if tok == "?":
+            return self._param()
+        if not tok.isdigit():
+            raise ValueError("Ожидалось неотрицательное целое число")
+        return int(tok)
+
+    def _param(self) -> Param:
+        if not self.allow_params:
+            raise ValueError("Параметры ? допустимы только в prepare")
+        self.params += 1
+        return Param(self.params - 1)
+
+    def rest_from(self, index: int) -> str:
+        """Необработанный текст команды, начиная с лексемы index."""
+        pos = 0
+        for tok in self.tokens[:index + 1]:
+            pos = self.text.index(tok, pos) + len(tok)
+        return self.text[pos - len(self.tokens[index]):].strip()
+
+    def rest(self) -> str:
+        """Съесть и вернуть необработанный остаток команды."""
+        if not self.peek():
+            return ""
+        rest = self.rest_from(self.i)
+        self.i = len(self.tokens) - 1
+        return rest
+
+    def end(self) -> None:
+        # Завершающая ; допускается
+        if self.at_op(";"):
+            self.i += 1
+        if self.peek():
+            raise ValueError(f"Лишний текст в конце команды: {self.rest()}")
+
+    def values_list(self) -> List[Any]:
+        self.expect_op("(")
+        values = [self.value()]
+        while self.at_op(","):
+            self.i += 1
+            values.append(self.value())
+        self.expect_op(")")
+        return values
+
+    def where(self) -> Node:
+        """
+        Условие where: сравнения (= != <> < <= > >=), in (...), like,
+        связанные and/or/not и скобками. Приоритет: not, and, or.
+        """
+        return self._or()
+
+    def _or(self) -> Node:
+        items = [self._and()]
+        while self.keyword("or"):
+            items.append(self._and())
+        return items[0] if len(items) == 1 else ("or", tuple(items))
+
+    def _and(self) -> Node:
+        items = [self._not()]
+        while self.keyword("and"):
+            items.append(self._not())
+        return items[0] if len(items) == 1 else ("and", tuple(items))
+
+    def _not(self) -> Node:
+        if self.keyword("not"):
+            return ("not", self._not())
+        if self.at_op("("):
+            self.i += 1
+            node = self._or()
+            self.expect_op(")")
+            return node
+        return self._predicate()
+
+    def _predicate(self) -> Node:
+        col = self.column()
+        negate = self.keyword("not")
+        if self.keyword("in"):
+            node: Node = ("in", col, tuple(self.values_list()))
+        elif self.keyword("like"):
+            pattern = self.value()
+            if not isinstance(pattern, (str, Param)):
+                raise ValueError("Ожидался шаблон like в кавычках")
+            node = ("like", col, pattern)
+        elif negate:
+            raise ValueError("Ожидалось in или like после not")
+        else:
+            op = "!=" if self.peek() == "<>" else self.peek()
+            if op not in COMPARE_OPS:
+                raise ValueError("Ожидалось условие вида: <колонка> <оператор> "
+                                 "<значение>")
+            self.i += 1
+            return ("cmp", op, col, self.value())
+        return ("not", node) if negate else node
+
+    def set_clause(self) -> Dict[str, Any]:
+        # поддерживаем несколько через запятую: a=1, b="x"
+        res: Dict[str, Any] = {}
+        while True:
+            col = self.name("имя столбца")
+            self.expect_op("=")
+            res[col] = self.value()
+            if not self.at_op(","):
+                return res
+            self.i += 1
+
+    def statement(self) -> Dict[str, Any]:
+        word = self.next().lower()
+        parse = _STATEMENTS.get(word)
+        if parse is not None:
+            cmd = parse(self)
+        elif word in _TABLE_COMMANDS:
+            cmd = {"cmd": word, "table": self.name()}
+        elif word in _TABLE_ARG_COMMANDS:
+            table = self.name()
+            arg = self.name()
+            if word in ("convert", "set_layout"):
+                arg = arg.lower()
+            cmd = {"cmd": word, "table": table, _TABLE_ARG_COMMANDS[word]: arg}
+        elif word in _SIMPLE_COMMANDS:
+            cmd = {"cmd": word}
+        else:
+            raise ValueError("Некорректная функция или формат команды")
+        self.end()
+        return cmd
+
+    # Команды со своей грамматикой
+    def insert(self) -> Dict[str, Any]:
+        # insert into <table> values (...)[, (...)]
+        self.expect_keyword("into")
+        table = self.name()
+        self.expect_keyword("values")
+        rows = [self.values_list()]
+        while self.at_op(","):
+            self.i += 1
+            rows.append(self.values_list())
+        if len(rows) == 1:
+            return {"cmd": "insert", "table": table, "values": rows[0]}
+        return {"cmd": "insert_many", "table": table, "rows": rows}
+
+    def load(self) -> Dict[str, Any]:
+        # load <table> from <file.csv|file.jsonl>
+        table = self.name()
+        self.expect_keyword("from")
+        path = self.rest()
+        if path.endswith(";"):
+            path = path[:-1].rstrip()
+        if not path:
+            raise ValueError("Ожидался путь к файлу")
+        return {"cmd": "load", "table": table, "path": _unquote(path)}
+
+    def columns(self) -> Tuple[str, ...]:
+        names = [self.column()]
+        while self.at_op(","):
+            self.next()
+            names.append(self.column())
+        return tuple(names)
+
+    def select_item(self) -> SelectItem:
+        """Столбец или агрегатная функция: count(*), sum(<столбец>) и т.д."""
+        name = self.next()
+        if not _COLUMN_RE.fullmatch(name):
+            raise ValueError("Ожидалось имя столбца или агрегатная функция")
+        if name.lower() not in AGGREGATES or not self.at_op("("):
+            return None, name
+        func = name.lower()
+        self.expect_op("(")
+        column: Optional[str] = None
+        if func == "count" and self.at_op("*"):
+            self.next()
         else:
-            if ch in ("'", '"'):
-                q = ch
-                cur.append(ch)
-            elif ch == ",":
-                parts.append("".join(cur).strip())
-                cur = []
-            else:
-                cur.append(ch)
-    if cur:
-        parts.append("".join(cur).strip())
-    return parts
-
-
-def parse_values_list(values_segment: str) -> List[Any]:
-    # ожидаем "( ... )"
-    s = values_segment.strip()
-    if not (s.startswith("(") and s.endswith(")")):
-        raise ValueError("Ожидался список значений в скобках: (v1, v2, ...)")
-    inner = s[1:-1]
-    raw_vals = _split_csv_outside_quotes(inner)
-    return [parse_scalar(rv) for rv in raw_vals]
-
-
-def parse_where(where_segment: Optional[str]) -> Optional[Dict[str, Any]]:
-    if not where_segment:
-        return None
-    # поддерживаем один предикат: <col> = <value>
-    m = re.fullmatch(r"\s*(\w+)\s*=\s*(.+?)\s*$", where_segment)
-    if not m:
-        raise ValueError("Ожидалось условие вида: <колонка> = <значение>")
-    col = m.group(1)
-    val = parse_scalar(m.group(2))
-    return {col: val}
-
-
-def parse_set(set_segment: str) -> Dict[str, Any]:
-    # поддерживаем несколько через запятую: a=1, b="x"
-    assigns = _split_csv_outside_quotes(set_segment)
-    res: Dict[str, Any] = {}
-    for a in assigns:
-        m = re.fullmatch(r"\s*(\w+)\s*=\s*(.+?)\s*$", a)
-        if not m:
-            raise ValueError(f"Некорректное присваивание в set: {a}")
-        col = m.group(1)
-        val = parse_scalar(m.group(2))
-        res[col] = val
-    return res
+            column = self.column()
+        self.expect_op(")")
+        return func, column
+
+    def select_list(self) -> Tuple[SelectItem, ...]:
+        items = [self.select_item()]
+        while self.at_op(","):
+            self.next()
+            items.append(self.select_item())
+        return tuple(items)
+
+    def select(self) -> Dict[str, Any]:
+        # select [<столбцы и агрегаты>] from <table>
+        # [join <table> on <a.col> = <b.col>] [where ...] [group by <col>, ...]
+        # [order by <col> [asc|desc]] [limit N] [offset M]
+        items = None
+        if not self.keyword("from"):
+            items = self.select_list()
+            self.expect_keyword("from")
+        table = self.name()
+        join = None
+        if self.keyword("join"):
+            other = self.name()
+            self.expect_keyword("on")
+            left = self.column()
+            self.expect_op("=")
+            join = {"table": other, "on": (left, self.column())}
+        where = self.where() if self.keyword("where") else None
+        group_by: Tuple[str, ...] = ()
+        if self.keyword("group"):
+            self.expect_keyword("by")
+            group_by = self.columns()
+            if items is None:
+                raise ValueError("Для group by укажите столбцы и агрегаты: "
+                                 "select <столбец>, count(*) from ...")
+        order = None
+        if self.keyword("order"):
+            self.expect_keyword("by")
+            # Порядок задаётся столбцом или агрегатом из списка select
+            column = item_label(self.select_item())
+            descending = self.keyword("desc")
+            if not descending:
+                self.keyword("asc")
+            order = (column, descending)
+        limit = self.count() if self.keyword("limit") else None
+        offset = self.count() if self.keyword("offset") else 0
+        return {"cmd": "select", "table": table, "join": join, "items": items,
+                "where": where,
+                "group_by": group_by, "order": order,
+                "limit": limit, "offset": offset}
+
+    def update(self) -> Dict[str, Any]:
+        # update <table> set ... where ...
+        table = self.name()
+        self.expect_keyword("set")
+        set_clause = self.set_clause()
+        self.expect_keyword("where")
+        return {"cmd": "update", "table": table, "set": set_clause,
+                "where": self.where()}
+
+    def delete(self) -> Dict[str, Any]:
+        # delete from <table> where ...
+        self.expect_keyword("from")
+        table = self.name()
+        self.expect_keyword("where")
+        return {"cmd": "delete", "table": table, "where": self.where()}
+
+    def create_index(self) -> Dict[str, Any]:
+        # create_index <table> <column> [hash|sorted]
+        table = self.name()
+        column = self.name("имя столбца")
+        kind = "hash"
+        if self.peek() not in ("", ";"):
+            kind = self.name("вид индекса").lower()
+        return {"cmd": "create_index", "table": table, "column": column,
+                "kind": kind}
+
+    def create_table(self) -> Dict[str, Any]:
+        # create_table <name> <col:type> ... (определения столбцов проверяет ядро)
+        parts = self.rest().split()
+        if len(parts) < 2:
+            raise ValueError("Некорректная команда. Ожидались имя таблицы и столбцы.")
+        return {"cmd": "create_table", "table": parts[0], "columns": parts[1:]}
+
+    def prepare(self) -> Dict[str, Any]:
+        # prepare <name> as <команда с параметрами ?>
+        name = self.name("имя запроса")
+        self.expect_keyword("as")
+        inner = _Parser(self.rest(), allow_params=True)
+        stmt = inner.statement()
+        if stmt["cmd"] in ("prepare", "execute"):
+            raise ValueError("Нельзя подготовить команду prepare/execute")
+        return {"cmd": "prepare", "name": name, "statement": stmt,
+                "params": inner.params}
+
+    def explain(self) -> Dict[str, Any]:
+        # explain [analyze] <select|update|delete|execute>
+        analyze = self.keyword("analyze")
+        inner = _Parser(self.rest(), allow_params=self.allow_params)
+        stmt = inner.statement()
+        if stmt["cmd"] not in ("select", "update", "delete", "execute"):
+            raise ValueError("explain применим к select, update, delete и execute")
+        self.params = inner.params
+        return {"cmd": "explain", "analyze": analyze, "statement": stmt}
+
+    def stats(self) -> Dict[str, Any]:
+        # stats [reset]
+        return {"cmd": "stats", "reset": self.keyword("reset")}
+
+    def format(self) -> Dict[str, Any]:
+        # format [table|csv|jsonl|tsv] [to <файл>]
+        if not self.peek():
+            return {"cmd": "format", "format": None, "path": None}
+        fmt = self.name("формат вывода").lower()
+        if fmt not in OUTPUT_FORMATS:
+            raise ValueError(f"Неизвестный формат вывода: {fmt}. "
+                             f"Допустимы: {', '.join(OUTPUT_FORMATS)}")
+        path = None
+        if self.keyword("to"):
+            path = _unquote(self.rest())
+            if not path:
+                raise ValueError("Ожидался путь к файлу")
+        return {"cmd": "format", "format": fmt, "path": path}
+
+    def execute(self) -> Dict[str, Any]:
+        # execute <name> [(v1, v2, ...)]
+        name = self.name("имя запроса")
+        params = self.values_list() if self.at_op("(") else []
+        return {"cmd": "execute", "name": name, "params": params}
+
+
+_STATEMENTS = {
+    "insert": _Parser.insert,
+    "load": _Parser.load,
+    "select": _Parser.select,
+    "update": _Parser.update,
+    "delete": _Parser.delete,
+    "create_table": _Parser.create_table,
+    "create_index": _Parser.create_index,
+    "prepare": _Parser.prepare,
+    "execute": _Parser.execute,
+    "explain": _Parser.explain,
+    "stats": _Parser.stats,
+    "format": _Parser.format,
+}
+
+
+def bind_params(stmt: Any, params: List[Any]) -> Any:
+    """Подставить значения параметров ? в подготовленную команду."""
+    if isinstance(stmt, Param):
+        return params[stmt.index]
+    if isinstance(stmt, dict):
+        return {k: bind_params(v, params) for k, v in stmt.items()}
+    if isinstance(stmt, list):
+        return [bind_params(v, params) for v in stmt]
+    if isinstance(stmt, tuple):
+        return tuple(bind_params(v, params) for v in stmt)
+    return stmt
+
+
+_cache: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
 
 
 # Командные парсеры
 def parse_command(line: str) -> Dict[str, Any]:
+    """
+    Разобрать команду. Результаты кэшируются (LRU по тексту команды),
+    поэтому возвращаемый словарь нельзя изменять.
+    """
     s = line.strip()
-    low = s.lower()
-
-    # insert into <table> values (...)
-    m = re.fullmatch(r"\s*insert\s+into\s+(\w+)\s+values\s*(\(.+\))\s*$", s, 
-                     flags=re.IGNORECASE)
-    if m:
-        return {"cmd": "insert", "table": m.group(1), 
-                "values": parse_values_list(m.group(2))}
-
-    # select from <table> [where ...]
-    m = re.fullmatch(r"\s*select\s+from\s+(\w+)(?:\s+where\s+(.+))?\s*$", s, 
-                     flags=re.IGNORECASE)
-    if m:
-        table = m.group(1)
-        where = parse_where(m.group(2)) if m.group(2) else None
-        return {"cmd": "select", "table": table, "where": where}
-
-    # update <table> set ... where ...
-    m = re.fullmatch(r"\s*update\s+(\w+)\s+set\s+(.+?)\s+where\s+(.+)\s*$", s, 
-                     flags=re.IGNORECASE)
-    if m:
-        return {"cmd": "update", "table": m.group(1), "set": parse_set(m.group(2)), 
-                "where": parse_where(m.group(3))}
-
-    # delete from <table> where ...
-    m = re.fullmatch(r"\s*delete\s+from\s+(\w+)\s+where\s+(.+)\s*$", s, 
-                     flags=re.IGNORECASE)
-    if m:
-        return {"cmd": "delete", "table": m.group(1), 
-                "where": parse_where(m.group(2))}
-
-    # info <table>
-    m = re.fullmatch(r"\s*info\s+(\w+)\s*$", s, flags=re.IGNORECASE)
-    if m:
-        return {"cmd": "info", "table": m.group(1)}
-
-    # list_tables
-    if re.fullmatch(r"\s*list_tables\s*$", s, flags=re.IGNORECASE):
-        return {"cmd": "list_tables"}
-
-    # create_table <name> <col:type> ...
-    if low.startswith("create_table "):
-        parts = s.split()
-        if len(parts) < 3:
-            raise ValueError("Некорректная команда. Ожидались имя таблицы и столбцы.")
-        return {"cmd": "create_table", "table": parts[1], "columns": parts[2:]}
-
-    # drop_table <name>
-    if low.startswith("drop_table "):
-        parts = s.split()
-        if len(parts) != 2:
-            raise ValueError("Некорректная команда. Ожидалось имя таблицы.")
-        return {"cmd": "drop_table", "table": parts[1]}
-
-    # help / exit
-    if re.fullmatch(r"\s*help\s*$", s, flags=re.IGNORECASE):
-        return {"cmd": "help"}
-    if re.fullmatch(r"\s*exit\s*$", s, flags=re.IGNORECASE):
-        return {"cmd": "exit"}
-
-    raise ValueError("Некорректная функция или формат команды")
+    cmd = _cache.get(s)
+    if cmd is not None:
+        _cache.move_to_end(s)
+        metrics.inc("parse_cache_hits")
+        return cmd
+    if not metrics.enabled():
+        cmd = _Parser(s).statement()
+    else:
+        metrics.inc("parse_cache_misses")
+        start = time.perf_counter()
+        try:
+            cmd = _Parser(s).statement()
+        finally:
+            metrics.observe("parse", time.perf_counter() - start)
+    _cache[s] = cmd
+    if len(_cache) > PARSE_CACHE_SIZE:
+        _cache.popitem(last=False)
+    return cmd
+
+
+_param_cache: "OrderedDict[str, Tuple[Dict[str, Any], int]]" = OrderedDict()
+
+
+def parse_statement(line: str) -> Tuple[Dict[str, Any], int]:
+    """
+    Разобрать команду с позиционными параметрами ? (как в prepare) и вернуть
+    её вместе с числом параметров. Кэшируется так же, как parse_command.
+    """
+    s = line.strip()
+    found = _param_cache.get(s)
+    if found is not None:
+        _param_cache.move_to_end(s)
+        metrics.inc("parse_cache_hits")
+        return found
+    metrics.inc("parse_cache_misses")
+    parser = _Parser(s, allow_params=True)
+    stmt = parser.statement()
+    if stmt["cmd"] in ("prepare", "execute"):
+        raise ValueError("prepare/execute недоступны в параметризованной команде")
+    found = (stmt, parser.params)
+    _param_cache[s] = found
+    if len(_param_cache) > PARSE_CACHE_SIZE:
+        _param_cache.popitem(last=False)
+    return found
@@ -0,0 +1,573 @@
+import heapq
+import math
+import time
+from itertools import islice
+from operator import itemgetter
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+)
+
+from src.primitive_db import metrics, parallel
+from src.primitive_db.core import (
+    _id_slice,
+    check_aggregate,
+    item_label,
+)
+from src.primitive_db.core import aggregate as core_aggregate
+from src.primitive_db.indexes import TableIndexes
+from src.primitive_db.join import JoinColumns, hash_join, map_columns, split_where
+from src.primitive_db.predicates import Node, Predicate, Range, compile_where
+from src.primitive_db.stats import distinct_estimate
+
+# Строки таблицы для чтения и её индексы (None — индексов нет)
+Source = Tuple[Iterable[Dict[str, Any]], Optional[TableIndexes]]
+# Доля строк, которую оценщик приписывает диапазону, если её не вычислить
+_DEFAULT_RANGE_FRACTION = 1 / 3
+# При равной оценке путь доступа выбирается по этому порядку
+_ACCESS_PRIORITY = {"index": 0, "id_range": 1, "sorted_range": 2, "scan": 3}
+
+
+def _scanned(rows: Iterable[Dict[str, Any]]) -> Iterable[Dict[str, Any]]:
+    """Строки таблицы с учётом в счётчике rows_scanned (если метрики включены)."""
+    return metrics.counted("rows_scanned", rows) if metrics.enabled() else rows
+
+
+def _literal(value: Any) -> str:
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, str):
+        return f'"{value}"'
+    return str(value)
+
+
+def where_text(node: Node) -> str:
+    """Условие where обратно в текст (для explain)."""
+    kind = node[0]
+    if kind == "cmp":
+        return f"{node[2]} {node[1]} {_literal(node[3])}"
+    if kind == "in":
+        return f"{node[1]} in ({', '.join(_literal(v) for v in node[2])})"
+    if kind == "like":
+        return f"{node[1]} like {_literal(node[2])}"
+    if kind == "not":
+        return f"not ({where_text(node[1])})"
+    return f" {kind} ".join(
+        f"({where_text(n)})" if n[0] in ("and", "or") else where_text(n)
+        for n in node[1]
+    )
+
+
+def _range_text(column: str, rng: Range) -> str:
+    lo, lo_incl, hi, hi_incl = rng
+    parts = []
+    if lo is not None:
+        parts.append(f"{column} {'>=' if lo_incl else '>'} {_literal(lo)}")
+    if hi is not None:
+        parts.append(f"{column} {'<=' if hi_incl else '<'} {_literal(hi)}")
+    return " and ".join(parts)
+
+
+class PlanNode:
+    """
+    Оператор плана. run(*входы) строит поток строк оператора из потоков
+    дочерних операторов; при explain analyze поток оборачивается счётчиком
+    строк и времени (время включает время дочерних операторов).
+    """
+
+    __slots__ = ("name", "detail", "children", "run", "estimate",
+                 "rows", "seconds", "scanned", "leaf")
+
+    def __init__(self, name: str, detail: str,
+                 run: Callable[..., Iterable[Dict[str, Any]]],
+                 children: Tuple["PlanNode", ...] = (),
+                 estimate: Optional[int] = None, leaf: bool = False) -> None:
+        self.name = name
+        self.detail = detail
+        self.run = run
+        self.children = children
+        self.estimate = estimate
+        # Оператор читает строки таблицы: его строки считаются просмотренными
+        self.leaf = leaf
+        self.rows = 0
+        self.seconds = 0.0
+        # Просмотрено строк, если оператор фильтрует сам (колоночный скан)
+        self.scanned: Optional[int] = None
+
+    def open(self, analyze: bool) -> Iterable[Dict[str, Any]]:
+        inputs = [child.open(analyze) for child in self.children]
+        if not analyze:
+            return self.run(*inputs)
+        return self._track(inputs)
+
+    def _track(self, inputs: List[Iterable[Dict[str, Any]]]
+               ) -> Iterator[Dict[str, Any]]:
+        clock = time.perf_counter
+        start = clock()
+        it = iter(self.run(*inputs))
+        self.seconds += clock() - start
+        while True:
+            start = clock()
+            try:
+                row = next(it)
+            except StopIteration:
+                self.seconds += clock() - start
+                return
+            self.seconds += clock() - start
+            self.rows += 1
+            yield row
+
+    def lines(self, analyze: bool, depth: int = 0) -> List[str]:
+        text = f"{'   ' * depth}-> {self.name}"
+        if self.detail:
+            text += f": {self.detail}"
+        if self.estimate is not None:
+            text += f" (оценка строк: {self.estimate})"
+        if analyze:
+            text += f" [строк: {self.rows}, время: {self.seconds * 1000:.3f} мс]"
+        res = [text]
+        for child in self.children:
+            res.extend(child.lines(analyze, depth + 1))
+        return res
+
+    def scanned_rows(self) -> int:
+        """Просмотрено строк таблиц в поддереве (после выполнения)."""
+        if self.leaf:
+            return self.rows if self.scanned is None else self.scanned
+        return sum(child.scanned_rows() for child in self.children)
+
+
+class Access:
+    """
+    Путь доступа к строкам таблицы: первичный или хеш-индекс по равенствам,
+    бинарный поиск диапазона ID, упорядоченный индекс по диапазону, полный
+    просмотр (в памяти, колоночный или потоком из файла).
+    """
+
+    __slots__ = ("kind", "estimate", "key", "column", "rng")
+
+    def __init__(self, kind: str, estimate: int, key: Optional[Dict[str, Any]] = None,
+                 column: Optional[str] = None, rng: Optional[Range] = None) -> None:
+        self.kind = kind
+        self.estimate = estimate
+        self.key = key
+        self.column = column
+        self.rng = rng
+
+    def describe(self, table: str) -> Tuple[str, str]:
+        if self.kind == "index":
+            cond = " and ".join(f"{c} = {_literal(v)}" for c, v in self.key.items())
+            name = "PrimaryKeyLookup" if list(self.key) == ["ID"] else "IndexLookup"
+            return name, f"{table} ({cond})"
+        if self.kind == "id_range":
+            return "IdRangeScan", f"{table} ({_range_text('ID', self.rng)})"
+        if self.kind == "sorted_range":
+            return "IndexRangeScan", (f"{table} "
+                                      f"({_range_text(self.column, self.rng)})")
+        if self.kind == "columnar":
+            return "ColumnarScan", table
+        if self.kind == "stream":
+            return "FileScan", table
+        return "SeqScan", table
+
+    def candidates(self, rows: Iterable[Dict[str, Any]],
+                   indexes: Optional[TableIndexes]) -> Iterable[Dict[str, Any]]:
+        found = None
+        if self.kind == "index" and indexes is not None:
+            found = indexes.lookup(self.key)
+        elif self.kind == "id_range" and isinstance(rows, list):
+            found = _id_slice(rows, self.rng)
+        elif self.kind == "sorted_range" and indexes is not None:
+            found = indexes.range_lookup({self.column: self.rng})
+        return rows if found is None else found
+
+
+class Plan:
+    """План запроса: дерево операторов и столбцы результата."""
+
+    def __init__(self, root: PlanNode, columns: List[Dict[str, str]],
+                 tables: Tuple[str, ...]) -> None:
+        self.root = root
+        self.columns = columns
+        self.tables = tables
+
+    def execute(self, analyze: bool = False) -> Iterable[Dict[str, Any]]:
+        return self.root.open(analyze)
+
+    def lines(self, analyze: bool = False) -> List[str]:
+        return self.root.lines(analyze)
+
+
+class Planner:
+    """
+    Выбор плана по метаданным: объявленным индексам, представлению таблицы
+    и её статистике. Строки таблиц читаются только при выполнении плана:
+    open_table(table[, where]) возвращает строки и индексы (с where
+    сегменты таблицы на диске, где подходящих строк нет, не читаются,
+    но сами строки не фильтруются), streamable(table) —
+    будет ли таблица читаться с диска потоком.
+    """
+
+    def __init__(self, metadata: Dict[str, Any],
+                 open_table: Callable[..., Source],
+                 streamable: Callable[[str], bool]) -> None:
+        self.metadata = metadata
+        self.open_table = open_table
+        self.streamable = streamable
+
+    def _table_meta(self, table: str) -> Dict[str, Any]:
+        tables = self.metadata.get("tables", {})
+        if table not in tables:
+            raise ValueError(f'Таблица "{table}" не существует')
+        return tables[table]
+
+    def _rows_estimate(self, table: str) -> int:
+        return self._table_meta(table).get("stats", {}).get("rows", 0)
+
+    def _storage(self, table: str) -> str:
+        """Откуда при выполнении берутся строки: rows, columnar или stream."""
+        if self.streamable(table):
+            return "stream"
+        if self._table_meta(table).get("layout") == "columnar":
+            return "columnar"
+        return "rows"
+
+    def _range_fraction(self, table: str, column: str, rng: Range) -> float:
+        """Доля строк в диапазоне по min/max столбца из статистики."""
+        col_stats = self._table_meta(table).get("stats", {}).get(
+            "columns", {}).get(column)
+        lo, _, hi, _ = rng
+        if (col_stats is None or not isinstance(col_stats["min"], int)
+                or not isinstance(col_stats["max"], int)
+                or isinstance(col_stats["min"], bool)):
+            return _DEFAULT_RANGE_FRACTION
+        cmin, cmax = col_stats["min"], col_stats["max"]
+        lo = cmin if lo is None else max(lo, cmin)
+        hi = cmax if hi is None else min(hi, cmax)
+        if hi < lo:
+            return 0.0
+        return (hi - lo + 1) / (cmax - cmin + 1)
+
+    def _eq_estimate(self, table: str, column: str) -> int:
+        if column == "ID":
+            return 1
+        stats = self._table_meta(table).get("stats")
+        if stats is None:
+            return 0
+        rows = stats["rows"]
+        return math.ceil(rows / max(1, distinct_estimate(stats, column)))
+
+    def access(self, table: str, where: Optional[Predicate]) -> Access:
+        """Самый дешёвый по оценке путь доступа к строкам для условия where."""
+        rows = self._rows_estimate(table)
+        storage = self._storage(table)
+        if storage != "rows" or where is None:
+            return Access("scan" if storage == "rows" else storage, rows)
+        table_meta = self._table_meta(table)
+        hashed = set(table_meta.get("indexes", []))
+        ordered = set(table_meta.get("sorted_indexes", []))
+        paths = [Access("scan", rows)]
+        key = {c: v for c, v in where.equalities.items()
+               if c == "ID" or c in hashed}
+        if key:
+            # Индексы по нескольким равенствам пересекаются
+            estimate = min(self._eq_estimate(table, c) for c in key)
+            paths.append(Access("index", estimate, key=key))
+        for column, rng in where.ranges.items():
+            if column == "ID":
+                kind = "id_range"
+            elif column in ordered:
+                kind = "sorted_range"
+            else:
+                continue
+            estimate = math.ceil(rows * self._range_fraction(table, column, rng))
+            paths.append(Access(kind, estimate, column=column, rng=rng))
+        return min(paths, key=lambda p: (p.estimate, _ACCESS_PRIORITY[p.kind]))
+
+    def _scan(self, table: str, where: Optional[Predicate],
+              where_node: Optional[Node], access: Access) -> PlanNode:
+        """Чтение строк таблицы путём access и проверка условия where."""
+        name, detail = access.describe(table)
+        if access.kind == "columnar":
+            # Колоночная таблица проверяет условие масками по столбцам сама
+            if where_node is not None:
+                detail += f" ({where_text(where_node)})"
+
+            def run_columnar() -> Iterable[Dict[str, Any]]:
+                rows, _ = self.open_table(table)
+                node.scanned = len(rows)
+                metrics.inc("rows_scanned", len(rows))
+                return rows.select(where) if where is not None else rows
+
+            node = PlanNode(name, detail, run_columnar, estimate=access.estimate,
+                            leaf=True)
+            return node
+
+        if (access.kind == "scan" and where is not None
+                and parallel.eligible(access.estimate)):
+            detail += (f" ({where_text(where_node)}, "
+                       f"процессов: {parallel.workers()})")
+
+            def run_parallel() -> Iterable[Dict[str, Any]]:
+                rows, _ = self.open_table(table)
+                node.scanned = len(rows)
+                metrics.inc("rows_scanned", len(rows))
+                return parallel.filter_rows(rows, where)
+
+            node = PlanNode("ParallelSeqScan", detail, run_parallel,
+                            estimate=access.estimate, leaf=True)
+            return node
+
+        def run_scan() -> Iterable[Dict[str, Any]]:
+            # Сегменты таблицы, читаемой с диска, отбрасываются по where
+            rows, indexes = self.open_table(table, where)
+            return _scanned(access.candidates(rows, indexes))
+
+        node = PlanNode(name, detail, run_scan, estimate=access.estimate, leaf=True)
+        return _filter(node, where, where_node)
+
+    def scan(self, table: str, where_node: Optional[Node]) -> PlanNode:
+        schema = self._table_meta(table)["structure"]
+        where = compile_where(where_node, schema)
+        return self._scan(table, where, where_node, self.access(table, where))
+
+    def _ordered_scan(self, table: str, where_node: Optional[Node],
+                      order: Tuple[str, bool], stop: Optional[int]) -> PlanNode:
+        """
+        Строки в порядке order. Обход упорядоченного индекса (или ID)
+        сравнивается по оценке с выбранным путём доступа и сортировкой:
+        с limit обход останавливается на первых stop подходящих строках.
+        """
+        column, descending = order
+        schema = self._table_meta(table)["structure"]
+        where = compile_where(where_node, schema)
+        access = self.access(table, where)
+        if column == "ID" and not descending:
+            # Строки таблицы и любой путь доступа отдают их в порядке ID
+            return self._scan(table, where, where_node, access)
+        storage = self._storage(table)
+        walkable = storage == "rows" and (
+            column == "ID"
+            or column in self._table_meta(table).get("sorted_indexes", []))
+        if walkable:
+            rng = where.ranges.get(column) if where else None
+            rows = self._rows_estimate(table)
+            walk = rows * (self._range_fraction(table, column, rng) if rng else 1)
+            if stop is not None and access.estimate:
+                walk = min(walk, stop * rows / access.estimate)
+            matched = max(access.estimate, 1)
+            if walk <= matched * max(1.0, math.log2(matched)):
+                return _filter(self._index_order(table, column, descending, rng,
+                                                 math.ceil(walk)),
+                               where, where_node)
+        return _sort(self._scan(table, where, where_node, access), order, stop)
+
+    def _index_order(self, table: str, column: str, descending: bool,
+                     rng: Optional[Range], estimate: int) -> PlanNode:
+        direction = "desc" if descending else "asc"
+        detail = f"{table}.{column} {direction}"
+        if rng is not None:
+            detail += f" ({_range_text(column, rng)})"
+
+        def run() -> Iterable[Dict[str, Any]]:
+            rows, indexes = self.open_table(table)
+            if column == "ID":
+                return _scanned(reversed(_id_slice(rows, rng) if rng else rows))
+            return _scanned(indexes.ordered(column, rng, descending))
+
+        return PlanNode("IndexOrderScan", detail, run, estimate=estimate, leaf=True)
+
+    def select(self, cmd: Dict[str, Any]) -> Plan:
+        """План select: скан, фильтр, агрегация, сортировка, limit/offset."""
+        if cmd.get("join"):
+            return self._join(cmd)
+        table = cmd["table"]
+        schema = self._table_meta(table)["structure"]
+        where_node = cmd.get("where")
+        items = cmd.get("items")
+        group_by = cmd.get("group_by", ())
+        order = cmd.get("order")
+        limit = cmd.get("limit")
+        offset = cmd.get("offset", 0)
+        columns = schema
+        if items:
+            check_aggregate(schema, items, group_by)
+            columns = [{"name": item_label(item)} for item in items]
+        _check_order(columns, order)
+        stop = None if limit is None else offset + limit
+        if items:
+            node = self._aggregate(table, where_node, items, group_by)
+            if order is not None:
+                node = _sort(node, order, None)
+        elif order is not None:
+            node = self._ordered_scan(table, where_node, order, stop)
+        else:
+            node = self.scan(table, where_node)
+        return Plan(_limit(node, limit, offset), columns, (table,))
+
+    def _aggregate(self, table: str, where_node: Optional[Node],
+                   items: Tuple[Any, ...], group_by: Tuple[str, ...]) -> PlanNode:
+        """Агрегация; большая таблица в памяти агрегируется по разделам
+        в нескольких процессах."""
+        schema = self._table_meta(table)["structure"]
+        where = compile_where(where_node, schema)
+        access = self.access(table, where)
+        if access.kind != "scan" or not parallel.eligible(access.estimate):
+            return _aggregate(self._scan(table, where, where_node, access),
+                              items, group_by)
+        detail = _aggregate_detail(items, group_by)
+        if where_node is not None:
+            detail += f" where {where_text(where_node)}"
+        detail += f" ({table}, процессов: {parallel.workers()})"
+
+        def run() -> Iterable[Dict[str, Any]]:
+            rows, _ = self.open_table(table)
+            node.scanned = len(rows)
+            metrics.inc("rows_scanned", len(rows))
+            return parallel.aggregate(rows, where, items, group_by)
+
+        node = PlanNode("ParallelAggregate", detail, run,
+                        estimate=access.estimate, leaf=True)
+        return node
+
+    def _join(self, cmd: Dict[str, Any]) -> Plan:
+        """
+        select ... from a join b on a.x = b.y. Меньшая по статистике таблица
+        загружается в хеш-таблицу, большая читается потоком; условия where,
+        касающиеся одной таблицы, проверяются до соединения.
+        """
+        left, right = cmd["table"], cmd["join"]["table"]
+        if left == right:
+            raise ValueError("Соединение таблицы с самой собой не поддерживается")
+        names = JoinColumns([(left, self._table_meta(left)["structure"]),
+                             (right, self._table_meta(right)["structure"])])
+        col_types = {c["name"]: c["type"] for c in names.schema}
+        on = [names.resolve(c) for c in cmd["join"]["on"]]
+        keys = {c.split(".", 1)[0]: c.split(".", 1)[1] for c in on}
+        if set(keys) != {left, right}:
+            raise ValueError("Условие on должно связывать столбцы обеих таблиц")
+        if col_types[on[0]] != col_types[on[1]]:
+            raise ValueError(f"Типы столбцов {on[0]} и {on[1]} не совпадают")
+
+        where_node = cmd.get("where")
+        if where_node is not None:
+            where_node = map_columns(where_node, names.resolve)
+        parts, rest = split_where(where_node, (left, right))
+        residual = compile_where(rest, names.schema)
+
+        if self._rows_estimate(left) <= self._rows_estimate(right):
+            build, probe = left, right
+        else:
+            build, probe = right, left
+
+        def run_join(build_rows: Iterable[Dict[str, Any]],
+                     probe_rows: Iterable[Dict[str, Any]]
+                     ) -> Iterator[Dict[str, Any]]:
+            return hash_join(build_rows, probe_rows, build, probe,
+                             keys[build], keys[probe], build_first=build == left)
+
+        node = PlanNode("HashJoin",
+                        f"{build}.{keys[build]} = {probe}.{keys[probe]} "
+                        f"(хеш-таблица: {build})",
+                        run_join,
+                        (self.scan(build, parts[build]),
+                         self.scan(probe, parts[probe])))
+        node = _filter(node, residual, rest)
+
+        items = cmd.get("items")
+        group_by = tuple(names.resolve(c) for c in cmd.get("group_by", ()))
+        order = cmd.get("order")
+        columns = names.schema
+        labels: Dict[str, str] = {}
+        if items:
+            resolved = tuple(names.resolve_item(item) for item in items)
+            check_aggregate(names.schema, resolved, group_by)
+            labels = {item_label(a): item_label(b) for a, b in zip(items, resolved)}
+            items = resolved
+            columns = [{"name": item_label(item)} for item in items]
+        if order is not None:
+            column = labels.get(order[0]) or names.resolve(order[0])
+            order = (column, order[1])
+        _check_order(columns, order)
+
+        limit = cmd.get("limit")
+        offset = cmd.get("offset", 0)
+        if items:
+            node = _aggregate(node, items, group_by)
+            if order is not None:
+                node = _sort(node, order, None)
+        elif order is not None:
+            node = _sort(node, order, None if limit is None else offset + limit)
+        return Plan(_limit(node, limit, offset), columns, (left, right))
+
+    def modify(self, cmd: Dict[str, Any], where: Predicate) -> Tuple[Access, Plan]:
+        """Путь доступа update/delete и план для explain."""
+        table = cmd["table"]
+        access = self.access(table, where)
+        scan = self._scan(table, where, cmd["where"], access)
+        if cmd["cmd"] == "update":
+            detail = f"{table} set " + ", ".join(
+                f"{c} = {_literal(v)}" for c, v in cmd["set"].items())
+            node = PlanNode("Update", detail, lambda rows: rows, (scan,))
+        else:
+            node = PlanNode("Delete", table, lambda rows: rows, (scan,))
+        return access, Plan(node, [], (table,))
+
+
+def _check_order(columns: List[Dict[str, str]],
+                 order: Optional[Tuple[str, bool]]) -> None:
+    if order is not None and order[0] not in {c["name"] for c in columns}:
+        raise ValueError(f"Неизвестный столбец: {order[0]}")
+
+
+def _filter(child: PlanNode, where: Optional[Predicate],
+            where_node: Optional[Node]) -> PlanNode:
+    if where is None:
+        return child
+    return PlanNode("Filter", where_text(where_node),
+                    lambda rows: filter(where.matches, rows), (child,))
+
+
+def _sort(child: PlanNode, order: Tuple[str, bool],
+          top: Optional[int]) -> PlanNode:
+    """Сортировка; с top — выбор первых top строк кучей (память O(top))."""
+    column, descending = order
+    key = itemgetter(column)
+    direction = "desc" if descending else "asc"
+    if top is not None:
+        pick = heapq.nlargest if descending else heapq.nsmallest
+        return PlanNode("TopN", f"{column} {direction}, {top}",
+                        lambda rows: pick(top, rows, key=key), (child,))
+    return PlanNode("Sort", f"{column} {direction}",
+                    lambda rows: sorted(rows, key=key, reverse=descending),
+                    (child,))
+
+
+def _aggregate_detail(items: Tuple[Any, ...], group_by: Tuple[str, ...]) -> str:
+    detail = ", ".join(item_label(item) for item in items)
+    if group_by:
+        detail += f" (group by {', '.join(group_by)})"
+    return detail
+
+
+def _aggregate(child: PlanNode, items: Tuple[Any, ...],
+               group_by: Tuple[str, ...]) -> PlanNode:
+    return PlanNode("HashAggregate", _aggregate_detail(items, group_by),
+                    lambda rows: core_aggregate(rows, None, None, items,
+                                                group_by) or [],
+                    (child,))
+
+
+def _limit(child: PlanNode, limit: Optional[int], offset: int) -> PlanNode:
+    if limit is None and not offset:
+        return child
+    stop = None if limit is None else offset + limit
+    detail = f"offset {offset}" + (f", limit {limit}" if limit is not None else "")
+    return PlanNode("Limit", detail,
+                    lambda rows: islice(rows, offset, stop), (child,))
@@ -0,0 +1,165 @@
+import re
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# Условие where — дерево из кортежей (его строит parser):
+#   ("cmp", op, столбец, значение), op: = != < <= > >=
+#   ("in", столбец, (значение, ...))
+#   ("like", столбец, шаблон)
+#   ("and", (условие, ...)), ("or", (условие, ...)), ("not", условие)
+Node = Tuple[Any, ...]
+# Диапазон значений столбца: (нижняя граница, включительно,
+# верхняя граница, включительно); None — граница не задана
+Range = Tuple[Any, bool, Any, bool]
+
+COMPARE_OPS = ("=", "!=", "<", "<=", ">", ">=")
+_PY_OPS = {"=": "==", "!=": "!=", "<": "<", "<=": "<=", ">": ">", ">=": ">="}
+_PY_TYPES = {"int": int, "str": str, "bool": bool}
+# Сколько скомпилированных условий держится в кэше
+_COMPILE_CACHE_SIZE = 256
+
+
+def like_regex(pattern: str) -> "re.Pattern[str]":
+    """Шаблон like в регулярное выражение: % — любая строка, _ — один символ."""
+    parts = []
+    for ch in pattern:
+        if ch == "%":
+            parts.append(".*")
+        elif ch == "_":
+            parts.append(".")
+        else:
+            parts.append(re.escape(ch))
+    return re.compile("".join(parts), re.DOTALL)
+
+
+def _check_value(col: str, col_type: str, value: Any) -> None:
+    py_type = _PY_TYPES[col_type]
+    # bool — подкласс int, поэтому сверяем тип точно
+    if type(value) is not py_type:
+        raise ValueError(f"Столбец {col} имеет тип {col_type}, "
+                         f"в условии указано значение {value!r}")
+
+
+class Predicate:
+    """
+    Скомпилированное условие where: matches(row) — функция Python,
+    собранная из дерева условия один раз на запрос; equalities и ranges —
+    равенства и диапазоны по столбцам из условий верхнего уровня (через and),
+    по которым можно искать в индексах.
+    """
+
+    __slots__ = ("node", "matches", "equalities", "ranges")
+
+    def __init__(self, node: Node, matches: Callable[[Dict[str, Any]], bool],
+                 equalities: Dict[str, Any], ranges: Dict[str, Range]) -> None:
+        self.node = node
+        self.matches = matches
+        self.equalities = equalities
+        self.ranges = ranges
+
+
+class _Compiler:
+    def __init__(self, col_types: Dict[str, str]) -> None:
+        self.col_types = col_types
+        # Значения из условия попадают в функцию как имена, а не как текст
+        self.namespace: Dict[str, Any] = {"__builtins__": {}}
+
+    def const(self, value: Any) -> str:
+        name = f"_v{len(self.namespace)}"
+        self.namespace[name] = value
+        return name
+
+    def column(self, col: str) -> str:
+        if col not in self.col_types:
+            raise ValueError(f"Неизвестный столбец: {col}")
+        return self.col_types[col]
+
+    def source(self, node: Node) -> str:
+        kind = node[0]
+        if kind == "cmp":
+            _, op, col, value = node
+            col_type = self.column(col)
+            _check_value(col, col_type, value)
+            if col_type == "bool" and op not in ("=", "!="):
+                raise ValueError(f"Для столбца {col} типа bool допустимы "
+                                 "только = и !=")
+            return f"(r[{col!r}] {_PY_OPS[op]} {self.const(value)})"
+        if kind == "in":
+            _, col, values = node
+            col_type = self.column(col)
+            for value in values:
+                _check_value(col, col_type, value)
+            return f"(r[{col!r}] in {self.const(frozenset(values))})"
+        if kind == "like":
+            _, col, pattern = node
+            if self.column(col) != "str":
+                raise ValueError(f"like применим только к столбцам типа str: {col}")
+            if not isinstance(pattern, str):
+                raise ValueError("Шаблон like должен быть строкой")
+            match = self.const(like_regex(pattern).fullmatch)
+            return f"({match}(r[{col!r}]) is not None)"
+        if kind == "not":
+            return f"(not {self.source(node[1])})"
+        if kind in ("and", "or"):
+            return "(" + f" {kind} ".join(self.source(n) for n in node[1]) + ")"
+        raise ValueError(f"Неизвестный узел условия: {kind}")
+
+
+def _equalities(node: Node) -> Dict[str, Any]:
+    if node[0] == "cmp" and node[1] == "=":
+        return {node[2]: node[3]}
+    res: Dict[str, Any] = {}
+    if node[0] == "and":
+        for child in node[1]:
+            for col, value in _equalities(child).items():
+                res.setdefault(col, value)
+    return res
+
+
+def _conjuncts(node: Node) -> Tuple[Node, ...]:
+    return node[1] if node[0] == "and" else (node,)
+
+
+def _narrow(rng: Range, op: str, value: Any) -> Range:
+    """Сузить диапазон условием col <op> value."""
+    lo, lo_incl, hi, hi_incl = rng
+    if op in (">", ">=", "="):
+        incl = op != ">"
+        if lo is None or value > lo or (value == lo and not incl):
+            lo, lo_incl = value, incl
+    if op in ("<", "<=", "="):
+        incl = op != "<"
+        if hi is None or value < hi or (value == hi and not incl):
+            hi, hi_incl = value, incl
+    return lo, lo_incl, hi, hi_incl
+
+
+def _ranges(node: Node) -> Dict[str, Range]:
+    res: Dict[str, Range] = {}
+    for child in _conjuncts(node):
+        if child[0] == "cmp" and child[1] != "!=":
+            _, op, col, value = child
+            res[col] = _narrow(res.get(col, (None, False, None, False)), op, value)
+    return res
+
+
+@lru_cache(maxsize=_COMPILE_CACHE_SIZE)
+def _compile(node_repr: str, node: Node,
+             schema_key: Tuple[Tuple[str, str], ...]) -> Predicate:
+    # node_repr в ключе кэша различает 1 и True (они равны как ключи словаря)
+    compiler = _Compiler(dict(schema_key))
+    source = compiler.source(node)
+    matches = eval(f"lambda r: {source}", compiler.namespace)
+    return Predicate(node, matches, _equalities(node), _ranges(node))
+
+
+def compile_where(node: Optional[Node],
+                  schema: List[Dict[str, str]]) -> Optional[Predicate]:
+    """
+    Проверить условие по схеме таблицы (столбцы, типы значений, применимость
+    операций) и скомпилировать его. Скомпилированные условия кэшируются.
+    """
+    if node is None:
+        return None
+    return _compile(repr(node), node, tuple((c["name"], c["type"]) for c in schema))
+
@@ -0,0 +1,117 @@
+import sys
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+
+from src.primitive_db import metrics
+
+# Пределы кэша результатов по умолчанию
+CACHE_MAX_ENTRIES = 256
+CACHE_MAX_BYTES = 64 * 1024 * 1024
+# Сколько строк результата берётся для оценки его размера
+_SAMPLE_ROWS = 16
+
+
+def _result_bytes(result: List[Dict[str, Any]]) -> int:
+    """Грубая оценка памяти под результат по выборке первых строк."""
+    size = sys.getsizeof(result)
+    sample = result[:_SAMPLE_ROWS]
+    if sample:
+        sample_bytes = sum(
+            sys.getsizeof(r) + sum(sys.getsizeof(v) for v in r.values())
+            for r in sample
+        )
+        size += sample_bytes * len(result) // len(sample)
+    return size
+
+
+class ResultCache:
+    """
+    Кэш результатов select с вытеснением давно не используемых (LRU)
+    по числу записей и объёму. У каждой таблицы свой счётчик версий:
+    запись в таблицу сбрасывает только её результаты. Отметка файлов
+    таблицы (stamp), переданная в lookup, сверяется с запомненной: если
+    таблицу изменили извне, её результаты сбрасываются. Кэш можно читать
+    из нескольких потоков: запрос вычисляется вне блокировки.
+    """
+
+    def __init__(self, max_entries: int = CACHE_MAX_ENTRIES,
+                 max_bytes: int = CACHE_MAX_BYTES) -> None:
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        # (таблица, версия, запрос) -> (результат, размер)
+        self._entries: "OrderedDict[Tuple[str, int, Hashable], Tuple[Any, int]]" = (
+            OrderedDict()
+        )
+        self._versions: Dict[str, int] = {}
+        # Отметка файлов таблицы, при которой посчитаны её результаты
+        self._stamps: Dict[str, Hashable] = {}
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+    def version(self, table_name: str) -> int:
+        return self._versions.get(table_name, 0)
+
+    def lookup(self, table_name: str, query: Hashable,
+               compute: Callable[[], List[Dict[str, Any]]],
+               stamp: Optional[Hashable] = None
+               ) -> Tuple[List[Dict[str, Any]], bool]:
+        """Результат запроса и признак того, что он взят из кэша."""
+        with self._lock:
+            if stamp is not None and self._stamps.get(table_name) != stamp:
+                if table_name in self._stamps:
+                    self._invalidate(table_name)
+                self._stamps[table_name] = stamp
+            key = (table_name, self.version(table_name), query)
+            cached = self._entries.get(key)
+            if cached is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+            else:
+                self.misses += 1
+        if cached is not None:
+            metrics.inc("result_cache_hits")
+            return cached[0], True
+        metrics.inc("result_cache_misses")
+        result = compute()
+        size = _result_bytes(result)
+        with self._lock:
+            # Пока запрос вычислялся, таблицу могли изменить
+            if size <= self.max_bytes and key[1] == self.version(table_name):
+                if key not in self._entries:
+                    self._entries[key] = (result, size)
+                    self.nbytes += size
+                self._evict()
+        return result, False
+
+    def invalidate(self, table_name: str) -> None:
+        """Сбросить результаты таблицы после изменения её данных или схемы."""
+        with self._lock:
+            self._invalidate(table_name)
+
+    def _invalidate(self, table_name: str) -> None:
+        version = self.version(table_name)
+        self._versions[table_name] = version + 1
+        for key in [k for k in self._entries if k[0] == table_name]:
+            self.nbytes -= self._entries.pop(key)[1]
+
+    def clear(self) -> None:
+        with self._lock:
+            for table_name in list(self._versions):
+                self._versions[table_name] += 1
+            self._entries.clear()
+            self.nbytes = 0
+
+    def table_entries(self, table_name: str) -> int:
+        with self._lock:
+            return sum(1 for k in self._entries if k[0] == table_name)
+
+    def _evict(self) -> None:
+        while self._entries and (len(self._entries) > self.max_entries
+                                 or self.nbytes > self.max_bytes):
+            _, (_, size) = self._entries.popitem(last=False)
+            self.nbytes -= size
+            self.evictions += 1
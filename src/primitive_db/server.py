@@ -0,0 +1,359 @@
+"""
+Сетевой режим: asyncio-сервер (TCP или Unix-сокет), принимающий тот же язык
+команд. Таблицы держатся в памяти одного сеанса на всё время работы
+сервера. Чтения выполняются в пуле потоков одновременно друг с другом,
+минуя очередь записи; изменения проходят через одну очередь и фиксируются
+групповым коммитом — один атомарный коммит на все накопившиеся в очереди
+команды. Пакет записи выполняется в своём потоке под блокировкой записи:
+пока он идёт, чтения ждут, а цикл событий продолжает принимать команды.
+"""
+import asyncio
+import contextlib
+import io
+import logging
+import os
+import signal
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterator, List, Optional, Set, TextIO, Tuple
+
+from src.decorators import set_confirm_policy
+from src.primitive_db import metrics
+from src.primitive_db.client import DEFAULT_HOST, DEFAULT_PORT, encode_response
+from src.primitive_db.engine import Session, bind_prepared
+from src.primitive_db.output import FORMATS as OUTPUT_FORMATS
+from src.primitive_db.parser import parse_command
+
+# Команды, которые не меняют данные и выполняются вне очереди записи
+READ_COMMANDS = ("select", "list_tables", "help", "info", "stats")
+# Транзакции по сети не поддерживаются: сеанс общий для всех соединений
+_TRANSACTION_COMMANDS = ("begin", "commit", "rollback")
+# Наибольшее число команд в одном групповом коммите
+MAX_BATCH = 1024
+# Наибольшая длина строки команды (insert с множеством строк бывает длинным)
+MAX_LINE_BYTES = 16 * 1024 * 1024
+# Потоков для одновременного выполнения чтений
+READ_THREADS = 8
+
+# Ошибки группового коммита пишутся в журнал приложения
+logger = logging.getLogger(__name__)
+
+_Result = Tuple[bool, str]
+
+
+def is_read(cmd: Dict[str, Any]) -> bool:
+    """Команда только читает данные (explain analyze update/delete — пишет)."""
+    if cmd["cmd"] == "explain":
+        return not (cmd["analyze"] and cmd["statement"]["cmd"] != "select")
+    return cmd["cmd"] in READ_COMMANDS
+
+
+class _ReadWriteLock:
+    """
+    Блокировка чтения-записи: чтения идут одновременно, запись — одна
+    и без чтений. Ожидающая запись не пропускает новые чтения вперёд,
+    иначе поток чтений откладывал бы коммит бесконечно.
+    """
+
+    def __init__(self) -> None:
+        self._cond = threading.Condition()
+        self._readers = 0
+        self._writer = False
+        self._waiting_writers = 0
+
+    @contextlib.contextmanager
+    def reading(self) -> Iterator[None]:
+        with self._cond:
+            while self._writer or self._waiting_writers:
+                self._cond.wait()
+            self._readers += 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._readers -= 1
+                if not self._readers:
+                    self._cond.notify_all()
+
+    @contextlib.contextmanager
+    def writing(self) -> Iterator[None]:
+        with self._cond:
+            self._waiting_writers += 1
+            while self._writer or self._readers:
+                self._cond.wait()
+            self._waiting_writers -= 1
+            self._writer = True
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._writer = False
+                self._cond.notify_all()
+
+
+class _ThreadOutput:
+    """
+    Подмена sys.stdout на время работы сервера: вывод потока, выполняющего
+    команду, собирается в буфер этой команды, остальной идёт в исходный
+    stdout. redirect_stdout для этого не годится — он меняет stdout всего
+    процесса, и одновременные команды перемешали бы вывод.
+    """
+
+    def __init__(self, default: TextIO) -> None:
+        self.default = default
+        self._local = threading.local()
+
+    def _target(self) -> TextIO:
+        buf = getattr(self._local, "buf", None)
+        return self.default if buf is None else buf
+
+    def write(self, text: str) -> int:
+        return self._target().write(text)
+
+    def flush(self) -> None:
+        self._target().flush()
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._target(), name)
+
+    @contextlib.contextmanager
+    def capture(self) -> Iterator[io.StringIO]:
+        buf = io.StringIO()
+        self._local.buf = buf
+        try:
+            yield buf
+        finally:
+            self._local.buf = None
+
+
+class _Connection:
+    """Состояние одного соединения: свои подготовленные команды и формат вывода."""
+
+    def __init__(self) -> None:
+        self.prepared: Dict[str, Tuple[Dict[str, Any], int]] = {}
+        self.output_format = OUTPUT_FORMATS[0]
+
+    def set_format(self, cmd: Dict[str, Any]) -> _Result:
+        """Команда format: меняет формат только этого соединения."""
+        if cmd["path"] is not None:
+            # Файл открывался бы сервером, а не клиентом
+            return False, ("Вывод в файл по сети недоступен: результат select "
+                           "возвращается клиенту")
+        if cmd["format"] is not None:
+            self.output_format = cmd["format"]
+        return True, f"Формат вывода select: {self.output_format}, вывод: stdout.\n"
+
+    def resolve(self, cmd: Dict[str, Any]) -> Dict[str, Any]:
+        """Подставить параметры execute (в том числе внутри explain)."""
+        if cmd["cmd"] == "execute":
+            return bind_prepared(self.prepared, cmd)
+        if cmd["cmd"] == "explain" and cmd["statement"]["cmd"] == "execute":
+            return {**cmd, "statement": bind_prepared(self.prepared,
+                                                      cmd["statement"])}
+        return cmd
+
+
+class Server:
+    """
+    Сервер над одним сеансом Session(defer_writes=True). Чтения выполняются
+    в пуле потоков под общей блокировкой чтения, пакет записи — в отдельном
+    потоке под исключительной, поэтому чтение всегда видит согласованное
+    состояние, а цикл событий не ждёт ни тех, ни других. Очередь записи
+    выполняет накопившиеся команды подряд и записывает их одним flush();
+    ответы на изменения отправляются только после записи на диск. Если коммит
+    не удался, изменения пакета отменяются и все его команды получают ошибку.
+    """
+
+    def __init__(self, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT,
+                 unix_path: Optional[str] = None,
+                 commit_delay: float = 0.0) -> None:
+        self.host = host
+        self.port = port
+        self.unix_path = unix_path
+        # Пауза перед коммитом, чтобы собрать в группу больше записей
+        self.commit_delay = commit_delay
+        self.session = Session(defer_writes=True)
+        self._queue: Optional[asyncio.Queue] = None
+        self._connections: Set[asyncio.StreamWriter] = set()
+        self._lock = _ReadWriteLock()
+        self._output: Optional[_ThreadOutput] = None
+        self._readers: Optional[ThreadPoolExecutor] = None
+        self._writer: Optional[ThreadPoolExecutor] = None
+
+    def _run(self, cmd: Dict[str, Any], output_format: Optional[str] = None,
+             read: bool = False) -> str:
+        """
+        Выполнить команду в сеансе и вернуть напечатанный ею текст. Формат
+        вывода передаётся с командой: формат сеанса общий для всех соединений.
+        Чтение (read=True) выполняется без блокировки сеанса — её заменяет
+        блокировка чтения сервера.
+        """
+        with self._output.capture() as buf:
+            try:
+                if read:
+                    self.session.execute_read(cmd, output_format)
+                else:
+                    self.session.execute(cmd, output_format)
+            except Exception as e:
+                # Ошибка одной команды не должна останавливать сервер
+                buf.write(f"Ошибка: {e}\n")
+        return buf.getvalue()
+
+    def _read(self, cmd: Dict[str, Any], output_format: str) -> str:
+        with self._lock.reading():
+            return self._run(cmd, output_format, read=True)
+
+    def _commit_batch(self, cmds: List[Dict[str, Any]]) -> List[_Result]:
+        """Выполнить пакет изменений и записать его одним коммитом."""
+        with self._lock.writing():
+            outputs = [self._run(cmd) for cmd in cmds]
+            try:
+                self.session.flush()
+            except Exception as e:
+                # Коммит не зафиксирован: память возвращается к состоянию на диске
+                logger.exception("Ошибка группового коммита")
+                self.session.discard_changes()
+                return [(False, f"Ошибка записи на диск: {e}")] * len(cmds)
+        return [(True, out) for out in outputs]
+
+    async def _write_loop(self) -> None:
+        while True:
+            item = await self._queue.get()
+            if item is None:
+                return
+            if self.commit_delay:
+                await asyncio.sleep(self.commit_delay)
+            batch = [item]
+            stop = False
+            while len(batch) < MAX_BATCH and not self._queue.empty():
+                item = self._queue.get_nowait()
+                if item is None:
+                    stop = True
+                    break
+                batch.append(item)
+            results = await asyncio.get_running_loop().run_in_executor(
+                self._writer, self._commit_batch, [cmd for cmd, _ in batch])
+            metrics.inc("server_group_commits")
+            metrics.inc("server_group_commit_writes", len(batch))
+            for (_, fut), result in zip(batch, results):
+                if not fut.done():
+                    fut.set_result(result)
+            if stop:
+                return
+
+    async def _dispatch(self, conn: _Connection, line: str) -> Optional[_Result]:
+        """Ответ на строку команды; None — клиент закрывает соединение."""
+        try:
+            cmd = parse_command(line)
+        except ValueError as ve:
+            return True, f"Ошибка: {ve}\n"
+        ctype = cmd["cmd"]
+        if ctype == "exit":
+            return None
+        if ctype in _TRANSACTION_COMMANDS:
+            return False, ("Транзакции недоступны по сети: каждая команда "
+                           "фиксируется отдельно")
+        if ctype == "format":
+            return conn.set_format(cmd)
+        if ctype == "prepare":
+            conn.prepared[cmd["name"]] = (cmd["statement"], cmd["params"])
+            return True, (f'Запрос "{cmd["name"]}" подготовлен '
+                          f'(параметров: {cmd["params"]}).\n')
+        try:
+            cmd = conn.resolve(cmd)
+        except ValueError as ve:
+            return True, f"Ошибка: {ve}\n"
+        loop = asyncio.get_running_loop()
+        if is_read(cmd):
+            return True, await loop.run_in_executor(self._readers, self._read, cmd,
+                                                    conn.output_format)
+        fut = loop.create_future()
+        await self._queue.put((cmd, fut))
+        return await fut
+
+    async def _handle(self, reader: asyncio.StreamReader,
+                      writer: asyncio.StreamWriter) -> None:
+        metrics.inc("server_connections")
+        self._connections.add(writer)
+        conn = _Connection()
+        try:
+            while True:
+                try:
+                    line = await reader.readline()
+                except ValueError:
+                    # Строка длиннее MAX_LINE_BYTES
+                    writer.write(encode_response(False, "Слишком длинная команда"))
+                    break
+                if not line:
+                    break
+                result = await self._dispatch(conn, line.decode("utf-8").strip())
+                if result is None:
+                    break
+                writer.write(encode_response(*result))
+                await writer.drain()
+        except (ConnectionError, UnicodeDecodeError):
+            pass
+        finally:
+            self._connections.discard(writer)
+            writer.close()
+
+    async def serve(self, ready: Optional[asyncio.Event] = None,
+                    stop: Optional[asyncio.Event] = None) -> None:
+        """Принимать соединения до сигнала SIGINT/SIGTERM (или события stop)."""
+        self._queue = asyncio.Queue()
+        writer_task = asyncio.create_task(self._write_loop())
+        if self.unix_path is not None:
+            server = await asyncio.start_unix_server(
+                self._handle, path=self.unix_path, limit=MAX_LINE_BYTES)
+            address = self.unix_path
+        else:
+            server = await asyncio.start_server(
+                self._handle, self.host, self.port, limit=MAX_LINE_BYTES)
+            address = f"{self.host}:{self.port}"
+        # Команды начнут выполняться не раньше следующего переключения цикла
+        self._output = _ThreadOutput(sys.stdout)
+        sys.stdout = self._output
+        self._readers = ThreadPoolExecutor(READ_THREADS, thread_name_prefix="db-read")
+        self._writer = ThreadPoolExecutor(1, thread_name_prefix="db-write")
+        stop = stop or asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            with contextlib.suppress(NotImplementedError, RuntimeError):
+                loop.add_signal_handler(sig, stop.set)
+        print(f"Сервер запущен: {address}.")
+        if ready is not None:
+            ready.set()
+        try:
+            await stop.wait()
+        finally:
+            server.close()
+            for writer in list(self._connections):
+                writer.close()
+            # Записи, уже стоящие в очереди, фиксируются до выхода
+            await self._queue.put(None)
+            await writer_task
+            self._readers.shutdown(wait=True)
+            self._writer.shutdown(wait=True)
+            sys.stdout = self._output.default
+            if self.unix_path is not None:
+                with contextlib.suppress(FileNotFoundError):
+                    os.unlink(self.unix_path)
+
+    def close(self) -> None:
+        self.session.close()
+
+
+def run_server(host: str = DEFAULT_HOST, port: int = DEFAULT_PORT,
+               unix_path: Optional[str] = None, commit_delay: float = 0.0,
+               confirm: bool = True) -> None:
+    """Запустить сервер; удаления подтверждаются политикой confirm."""
+    set_confirm_policy(confirm)
+    server = Server(host, port, unix_path=unix_path, commit_delay=commit_delay)
+    try:
+        asyncio.run(server.serve())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+    print("Сервер остановлен.")
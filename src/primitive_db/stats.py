@@ -0,0 +1,134 @@
+import hashlib
+import math
+from typing import Any, Dict, List, Optional
+
+# HyperLogLog с 2**_HLL_P регистрами: оценка числа различных значений
+# с погрешностью ~13% при 64 байтах на столбец
+_HLL_P = 6
+_HLL_M = 1 << _HLL_P
+_HLL_ALPHA = 0.709
+
+
+def _hash64(value: Any) -> int:
+    data = f"{type(value).__name__}:{value}".encode("utf-8")
+    return int.from_bytes(hashlib.blake2b(data, digest_size=8).digest(), "big")
+
+
+def _registers(col_stats: Dict[str, Any]) -> bytearray:
+    """
+    Регистры HyperLogLog столбца. В памяти это bytearray, в метаданных —
+    строка hex (прежний формат — список чисел); преобразуется при первом
+    обращении после загрузки.
+    """
+    registers = col_stats["hll"]
+    if not isinstance(registers, bytearray):
+        if isinstance(registers, str):
+            registers = bytearray.fromhex(registers)
+        else:
+            registers = bytearray(registers)
+        col_stats["hll"] = registers
+    return registers
+
+
+def _hll_add(registers: bytearray, value: Any) -> None:
+    h = _hash64(value)
+    idx = h & (_HLL_M - 1)
+    rest = h >> _HLL_P
+    rank = (64 - _HLL_P) - rest.bit_length() + 1
+    if rank > registers[idx]:
+        registers[idx] = rank
+
+
+def _hll_estimate(registers: bytearray) -> int:
+    raw = _HLL_ALPHA * _HLL_M * _HLL_M / sum(2.0 ** -r for r in registers)
+    zeros = registers.count(0)
+    if raw <= 2.5 * _HLL_M and zeros:
+        # Поправка для малых множеств (linear counting)
+        return round(_HLL_M * math.log(_HLL_M / zeros))
+    return round(raw)
+
+
+def _empty_column() -> Dict[str, Any]:
+    return {"min": None, "max": None, "hll": bytearray(_HLL_M)}
+
+
+def _observe(col_stats: Dict[str, Any], value: Any) -> None:
+    if value is None:
+        return
+    if col_stats["min"] is None or value < col_stats["min"]:
+        col_stats["min"] = value
+    if col_stats["max"] is None or value > col_stats["max"]:
+        col_stats["max"] = value
+    _hll_add(_registers(col_stats), value)
+
+
+def init_stats(schema: List[Dict[str, str]]) -> Dict[str, Any]:
+    return {
+        "rows": 0,
+        "next_id": 1,
+        "columns": {c["name"]: _empty_column() for c in schema},
+    }
+
+
+def build_stats(schema: List[Dict[str, str]],
+                rows: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Собрать статистику полным проходом (для таблиц, созданных без неё)."""
+    stats = init_stats(schema)
+    for row in rows:
+        on_insert(stats, row)
+    return stats
+
+
+def table_stats(metadata: Dict[str, Any], table_name: str,
+                rows: Optional[List[Dict[str, Any]]] = None) -> Dict[str, Any]:
+    """
+    Статистика таблицы из метаданных. Если переданы строки, за O(1) сверяет
+    с ними число строк и счётчик ID и при расхождении (таблицу правили извне,
+    сбой между записью журнала и метаданных) пересобирает статистику.
+    """
+    table_meta = metadata["tables"][table_name]
+    stats = table_meta.get("stats")
+    if rows is None:
+        if stats is None:
+            raise ValueError(f'Нет статистики по таблице "{table_name}"')
+        return stats
+    if (stats is None or stats["rows"] != len(rows)
+            or (rows and rows[-1]["ID"] >= stats["next_id"])):
+        rebuilt = build_stats(table_meta["structure"], rows)
+        if stats is not None:
+            # Не выдаём повторно ID удалённых строк
+            rebuilt["next_id"] = max(rebuilt["next_id"], stats["next_id"])
+        stats = rebuilt
+        table_meta["stats"] = stats
+    return stats
+
+
+def allocate_id(stats: Dict[str, Any]) -> int:
+    return stats["next_id"]
+
+
+def on_insert(stats: Dict[str, Any], row: Dict[str, Any]) -> None:
+    stats["rows"] += 1
+    stats["next_id"] = max(stats["next_id"], row["ID"] + 1)
+    columns = stats["columns"]
+    for name, value in row.items():
+        col_stats = columns.get(name)
+        if col_stats is not None:
+            _observe(col_stats, value)
+
+
+def on_update(stats: Dict[str, Any], set_clause: Dict[str, Any]) -> None:
+    # Старые значения не вычитаются: min/max остаются консервативными границами
+    for name, value in set_clause.items():
+        col_stats = stats["columns"].get(name)
+        if col_stats is not None:
+            _observe(col_stats, value)
+
+
+def on_delete(stats: Dict[str, Any], count: int) -> None:
+    stats["rows"] = max(0, stats["rows"] - count)
+
+
+def distinct_estimate(stats: Dict[str, Any], column: str) -> int:
+    est = _hll_estimate(_registers(stats["columns"][column]))
+    return min(est, stats["rows"])
@@ -0,0 +1,220 @@
+import json
+import mmap
+import struct
+from array import array
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from src.primitive_db import metrics
+
+# Строк на страницу бинарного файла
+PAGE_ROWS = 4096
+
+_MAGIC = b"PDBT"
+_VERSION = 1
+# magic, версия, длина схемы
+_FILE_HEADER = struct.Struct("<4sBI")
+# строк на странице, размер страницы в байтах, min ID, max ID
+_PAGE_HEADER = struct.Struct("<IIqq")
+# Ширина слота в байтах: int — int64, bool — байт,
+# str — (смещение, длина) в символах декодированной кучи страницы
+_SLOT_WIDTH = {"int": 8, "bool": 1, "str": 8}
+# Объявленная схема таблицы из метаданных: [{"name": ..., "type": ...}, ...]
+Schema = List[Dict[str, str]]
+# Диапазон ID (min, max) включительно
+IdRange = Tuple[int, int]
+
+
+class JsonBackend:
+    """Снимок таблицы — JSON-массив строк (формат по умолчанию)."""
+
+    name = "json"
+    suffix = ".json"
+    streaming = False
+
+    def load(self, path: str) -> List[Dict[str, Any]]:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def save(self, path: str, rows: List[Dict[str, Any]],
+             schema: Optional[Schema] = None) -> None:
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(rows, f, ensure_ascii=False, indent=2)
+
+    def iter_rows(self, path: str,
+                  id_range: Optional[IdRange] = None) -> Iterator[Dict[str, Any]]:
+        # JSON-массив нельзя разобрать частями — читаем целиком
+        yield from self.load(path)
+
+
+class JsonLinesBackend:
+    """Снимок таблицы — по одной JSON-строке на запись; читается построчно."""
+
+    name = "jsonl"
+    suffix = ".jsonl"
+    streaming = True
+
+    def load(self, path: str) -> List[Dict[str, Any]]:
+        return list(self.iter_rows(path))
+
+    def save(self, path: str, rows: List[Dict[str, Any]],
+             schema: Optional[Schema] = None) -> None:
+        with open(path, "w", encoding="utf-8") as f:
+            for row in rows:
+                f.write(json.dumps(row, ensure_ascii=False))
+                f.write("\n")
+
+    def iter_rows(self, path: str,
+                  id_range: Optional[IdRange] = None) -> Iterator[Dict[str, Any]]:
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+
+def _page_layout(rows: List[Dict[str, Any]],
+                 schema: Optional[Schema]) -> List[Tuple[str, str]]:
+    """Макет страниц: по объявленной схеме, без неё — по первой строке."""
+    if schema is not None:
+        return [(c["name"], c["type"]) for c in schema]
+    return _infer_schema(rows)
+
+
+def _infer_schema(rows: List[Dict[str, Any]]) -> List[Tuple[str, str]]:
+    if not rows:
+        return []
+    schema = []
+    for name, value in rows[0].items():
+        if isinstance(value, bool):
+            schema.append((name, "bool"))
+        elif isinstance(value, int):
+            schema.append((name, "int"))
+        elif isinstance(value, str):
+            schema.append((name, "str"))
+        else:
+            raise ValueError(f"Неподдерживаемый тип значения в столбце {name}")
+    return schema
+
+
+class BinaryBackend:
+    """
+    Бинарный страничный формат. После заголовка файла со схемой идут страницы:
+    заголовок (число строк, размер, min/max ID), массивы слотов фиксированной
+    ширины по каждому столбцу и куча строк страницы. Файл читается через mmap,
+    поэтому скан с диапазоном ID затрагивает только нужные страницы.
+    Макет страниц строится по объявленной схеме таблицы, если она передана.
+    """
+
+    name = "binary"
+    suffix = ".bin"
+    streaming = True
+
+    def save(self, path: str, rows: List[Dict[str, Any]],
+             schema: Optional[Schema] = None) -> None:
+        layout = _page_layout(rows, schema)
+        schema_bytes = json.dumps(layout).encode("utf-8")
+        with open(path, "wb") as f:
+            f.write(_FILE_HEADER.pack(_MAGIC, _VERSION, len(schema_bytes)))
+            f.write(schema_bytes)
+            for start in range(0, len(rows), PAGE_ROWS):
+                f.write(self._encode_page(layout, rows[start:start + PAGE_ROWS]))
+
+    def _encode_page(self, schema: List[Tuple[str, str]],
+                     rows: List[Dict[str, Any]]) -> bytes:
+        heap: List[str] = []
+        heap_len = 0
+        parts = []
+        for name, typ in schema:
+            try:
+                values = [r[name] for r in rows]
+            except KeyError:
+                raise ValueError(f"В строке нет столбца {name}") from None
+            if typ == "int":
+                parts.append(array("q", values).tobytes())
+            elif typ == "bool":
+                parts.append(bytes(1 if v else 0 for v in values))
+            else:
+                slots = array("I")
+                for v in values:
+                    slots.append(heap_len)
+                    slots.append(len(v))
+                    heap.append(v)
+                    heap_len += len(v)
+                parts.append(slots.tobytes())
+        body = b"".join(parts) + "".join(heap).encode("utf-8")
+        ids = [r.get("ID", 0) for r in rows]
+        header = _PAGE_HEADER.pack(len(rows), _PAGE_HEADER.size + len(body),
+                                   min(ids), max(ids))
+        return header + body
+
+    def _open(self, path: str) -> Tuple[mmap.mmap, List[Tuple[str, str]], int]:
+        with open(path, "rb") as f:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, schema_len = _FILE_HEADER.unpack_from(mm, 0)
+        if magic != _MAGIC or version != _VERSION:
+            mm.close()
+            raise ValueError(f"Файл {path} не является бинарной таблицей")
+        start = _FILE_HEADER.size
+        schema = [tuple(c) for c in json.loads(mm[start:start + schema_len])]
+        return mm, schema, start + schema_len
+
+    def _decode_page(self, mm: mmap.mmap, offset: int, count: int, size: int,
+                     schema: List[Tuple[str, str]]) -> List[Dict[str, Any]]:
+        pos = offset + _PAGE_HEADER.size
+        heap_start = pos + count * sum(_SLOT_WIDTH[t] for _, t in schema)
+        heap = None
+        columns = []
+        for _, typ in schema:
+            width = count * _SLOT_WIDTH[typ]
+            if typ == "int":
+                col = array("q")
+                col.frombytes(mm[pos:pos + width])
+            elif typ == "bool":
+                col = [b == 1 for b in mm[pos:pos + width]]
+            else:
+                if heap is None:
+                    heap = mm[heap_start:offset + size].decode("utf-8")
+                slots = array("I")
+                slots.frombytes(mm[pos:pos + width])
+                starts = slots[0::2]
+                col = [heap[a:a + n] for a, n in zip(starts, slots[1::2])]
+            columns.append(col)
+            pos += width
+        names = [name for name, _ in schema]
+        return [dict(zip(names, values)) for values in zip(*columns)]
+
+    def iter_pages(self, path: str,
+                   id_range: Optional[IdRange] = None
+                   ) -> Iterator[List[Dict[str, Any]]]:
+        """
+        Страницы таблицы по порядку. При заданном id_range (min, max)
+        страницы, не пересекающиеся с диапазоном, не декодируются.
+        """
+        mm, schema, offset = self._open(path)
+        try:
+            while offset < len(mm):
+                count, size, min_id, max_id = _PAGE_HEADER.unpack_from(mm, offset)
+                if id_range is None or (max_id >= id_range[0]
+                                        and min_id <= id_range[1]):
+                    metrics.inc("pages_read")
+                    yield self._decode_page(mm, offset, count, size, schema)
+                else:
+                    metrics.inc("pages_skipped")
+                offset += size
+        finally:
+            mm.close()
+
+    def load(self, path: str) -> List[Dict[str, Any]]:
+        rows: List[Dict[str, Any]] = []
+        for page in self.iter_pages(path):
+            rows.extend(page)
+        return rows
+
+    def iter_rows(self, path: str,
+                  id_range: Optional[IdRange] = None) -> Iterator[Dict[str, Any]]:
+        """Строки по порядку; с id_range — только со страниц из диапазона."""
+        for page in self.iter_pages(path, id_range):
+            yield from page
+
+
+BACKENDS = {b.name: b for b in (JsonBackend(), JsonLinesBackend(), BinaryBackend())}
+DEFAULT_BACKEND = "json"
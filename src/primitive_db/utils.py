@@ -1,14 +1,79 @@
 import json
 import os
-from typing import Any, Dict, List
+from bisect import bisect_left, bisect_right
+from operator import itemgetter
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Set
+
+from src.primitive_db import metrics
+from src.primitive_db.predicates import Predicate
+from src.primitive_db.storage import BACKENDS, DEFAULT_BACKEND, IdRange, Schema
 
 META_PATH = "db_meta.json"
 DATA_DIR = "data"
+LOG_SUFFIX = ".log"
+# Журнал сливается со снимком, когда становится больше самого снимка
+# (но не раньше, чем дорастёт до COMPACT_MIN_BYTES).
+COMPACT_MIN_BYTES = 64 * 1024
+# Журнал группового коммита: пока он существует, коммит считается начатым
+JOURNAL_NAME = "commit.journal"
+# Таблицы больше SEGMENT_ROWS строк хранятся сегментами: каталог
+# data/<table>.seg с манифестом и файлами по SEGMENT_ROWS строк. Слияние
+# журнала переписывает только сегменты, затронутые его записями.
+SEGMENT_ROWS = 64 * 1024
+SEGMENTS_SUFFIX = ".seg"
+MANIFEST_NAME = "manifest.json"
+
+
+def _fsync_dir(path: str) -> None:
+    """Сделать переименование в каталоге устойчивым к сбою (где это возможно)."""
+    try:
+        fd = os.open(os.path.dirname(path) or ".", os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def _atomic_write(path: str, write: Callable[[str], None]) -> None:
+    """
+    Записать файл атомарно: write() пишет во временный файл рядом с целевым,
+    затем fsync и rename. После сбоя на диске остаётся либо старая,
+    либо новая версия файла целиком.
+    """
+    tmp_path = path + ".tmp"
+    write(tmp_path)
+    with open(tmp_path, "rb") as f:
+        os.fsync(f.fileno())
+        metrics.inc("bytes_written", os.fstat(f.fileno()).st_size)
+    os.replace(tmp_path, path)
+    _fsync_dir(path)
+
+
+def _json_default(value: Any) -> Any:
+    # Регистры HyperLogLog статистики (bytearray) хранятся строкой hex
+    if isinstance(value, (bytes, bytearray)):
+        return value.hex()
+    raise TypeError(f"Значение типа {type(value).__name__} не сериализуется в JSON")
+
+
+def _write_json(data: Any, indent: Optional[int]) -> Callable[[str], None]:
+    def write(path: str) -> None:
+        # dumps, а не dump: dump всегда кодирует медленным кодировщиком на Python
+        text = json.dumps(data, ensure_ascii=False, indent=indent,
+                          default=_json_default)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(text)
+    return write
 
 
 def load_metadata(filepath: str = META_PATH) -> Dict[str, Any]:
     try:
         with open(filepath, "r", encoding="utf-8") as f:
+            metrics.inc("bytes_read", os.fstat(f.fileno()).st_size)
             return json.load(f)
     except FileNotFoundError:
         return {}
@@ -17,24 +82,566 @@ def load_metadata(filepath: str = META_PATH) -> Dict[str, Any]:
 def save_metadata(filepath: str = META_PATH, data: Dict[str, Any] = None) -> None:
     if data is None:
         data = {}
-    with open(filepath, "w", encoding="utf-8") as f:
-        json.dump(data, f, ensure_ascii=False, indent=4)
+    # Без отступов: метаданные переписываются при каждом коммите
+    _atomic_write(filepath, _write_json(data, None))
+
+
+def _snapshot_path(table_name: str, backend_name: str) -> str:
+    return os.path.join(DATA_DIR, f"{table_name}{BACKENDS[backend_name].suffix}")
+
+
+def _segments_dir(table_name: str) -> str:
+    return os.path.join(DATA_DIR, f"{table_name}{SEGMENTS_SUFFIX}")
+
+
+def _manifest_path(table_name: str) -> str:
+    return os.path.join(_segments_dir(table_name), MANIFEST_NAME)
+
+
+def load_manifest(table_name: str) -> Optional[Dict[str, Any]]:
+    """
+    Манифест сегментированной таблицы (None — таблица в одном файле):
+    формат сегментов, их размер и по каждому сегменту файл, первый ID
+    диапазона, число строк, размер файла и min/max каждого столбца.
+    """
+    try:
+        with open(_manifest_path(table_name), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def table_segments(table_name: str) -> List[Dict[str, Any]]:
+    manifest = load_manifest(table_name)
+    return [] if manifest is None else manifest["segments"]
+
+
+def table_backend(table_name: str) -> str:
+    """Формат хранения таблицы — из манифеста или по существующему файлу снимка."""
+    manifest = load_manifest(table_name)
+    if manifest is not None:
+        return manifest["backend"]
+    for name in BACKENDS:
+        if os.path.exists(_snapshot_path(table_name, name)):
+            return name
+    return DEFAULT_BACKEND
 
 
 def _table_path(table_name: str) -> str:
+    # Проверяется только наличие файлов: путь нужен при каждой сверке пула
+    manifest_path = _manifest_path(table_name)
+    if os.path.exists(manifest_path):
+        return manifest_path
+    for name in BACKENDS:
+        path = _snapshot_path(table_name, name)
+        if os.path.exists(path):
+            return path
+    return _snapshot_path(table_name, DEFAULT_BACKEND)
+
+
+def _log_path(table_name: str) -> str:
+    return os.path.join(DATA_DIR, f"{table_name}{LOG_SUFFIX}")
+
+
+def table_files(table_name: str) -> List[str]:
+    """Файлы, из которых собирается таблица: снимок и (последним) журнал."""
+    return [_table_path(table_name), _log_path(table_name)]
+
+
+def append_log(table_name: str, record: Dict[str, Any]) -> None:
+    """Дописать одну запись в журнал изменений таблицы (O(1) по размеру таблицы)."""
+    append_log_many(table_name, [record])
+
+
+def append_log_many(table_name: str, records: List[Dict[str, Any]]) -> None:
+    """Дописать пачку записей в журнал одной операцией записи."""
+    if not records:
+        return
+    data = "".join(json.dumps(r, ensure_ascii=False) + "\n"
+                   for r in records).encode("utf-8")
     os.makedirs(DATA_DIR, exist_ok=True)
-    return os.path.join(DATA_DIR, f"{table_name}.json")
+    with open(_log_path(table_name), "ab") as f:
+        f.write(data)
+    metrics.inc("bytes_written", len(data))
 
 
-def load_table_data(table_name: str) -> List[Dict[str, Any]]:
-    path = _table_path(table_name)
+def _read_log(table_name: str) -> List[Dict[str, Any]]:
+    """
+    Прочитать журнал изменений. Оборванная последняя запись (сбой во время
+    записи) отбрасывается, а файл обрезается до последней целой строки.
+    """
+    path = _log_path(table_name)
     if not os.path.exists(path):
         return []
-    with open(path, "r", encoding="utf-8") as f:
-        return json.load(f)
+    records = []
+    good_size = 0
+    with open(path, "rb") as f:
+        for line in f:
+            if not line.endswith(b"\n"):
+                break
+            try:
+                records.append(json.loads(line))
+            except json.JSONDecodeError:
+                break
+            good_size += len(line)
+    metrics.inc("bytes_read", good_size)
+    if good_size != os.path.getsize(path):
+        with open(path, "r+b") as f:
+            f.truncate(good_size)
+    return records
+
+
+def _apply_log_record(rows: List[Dict[str, Any]], record: Dict[str, Any],
+                      present: Set[int]) -> None:
+    """
+    Применить запись журнала. Повторное применение безопасно (insert уже
+    имеющегося ID пропускается), поэтому сбой между записью снимка
+    и удалением журнала не дублирует строки.
+    """
+    op = record.get("op")
+    if op == "insert":
+        row_id = record["row"]["ID"]
+        if row_id not in present:
+            rows.append(record["row"])
+            present.add(row_id)
+    elif op == "update":
+        ids = set(record["ids"])
+        changes = record["set"]
+        for r in rows:
+            if r.get("ID") in ids:
+                r.update(changes)
+    elif op == "delete":
+        ids = set(record["ids"])
+        rows[:] = [r for r in rows if r.get("ID") not in ids]
+        present -= ids
+    else:
+        raise ValueError(f"Неизвестная операция в журнале: {op}")
+
+
+def _segment_path(table_name: str, segment: Dict[str, Any]) -> str:
+    return os.path.join(_segments_dir(table_name), segment["file"])
+
+
+def _column_ranges(rows: List[Dict[str, Any]]) -> Dict[str, List[Any]]:
+    ranges = {}
+    for name in rows[0]:
+        try:
+            values = [r[name] for r in rows]
+            ranges[name] = [min(values), max(values)]
+        except (KeyError, TypeError):
+            # Столбец без значений в части строк или с несравнимыми значениями
+            continue
+    return ranges
+
+
+def _write_segment(table_name: str, manifest: Dict[str, Any],
+                   rows: List[Dict[str, Any]],
+                   schema: Optional[Schema] = None) -> Dict[str, Any]:
+    """Записать строки в новый файл сегмента и вернуть его описание."""
+    backend = BACKENDS[manifest["backend"]]
+    # Новое имя на каждую запись: старый файл нужен, пока манифест не заменён
+    name = f'{manifest["next_file"]:06d}{backend.suffix}'
+    manifest["next_file"] += 1
+    segment = {"file": name, "first_id": rows[0]["ID"], "rows": len(rows)}
+    path = _segment_path(table_name, segment)
+    _atomic_write(path, lambda tmp: backend.save(tmp, rows, schema))
+    segment["bytes"] = os.path.getsize(path)
+    segment["columns"] = _column_ranges(rows)
+    return segment
+
+
+def _chunks(rows: List[Dict[str, Any]], size: int) -> Iterator[List[Dict[str, Any]]]:
+    for start in range(0, len(rows), size):
+        yield rows[start:start + size]
+
+
+def _save_manifest(table_name: str, manifest: Dict[str, Any]) -> None:
+    """Атомарно заменить манифест и удалить файлы, на которые он не ссылается."""
+    path = _manifest_path(table_name)
+    _atomic_write(path, _write_json(manifest, None))
+    keep = {s["file"] for s in manifest["segments"]} | {MANIFEST_NAME}
+    for name in os.listdir(_segments_dir(table_name)):
+        if name not in keep:
+            os.remove(os.path.join(_segments_dir(table_name), name))
+
 
+def _write_segments(table_name: str, rows: List[Dict[str, Any]], backend: str,
+                    old: Optional[Dict[str, Any]] = None,
+                    schema: Optional[Schema] = None) -> None:
+    """Записать таблицу сегментами целиком."""
+    os.makedirs(_segments_dir(table_name), exist_ok=True)
+    manifest = {
+        "backend": backend,
+        "segment_rows": old["segment_rows"] if old else SEGMENT_ROWS,
+        "next_file": old["next_file"] if old else 1,
+        "segments": [],
+    }
+    for chunk in _chunks(rows, manifest["segment_rows"]):
+        manifest["segments"].append(_write_segment(table_name, manifest, chunk,
+                                                   schema))
+        metrics.inc("segments_written")
+    _save_manifest(table_name, manifest)
+    # Снимок в одном файле (если таблица была такой) больше не нужен
+    for name in BACKENDS:
+        path = _snapshot_path(table_name, name)
+        if os.path.exists(path):
+            os.remove(path)
 
-def save_table_data(table_name: str, data: List[Dict[str, Any]]) -> None:
-    path = _table_path(table_name)
-    with open(path, "w", encoding="utf-8") as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
+
+def _rewrite_segments(table_name: str, rows: List[Dict[str, Any]],
+                      manifest: Dict[str, Any],
+                      records: Iterable[Dict[str, Any]],
+                      schema: Optional[Schema] = None) -> None:
+    """
+    Переписать только сегменты, в диапазоны ID которых попадают записи
+    журнала. Строки таблицы упорядочены по ID, поэтому строки сегмента —
+    срез между первыми ID соседних сегментов. Новые строки дописываются
+    в последний сегмент; переполненный сегмент делится, опустевший удаляется.
+    """
+    segments = manifest["segments"]
+    if not segments:
+        _write_segments(table_name, rows, manifest["backend"], manifest, schema)
+        return
+    firsts = [s["first_id"] for s in segments]
+    dirty: Set[int] = set()
+    for record in records:
+        ids = [record["row"]["ID"]] if record["op"] == "insert" else record["ids"]
+        for row_id in ids:
+            dirty.add(max(0, bisect_right(firsts, row_id) - 1))
+    if not dirty:
+        return
+    key = itemgetter("ID")
+    size = manifest["segment_rows"]
+    new_segments = []
+    for i, segment in enumerate(segments):
+        if i not in dirty:
+            new_segments.append(segment)
+            continue
+        start = bisect_left(rows, firsts[i], key=key) if i else 0
+        stop = (bisect_left(rows, firsts[i + 1], key=key)
+                if i + 1 < len(segments) else len(rows))
+        for chunk in _chunks(rows[start:stop], size):
+            new_segments.append(_write_segment(table_name, manifest, chunk,
+                                               schema))
+            metrics.inc("segments_written")
+    manifest["segments"] = new_segments
+    _save_manifest(table_name, manifest)
+
+
+def _load_segments(table_name: str, manifest: Dict[str, Any]) -> List[Dict[str, Any]]:
+    backend = BACKENDS[manifest["backend"]]
+    rows: List[Dict[str, Any]] = []
+    for segment in manifest["segments"]:
+        rows.extend(backend.load(_segment_path(table_name, segment)))
+        metrics.inc("bytes_read", segment["bytes"])
+    return rows
+
+
+def _comparable(value: Any, bound: Any) -> bool:
+    return type(value) is type(bound)
+
+
+def segment_may_match(segment: Dict[str, Any], where: Predicate) -> bool:
+    """Могут ли строки сегмента подойти под where (по min/max столбцов)."""
+    columns = segment["columns"]
+    for column, value in where.equalities.items():
+        bounds = columns.get(column)
+        if (bounds is not None and _comparable(value, bounds[0])
+                and not bounds[0] <= value <= bounds[1]):
+            return False
+    for column, (lo, lo_incl, hi, hi_incl) in where.ranges.items():
+        bounds = columns.get(column)
+        if bounds is None:
+            continue
+        cmin, cmax = bounds
+        if lo is not None and _comparable(lo, cmax) and (
+                cmax < lo or (cmax == lo and not lo_incl)):
+            return False
+        if hi is not None and _comparable(hi, cmin) and (
+                cmin > hi or (cmin == hi and not hi_incl)):
+            return False
+    return True
+
+
+def _id_range(where: Optional[Predicate]) -> Optional[IdRange]:
+    """
+    Границы ID (включительно) из условий верхнего уровня where: по ним
+    бинарный формат пропускает страницы, не декодируя их.
+    """
+    if where is None:
+        return None
+    value = where.equalities.get("ID")
+    if isinstance(value, int) and not isinstance(value, bool):
+        return value, value
+    bounds = where.ranges.get("ID")
+    if bounds is None:
+        return None
+    lo, lo_incl, hi, hi_incl = bounds
+    low = -2 ** 63 if lo is None else (lo if lo_incl else lo + 1)
+    high = 2 ** 63 - 1 if hi is None else (hi if hi_incl else hi - 1)
+    return low, high
+
+
+def load_table_data(table_name: str) -> List[Dict[str, Any]]:
+    manifest = load_manifest(table_name)
+    backend = table_backend(table_name)
+    path = _snapshot_path(table_name, backend)
+    rows: List[Dict[str, Any]] = []
+    if manifest is not None:
+        rows = _load_segments(table_name, manifest)
+    elif os.path.exists(path):
+        rows = BACKENDS[backend].load(path)
+        metrics.inc("bytes_read", os.path.getsize(path))
+    # Догоняем снимок записями журнала
+    records = _read_log(table_name)
+    if records:
+        present = {r.get("ID") for r in rows}
+        for record in records:
+            _apply_log_record(rows, record, present)
+    return rows
+
+
+def can_stream(table_name: str) -> bool:
+    """
+    Умеет ли формат таблицы отдавать строки, не читая файл целиком.
+    Сегментированная таблица читается по сегменту в любом формате.
+    """
+    if os.path.exists(_manifest_path(table_name)):
+        return True
+    return BACKENDS[table_backend(table_name)].streaming
+
+
+def _snapshot_rows(table_name: str, where: Optional[Predicate],
+                   pinned: List[int]) -> Iterator[Dict[str, Any]]:
+    """
+    Строки снимка по порядку. Сегменты, которые по min/max столбцов
+    не могут подойти под where, пропускаются — кроме тех, в диапазоне ID
+    которых есть строки, изменённые журналом (pinned, по возрастанию).
+    Границы ID из where передаются формату: бинарный пропускает страницы
+    вне диапазона (ID не меняется, так что журнал этому не мешает).
+    """
+    id_range = _id_range(where)
+    manifest = load_manifest(table_name)
+    if manifest is None:
+        backend = table_backend(table_name)
+        path = _snapshot_path(table_name, backend)
+        if os.path.exists(path):
+            metrics.inc("bytes_read", os.path.getsize(path))
+            yield from BACKENDS[backend].iter_rows(path, id_range)
+        return
+    backend = BACKENDS[manifest["backend"]]
+    segments = manifest["segments"]
+    for i, segment in enumerate(segments):
+        if where is not None and not segment_may_match(segment, where):
+            lo = bisect_left(pinned, segment["first_id"]) if i else 0
+            hi = (bisect_left(pinned, segments[i + 1]["first_id"])
+                  if i + 1 < len(segments) else len(pinned))
+            if lo == hi:
+                metrics.inc("segments_skipped")
+                continue
+        metrics.inc("segments_read")
+        metrics.inc("bytes_read", segment["bytes"])
+        yield from backend.iter_rows(_segment_path(table_name, segment), id_range)
+
+
+def iter_table_rows(table_name: str,
+                    where: Optional[Predicate] = None) -> Iterator[Dict[str, Any]]:
+    """
+    Потоково отдать строки таблицы с учётом журнала. В памяти держится только
+    сводка журнала (его размер ограничен компактацией), а не вся таблица.
+    С where сегменты и страницы, заведомо не содержащие подходящих строк,
+    не читаются; сами строки условием не фильтруются.
+    """
+    inserted: Dict[int, Dict[str, Any]] = {}
+    changes: Dict[int, Dict[str, Any]] = {}
+    deleted = set()
+    for record in _read_log(table_name):
+        op = record.get("op")
+        if op == "insert":
+            inserted[record["row"]["ID"]] = record["row"]
+        elif op == "update":
+            for row_id in record["ids"]:
+                if row_id in inserted:
+                    inserted[row_id].update(record["set"])
+                else:
+                    changes.setdefault(row_id, {}).update(record["set"])
+        elif op == "delete":
+            for row_id in record["ids"]:
+                if inserted.pop(row_id, None) is None:
+                    deleted.add(row_id)
+        else:
+            raise ValueError(f"Неизвестная операция в журнале: {op}")
+
+    pinned = sorted(changes.keys() | inserted.keys())
+    for row in _snapshot_rows(table_name, where, pinned):
+        row_id = row.get("ID")
+        if row_id in deleted:
+            continue
+        if row_id in changes:
+            row.update(changes[row_id])
+        # Строка уже в снимке (сбой до удаления журнала) — не дублируем
+        inserted.pop(row_id, None)
+        yield row
+    yield from inserted.values()
+
+
+def _remove_log(table_name: str) -> None:
+    # Снимок содержит все изменения — журнал больше не нужен
+    log_path = _log_path(table_name)
+    if os.path.exists(log_path):
+        os.remove(log_path)
+
+
+def _write_snapshot(table_name: str, data: List[Dict[str, Any]],
+                    backend: str, schema: Optional[Schema] = None) -> None:
+    """Записать снимок целиком: сегментами или одним файлом."""
+    manifest = load_manifest(table_name)
+    if manifest is not None or len(data) > SEGMENT_ROWS:
+        _write_segments(table_name, data, backend, manifest, schema)
+        return
+    _atomic_write(_snapshot_path(table_name, backend),
+                  lambda path: BACKENDS[backend].save(path, data, schema))
+
+
+def save_table_data(table_name: str, data: List[Dict[str, Any]],
+                    schema: Optional[Schema] = None) -> None:
+    """
+    Переписать снимок таблицы целиком (все сегменты) и удалить журнал.
+    schema — объявленная схема таблицы (по ней строится макет страниц
+    бинарного формата).
+    """
+    backend = table_backend(table_name)
+    if not isinstance(data, list):
+        # Колоночная таблица и другие представления сохраняются как список строк
+        data = list(data)
+    os.makedirs(DATA_DIR, exist_ok=True)
+    _write_snapshot(table_name, data, backend, schema)
+    _remove_log(table_name)
+
+
+def save_table_changes(table_name: str, data: List[Dict[str, Any]],
+                       pending: Iterable[Dict[str, Any]] = (),
+                       schema: Optional[Schema] = None) -> None:
+    """
+    Слить журнал таблицы (и ещё не записанные изменения pending) в снимок.
+    Сегментированная таблица переписывает только затронутые сегменты,
+    таблица в одном файле — файл целиком.
+    """
+    manifest = load_manifest(table_name)
+    if manifest is None:
+        save_table_data(table_name, data, schema)
+        return
+    if not isinstance(data, list):
+        data = list(data)
+    records = _read_log(table_name) + list(pending)
+    _rewrite_segments(table_name, data, manifest, records, schema)
+    _remove_log(table_name)
+
+
+def convert_table(table_name: str, backend_name: str,
+                  schema: Optional[Schema] = None) -> None:
+    """Перевести таблицу (снимок вместе с журналом) в другой формат хранения."""
+    if backend_name not in BACKENDS:
+        raise ValueError(f"Неизвестный формат хранения: {backend_name} "
+                         f"(доступны: {', '.join(BACKENDS)})")
+    old_backend = table_backend(table_name)
+    rows = load_table_data(table_name)
+    os.makedirs(DATA_DIR, exist_ok=True)
+    _write_snapshot(table_name, rows, backend_name, schema)
+    if old_backend != backend_name:
+        old_path = _snapshot_path(table_name, old_backend)
+        if os.path.exists(old_path):
+            os.remove(old_path)
+    _remove_log(table_name)
+
+
+def needs_compaction(table_name: str) -> bool:
+    log_path = _log_path(table_name)
+    if not os.path.exists(log_path):
+        return False
+    manifest = load_manifest(table_name)
+    if manifest is not None:
+        snapshot_size = sum(s["bytes"] for s in manifest["segments"])
+    else:
+        path = _table_path(table_name)
+        snapshot_size = os.path.getsize(path) if os.path.exists(path) else 0
+    return os.path.getsize(log_path) > max(COMPACT_MIN_BYTES, snapshot_size)
+
+
+def compact_if_needed(table_name: str, rows: List[Dict[str, Any]],
+                      schema: Optional[Schema] = None) -> bool:
+    """Слить журнал со снимком, если журнал разросся. Возвращает True при слиянии."""
+    if not needs_compaction(table_name):
+        return False
+    save_table_changes(table_name, rows, schema=schema)
+    return True
+
+
+def _journal_path() -> str:
+    return os.path.join(DATA_DIR, JOURNAL_NAME)
+
+
+def _apply_journal(journal: Dict[str, Any]) -> None:
+    # Журнал таблицы обрезается до длины на момент коммита, поэтому
+    # повторное применение (восстановление после сбоя) ничего не дублирует
+    for table_name, part in journal["logs"].items():
+        data = "".join(json.dumps(r, ensure_ascii=False) + "\n"
+                       for r in part["records"]).encode("utf-8")
+        path = _log_path(table_name)
+        with open(path, "ab") as f:
+            f.truncate(part["offset"])
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        metrics.inc("bytes_written", len(data))
+    if journal.get("metadata") is not None:
+        save_metadata(journal["meta_path"], journal["metadata"])
+
+
+def commit_group(logs: Dict[str, List[Dict[str, Any]]], meta_path: str = META_PATH,
+                 metadata: Optional[Dict[str, Any]] = None) -> None:
+    """
+    Атомарно записать изменения нескольких таблиц и метаданные. Сначала
+    на диск (fsync + rename) ложится журнал коммита со всеми изменениями —
+    это точка фиксации; затем изменения применяются к файлам, и журнал
+    удаляется. После сбоя recover() доводит начатый коммит до конца.
+    """
+    os.makedirs(DATA_DIR, exist_ok=True)
+    # Прошлый коммит зафиксирован, но не применён (ошибка записи) —
+    # доводим его до конца, иначе новый журнал его затрёт
+    recover()
+    journal = {
+        "logs": {
+            table_name: {
+                "offset": (os.path.getsize(_log_path(table_name))
+                           if os.path.exists(_log_path(table_name)) else 0),
+                "records": records,
+            }
+            for table_name, records in logs.items() if records
+        },
+        "meta_path": meta_path,
+        "metadata": metadata,
+    }
+    path = _journal_path()
+    _atomic_write(path, _write_json(journal, None))
+    _apply_journal(journal)
+    os.remove(path)
+    _fsync_dir(path)
+
+
+def commit_started() -> bool:
+    """Есть зафиксированный, но не доведённый до конца коммит."""
+    return os.path.exists(_journal_path())
+
+
+def recover() -> bool:
+    """Довести до конца коммит, прерванный сбоем. True — если он был."""
+    path = _journal_path()
+    if not os.path.exists(path):
+        return False
+    with open(path, "r", encoding="utf-8") as f:
+        journal = json.load(f)
+    _apply_journal(journal)
+    os.remove(path)
+    _fsync_dir(path)
+    return True
@@ -0,0 +1,44 @@
+import pytest
+
+from src.decorators import set_confirm_policy
+from src.primitive_db import metrics, parser
+from src.primitive_db.engine import Session
+
+
+@pytest.fixture(autouse=True)
+def db_dir(tmp_path, monkeypatch):
+    """Каждый тест работает с БД в своём пустом каталоге."""
+    monkeypatch.chdir(tmp_path)
+    # Удаления подтверждаются автоматически, как в пакетном режиме
+    set_confirm_policy(True)
+    yield tmp_path
+    set_confirm_policy(None)
+    parser._cache.clear()
+
+
+@pytest.fixture
+def session():
+    s = Session()
+    yield s
+    s.close()
+
+
+@pytest.fixture
+def counters():
+    """Включённые метрики; счётчики очищаются до и после теста."""
+    metrics.set_enabled(True)
+    metrics.REGISTRY.reset()
+    yield metrics.REGISTRY.counters
+    metrics.set_enabled(False)
+    metrics.REGISTRY.reset()
+
+
+@pytest.fixture
+def users(session):
+    """Сеанс с таблицей users из пяти строк."""
+    values = ", ".join(f'("{name}", {age}, {str(age % 2 == 0).lower()})'
+                       for name, age in [("Ann", 30), ("Bob", 25), ("Alex", 41),
+                                         ("Kate", 30), ("Max", 18)])
+    session.execute_line("create_table users name:str age:int active:bool")
+    session.execute_line(f"insert into users values {values}")
+    return session
@@ -0,0 +1,26 @@
+import csv
+import io
+
+
+def run(session, *lines):
+    """Выполнить команды в сеансе."""
+    for line in lines:
+        session.execute_line(line)
+
+
+def query(session, capsys, line):
+    """Выполнить select и вернуть строки результата (значения — текстом) в CSV."""
+    capsys.readouterr()
+    saved = session.output_format
+    session.output_format = "csv"
+    try:
+        session.execute_line(line)
+    finally:
+        session.output_format = saved
+    out = capsys.readouterr().out
+    return list(csv.reader(io.StringIO(out)))[1:]
+
+
+def ids(session, capsys, line):
+    """ID строк результата select по порядку."""
+    return [int(r[0]) for r in query(session, capsys, line)]
@@ -0,0 +1,8 @@
+from tests.helpers import query
+
+
+def test_aggregates(users, capsys):
+    assert query(users, capsys, "select count(*), sum(age), min(name), max(age), "
+                 "avg(age) from users") == [["5", "144", "Alex", "41", "28.8"]]
+    assert query(users, capsys, "select age, count(*) from users group by age "
+                 "order by count(*) desc limit 1") == [["30", "2"]]
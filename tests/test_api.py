@@ -0,0 +1,100 @@
+import json
+import logging
+import os
+
+import pytest
+
+from src.primitive_db import utils
+from src.primitive_db.api import Database, DatabaseError
+
+
+@pytest.fixture
+def db():
+    database = Database(autocommit=True)
+    database.execute("create_table users name:str age:int")
+    yield database
+    database.close()
+
+
+def _names(db):
+    return [name for _, name, _ in db.execute("select from users")]
+
+
+def test_select_returns_tuples(db):
+    cur = db.executemany("insert into users values (?, ?)", [("Ann", 30), ("Bob", 25)])
+    assert (cur.rowcount, cur.lastrowid) == (2, 2)
+    cur = db.execute("select from users where age > ?", (26,))
+    assert cur.columns == ("ID", "name", "age")
+    assert cur.fetchall() == [(1, "Ann", 30)]
+
+
+@pytest.mark.parametrize("sql", [
+    "create_table users name:str",
+    "create_index users missing",
+    "drop_index users age",
+    "info nothing",
+    "explain select from users where missing = 1",
+    'insert into users values ("Ann", "old")',
+    "select from nothing",
+])
+def test_errors_raise(db, capsys, sql):
+    with pytest.raises(DatabaseError) as info:
+        db.execute(sql)
+    assert isinstance(info.value.__cause__, (ValueError, KeyError))
+    assert "Ошибка" not in capsys.readouterr().out
+
+
+def test_create_index_output(db):
+    lines = [line for (line,) in db.execute("create_index users age")]
+    assert lines == ['Индекс (hash) по столбцу "age" таблицы "users" успешно создан.']
+    with pytest.raises(DatabaseError, match="уже существует"):
+        db.execute("create_index users age")
+
+
+def test_executemany_is_atomic_with_autocommit(db):
+    db.execute('insert into users values ("Ann", 30)')
+    with pytest.raises(DatabaseError):
+        # Второй набор не проходит проверку условия после первого изменения
+        db.executemany("update users set age = ? where name = ?",
+                       [(31, "Ann"), (32, 5)])
+    assert db.execute("select from users").fetchall() == [(1, "Ann", 30)]
+
+
+def test_load_failure_leaves_no_rows(db, tmp_path):
+    bad = tmp_path / "bad.csv"
+    bad.write_text("name,age\nAnn,30\nBob,x\n", encoding="utf-8")
+    with pytest.raises(DatabaseError, match="Строка 3"):
+        db.execute(f"load users from {bad}")
+    assert _names(db) == []
+    good = tmp_path / "good.csv"
+    good.write_text("name,age\nAnn,30\nBob,25\n", encoding="utf-8")
+    cur = db.execute(f"load users from {good}")
+    assert (cur.rowcount, cur.lastrowid) == (2, 2)
+    assert _names(db) == ["Ann", "Bob"]
+
+
+def test_rollback_discards_transaction():
+    with Database() as db:
+        db.execute("create_table users name:str age:int")
+    db = Database()
+    db.execute('insert into users values ("Ann", 30)')
+    assert db.in_transaction
+    db.rollback()
+    assert db.execute("select from users").fetchall() == []
+    db.close()
+
+
+def test_recovery_is_logged_not_printed(capsys, caplog):
+    with open(utils.META_PATH, "w", encoding="utf-8") as f:
+        json.dump({"tables": {}}, f)
+    journal = {"logs": {}, "meta_path": utils.META_PATH,
+               "metadata": {"tables": {"t": {"structure": []}}}}
+    os.makedirs(utils.DATA_DIR)
+    with open(utils._journal_path(), "w", encoding="utf-8") as f:
+        json.dump(journal, f)
+    with caplog.at_level(logging.WARNING):
+        db = Database()
+    assert capsys.readouterr().out == ""
+    assert "Восстановлен коммит" in caplog.text
+    assert "t" in [name for (name,) in db.execute("list_tables")]
+    db.close()
@@ -0,0 +1,101 @@
+import pytest
+
+from src.primitive_db import buffer_pool, utils
+from src.primitive_db.buffer_pool import TablePool
+from src.primitive_db.utils import (
+    META_PATH,
+    commit_started,
+    load_table_data,
+    save_table_data,
+)
+
+
+def _rows(n):
+    return [{"ID": i, "name": f"user{i}"} for i in range(1, n + 1)]
+
+
+def test_get_keeps_table_resident():
+    save_table_data("t", _rows(3))
+    pool = TablePool()
+    rows = pool.get("t")
+    assert pool.get("t") is rows
+    assert (pool.hits, pool.misses) == (1, 1)
+
+
+def test_get_rereads_table_changed_on_disk():
+    save_table_data("t", _rows(3))
+    pool = TablePool()
+    pool.get("t")
+    save_table_data("t", _rows(5))
+    assert len(pool.get("t")) == 5
+    assert pool.misses == 2
+
+
+def test_get_stats_files_once_per_call(monkeypatch):
+    save_table_data("t", _rows(3))
+    calls = []
+    real_stamp = buffer_pool._stamp
+    monkeypatch.setattr(buffer_pool, "_stamp",
+                        lambda name: calls.append(name) or real_stamp(name))
+    pool = TablePool()
+    pool.get("t")
+    pool.get("t")
+    assert calls == ["t", "t"]
+
+
+def _failing(exc_type=OSError):
+    def fail(*_args, **_kwargs):
+        raise exc_type("диск недоступен")
+    return fail
+
+
+def _insert(pool, row_id):
+    pool.get("t").append({"ID": row_id, "name": f"user{row_id}"})
+    pool.log("t", {"op": "insert", "row": {"ID": row_id, "name": f"user{row_id}"}})
+
+
+def test_failed_commit_keeps_pending(monkeypatch):
+    save_table_data("t", _rows(3))
+    pool = TablePool(defer_writes=True)
+    _insert(pool, 4)
+    with monkeypatch.context() as m:
+        m.setattr(buffer_pool, "commit_group", _failing())
+        with pytest.raises(OSError):
+            pool.commit(META_PATH)
+    assert pool.pending_bytes > 0
+    pool.commit(META_PATH)
+    assert pool.pending_bytes == 0
+    assert [r["ID"] for r in load_table_data("t")] == [1, 2, 3, 4]
+
+
+def test_commit_fixed_by_journal_is_not_repeated(monkeypatch):
+    save_table_data("t", _rows(3))
+    pool = TablePool(defer_writes=True)
+    _insert(pool, 4)
+    # Журнал коммита записан, применить его не удалось
+    with monkeypatch.context() as m:
+        m.setattr(utils, "_apply_journal", _failing(RuntimeError))
+        # Коммит зафиксирован журналом: ошибка применения не выдаётся
+        pool.commit(META_PATH)
+    assert pool.pending_bytes == 0 and commit_started()
+    assert [r["ID"] for r in pool.get("t")] == [1, 2, 3, 4]
+    _insert(pool, 5)
+    pool.commit(META_PATH)
+    assert not commit_started()
+    assert [r["ID"] for r in load_table_data("t")] == [1, 2, 3, 4, 5]
+
+
+def test_evict_sums_pool_once(monkeypatch):
+    for name in ("a", "b", "c", "d"):
+        save_table_data(name, _rows(50))
+    pool = TablePool()
+    for name in ("a", "b", "c", "d"):
+        pool.get(name)
+    calls = []
+    real_usage = TablePool.memory_usage
+    monkeypatch.setattr(TablePool, "memory_usage",
+                        lambda self: calls.append(1) or real_usage(self))
+    pool.max_bytes = pool._entries["d"].nbytes
+    pool._evict()
+    assert list(pool._entries) == ["d"] and pool.evictions == 3
+    assert len(calls) == 1
@@ -0,0 +1,11 @@
+from tests.helpers import ids, query, run
+
+
+def test_columnar_layout_matches_rows(users, capsys):
+    where = "select from users where age >= 25 and active = true"
+    expected = ids(users, capsys, where)
+    run(users, "set_layout users columnar",
+        "update users set age = 31 where name = \"Kate\"",
+        "delete from users where ID = 1")
+    assert ids(users, capsys, where) == [i for i in expected if i != 1]
+    assert query(users, capsys, "select from users where ID = 4")[0][2] == "31"
@@ -0,0 +1,36 @@
+from src.primitive_db.engine import run_script
+from src.primitive_db.utils import load_table_data
+from tests.helpers import run
+
+
+def test_messages_name_the_table(session, capsys):
+    run(session, "create_table users name:str")
+    capsys.readouterr()
+    run(session, 'insert into users values ("Ann")')
+    assert 'в таблицу "users"' in capsys.readouterr().out
+    run(session, "delete from users where ID = 1")
+    assert 'из таблицы "users"' in capsys.readouterr().out
+
+
+def test_wrong_value_type_is_reported(session, capsys):
+    run(session, "create_table users name:str age:int",
+        'insert into users values ("Ann", 30)')
+    capsys.readouterr()
+    run(session, 'update users set age = "old" where ID = 1')
+    assert "получено str" in capsys.readouterr().out
+
+
+def test_wrong_value_count_is_reported(session, capsys):
+    run(session, "create_table users name:str age:int")
+    capsys.readouterr()
+    run(session, 'insert into users values ("Ann")')
+    assert "Ожидалось значений: 2, получено: 1" in capsys.readouterr().out
+
+
+def test_run_script(capsys):
+    script = ["-- схема", "create_table t name:str;", "",
+              '# данные', 'insert into t values ("a");', "select from t", "exit",
+              'insert into t values ("never")']
+    run_script(script, quiet=True, output_format="csv")
+    assert capsys.readouterr().out.splitlines()[-2:] == ["ID,name", "1,a"]
+    assert [r["name"] for r in load_table_data("t")] == ["a"]
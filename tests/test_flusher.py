@@ -0,0 +1,56 @@
+import threading
+import time
+
+from src.primitive_db import buffer_pool
+from src.primitive_db.engine import Session
+from src.primitive_db.flusher import Flusher
+from src.primitive_db.utils import load_table_data
+from tests.helpers import run
+
+
+def _wait(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise AssertionError("условие не выполнилось за отведённое время")
+        time.sleep(0.005)
+
+
+def test_flusher_records_any_error():
+    def flush():
+        raise RuntimeError("сбой")
+
+    flusher = Flusher(flush, lambda: 0, threading.RLock(), interval=0.01)
+    flusher.start()
+    _wait(lambda: flusher.error is not None)
+    flusher.stop()
+    assert isinstance(flusher.take_error(), RuntimeError)
+    assert flusher.take_error() is None
+
+
+def test_background_write_by_threshold(capsys):
+    session = Session(flush_interval=60, max_dirty_bytes=1)
+    run(session, "create_table t name:str", 'insert into t values ("a")')
+    _wait(lambda: session.pool.pending_bytes == 0
+          and len(load_table_data("t")) == 1)
+    session.close()
+
+
+def test_background_error_reaches_next_command(monkeypatch, capsys):
+    session = Session(flush_interval=60, max_dirty_bytes=1)
+    run(session, "create_table t name:str")
+    with monkeypatch.context() as m:
+        m.setattr(buffer_pool, "commit_group", _raise_oserror)
+        run(session, 'insert into t values ("a")')
+        _wait(lambda: session._flusher.error is not None)
+    capsys.readouterr()
+    run(session, "list_tables")
+    assert "Фоновая запись не удалась" in capsys.readouterr().out
+    # Изменения не потеряны: следующая запись их сохраняет
+    run(session, "sync")
+    assert [r["name"] for r in load_table_data("t")] == ["a"]
+    session.close()
+
+
+def _raise_oserror(*_args, **_kwargs):
+    raise OSError("диск недоступен")
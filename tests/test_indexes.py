@@ -0,0 +1,62 @@
+from src.primitive_db.core import delete
+from src.primitive_db.indexes import TableIndexes
+from src.primitive_db.parser import parse_command
+from src.primitive_db.predicates import compile_where
+from tests.helpers import run
+
+SCHEMA = [{"name": "ID", "type": "int"}, {"name": "name", "type": "str"},
+          {"name": "age", "type": "int"}]
+
+
+class _NoScan(list):
+    """Таблица, обход которой целиком считается ошибкой."""
+
+    def __iter__(self):
+        raise AssertionError("таблица просмотрена целиком")
+
+
+def _where(text):
+    return compile_where(parse_command(f"select from t where {text}")["where"],
+                         SCHEMA)
+
+
+def _table(n):
+    rows = [{"ID": i, "name": f"user{i}", "age": i % 10} for i in range(1, n + 1)]
+    return rows, TableIndexes(rows, ["name"])
+
+
+def test_lookup_by_hash_index():
+    rows, indexes = _table(100)
+    assert [r["ID"] for r in indexes.lookup({"name": "user7"})] == [7]
+    assert indexes.lookup({"age": 3}) is None
+
+
+def test_indexed_delete_does_not_scan_table():
+    rows, indexes = _table(1000)
+    table = _NoScan(rows)
+    ids = []
+    assert delete(table, _where('name = "user500"'), affected=ids,
+                  indexes=indexes) == 1
+    assert ids == [500]
+    assert len(table) == 999
+    assert list.__getitem__(table, 499)["ID"] == 501
+    assert indexes.lookup({"name": "user500"}) == []
+    assert 500 not in indexes.pk
+
+
+def test_delete_by_id_keeps_order():
+    rows, indexes = _table(10)
+    for row_id in (3, 7, 1):
+        delete(rows, _where(f"ID = {row_id}"), indexes=indexes)
+    assert [r["ID"] for r in rows] == [2, 4, 5, 6, 8, 9, 10]
+
+
+def test_select_and_delete_through_index(session, capsys):
+    run(session, "create_table t name:str age:int",
+        'insert into t values ("a", 1), ("b", 2), ("a", 3)',
+        "create_index t name",
+        'delete from t where name = "a"',
+        "select from t")
+    out = capsys.readouterr().out
+    assert "Удалено записей: 2." in out
+    assert "| 2  |  b   |  2  |" in out
@@ -0,0 +1,27 @@
+from tests.helpers import ids, query, run
+
+
+def test_multi_row_insert_is_validated_as_a_whole(session, capsys):
+    run(session, "create_table t name:str age:int",
+        'insert into t values ("a", 1), ("b", 2)',
+        'insert into t values ("c", 3), ("d", "x")')
+    assert ids(session, capsys, "select from t") == [1, 2]
+
+
+def test_load_csv_and_jsonl(session, capsys, tmp_path):
+    (tmp_path / "a.csv").write_text("age,name\n1,a\n2,b\n", encoding="utf-8")
+    (tmp_path / "b.jsonl").write_text('{"name": "c", "age": 3}\n["d", 4]\n',
+                                      encoding="utf-8")
+    run(session, "create_table t name:str age:int",
+        f"load t from {tmp_path / 'a.csv'}", f"load t from {tmp_path / 'b.jsonl'}")
+    assert query(session, capsys, "select from t") == [
+        ["1", "a", "1"], ["2", "b", "2"], ["3", "c", "3"], ["4", "d", "4"]]
+
+
+def test_load_stops_at_bad_row(session, capsys, tmp_path):
+    (tmp_path / "bad.csv").write_text("name,age\na,1\nb,x\n", encoding="utf-8")
+    run(session, "create_table t name:str age:int")
+    capsys.readouterr()
+    run(session, f"load t from {tmp_path / 'bad.csv'}")
+    out = capsys.readouterr().out
+    assert "Строка 3 файла" in out and "Загрузка прервана." in out
@@ -0,0 +1,12 @@
+from tests.helpers import query, run
+
+
+def test_join(users, capsys):
+    run(users, "create_table orders user_id:int item:str",
+        'insert into orders values (1, "pen"), (3, "book"), (1, "cup"), (9, "x")')
+    rows = query(users, capsys, "select from users join orders on "
+                 "users.ID = orders.user_id where age > 35 or item = \"cup\"")
+    assert sorted((r[1], r[6]) for r in rows) == [("Alex", "book"), ("Ann", "cup")]
+    counts = query(users, capsys, "select name, count(*) from users join orders on "
+                   "users.ID = orders.user_id group by name order by name")
+    assert counts == [["Alex", "1"], ["Ann", "2"]]
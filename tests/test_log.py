@@ -0,0 +1,42 @@
+import os
+
+from src.primitive_db import utils
+from src.primitive_db.engine import Session
+from tests.helpers import ids, query, run
+
+LOG = os.path.join("data", "t.log")
+SNAPSHOT = os.path.join("data", "t.json")
+
+
+def test_writes_append_to_log(session):
+    run(session, "create_table t name:str", 'insert into t values ("a")')
+    assert os.path.exists(LOG) and not os.path.exists(SNAPSHOT)
+    size = os.path.getsize(LOG)
+    run(session, 'insert into t values ("b")')
+    assert os.path.getsize(LOG) > size
+
+
+def test_log_is_replayed_on_start(session, capsys):
+    run(session, "create_table t name:str age:int",
+        'insert into t values ("a", 1), ("b", 2), ("c", 3)',
+        "update t set age = 20 where ID = 2", "delete from t where ID = 1")
+    # Без close: журнал не слит со снимком, как после сбоя процесса
+    reopened = Session()
+    assert query(reopened, capsys, "select from t") == [["2", "b", "20"],
+                                                        ["3", "c", "3"]]
+    reopened.close()
+
+
+def test_compaction_merges_log_into_snapshot(session, monkeypatch, capsys):
+    monkeypatch.setattr(utils, "COMPACT_MIN_BYTES", 0)
+    run(session, "create_table t name:str", 'insert into t values ("a")')
+    # Журнал больше пустого снимка — слит сразу после записи
+    assert os.path.exists(SNAPSHOT) and not os.path.exists(LOG)
+    assert ids(session, capsys, "select from t") == [1]
+
+
+def test_compact_command(session, capsys):
+    run(session, "create_table t name:str", 'insert into t values ("a"), ("b")',
+        "delete from t where ID = 1", "compact t")
+    assert not os.path.exists(LOG)
+    assert utils.load_table_data("t") == [{"ID": 2, "name": "b"}]
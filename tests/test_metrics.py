@@ -0,0 +1,32 @@
+import json
+
+from src.primitive_db import metrics
+from tests.helpers import run
+
+
+def test_stats_command(session, capsys, counters):
+    run(session, "create_table t name:str", 'insert into t values ("a"), ("b")',
+        "select from t")
+    capsys.readouterr()
+    run(session, "stats")
+    out = capsys.readouterr().out
+    assert "rows_written: 2" in out and "rows_returned: 2" in out
+    run(session, "stats reset", "stats")
+    out = capsys.readouterr().out
+    assert "Метрики сброшены." in out and "rows_written" not in out
+
+
+def test_dump_json(tmp_path, counters):
+    metrics.inc("rows_scanned", 3)
+    metrics.observe("select", 0.002)
+    path = tmp_path / "metrics.json"
+    metrics.REGISTRY.dump(str(path), "json")
+    snapshot = json.loads(path.read_text(encoding="utf-8"))
+    assert snapshot["counters"]["rows_scanned"] == 3
+    assert snapshot["latency_seconds"]["select"]["count"] == 1
+
+
+def test_disabled_metrics_are_not_counted():
+    metrics.REGISTRY.reset()
+    metrics.inc("rows_scanned")
+    assert "rows_scanned" not in metrics.REGISTRY.counters
@@ -0,0 +1,14 @@
+import pytest
+
+from tests.helpers import ids, run
+
+
+@pytest.mark.parametrize("kind", ["rows", "sorted"])
+def test_order_limit_offset(users, capsys, kind):
+    if kind == "sorted":
+        run(users, "create_index users age sorted")
+    assert ids(users, capsys, "select from users order by age desc limit 1") == [3]
+    assert ids(users, capsys, "select from users order by age limit 2") == [5, 2]
+    # Порядок строк с равным age не задан
+    assert sorted(ids(users, capsys, "select from users where age > 20 "
+                      "order by age limit 2 offset 1")) == [1, 4]
@@ -0,0 +1,41 @@
+import json
+
+import pytest
+
+from src.primitive_db import output
+from src.primitive_db.output import write_rows
+
+HEADERS = ["ID", "name"]
+ROWS = [{"ID": 1, "name": "a"}, {"ID": 2, "name": "b, c"}]
+
+
+def test_delimited_and_jsonl(capsys):
+    assert write_rows("csv", HEADERS, ROWS) == 2
+    assert capsys.readouterr().out == 'ID,name\n1,a\n2,"b, c"\n'
+    write_rows("tsv", HEADERS, ROWS)
+    assert capsys.readouterr().out == "ID\tname\n1\ta\n2\tb, c\n"
+    write_rows("jsonl", HEADERS, iter(ROWS))
+    lines = capsys.readouterr().out.splitlines()
+    assert [json.loads(line) for line in lines] == ROWS
+
+
+def test_table_is_paged(capsys, monkeypatch):
+    monkeypatch.setattr(output, "PAGE_ROWS", 2)
+    rows = [{"ID": i, "name": "x" * i} for i in range(1, 6)]
+    assert write_rows("table", HEADERS, rows) == 5
+    out = capsys.readouterr().out
+    # Три страницы, у каждой своя шапка
+    assert out.count("| ID |") == 3
+    # Ширина столбца растёт вместе с длинными значениями
+    assert "| xxxxx |" in out
+
+
+def test_write_to_file(tmp_path):
+    path = tmp_path / "out.csv"
+    write_rows("csv", HEADERS, ROWS, str(path))
+    assert path.read_text(encoding="utf-8").splitlines()[0] == "ID,name"
+
+
+def test_unknown_format():
+    with pytest.raises(ValueError, match="Неизвестный формат вывода"):
+        write_rows("xml", HEADERS, ROWS)
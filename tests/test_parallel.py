@@ -0,0 +1,39 @@
+import threading
+
+import pytest
+
+from src.primitive_db import parallel
+from tests.helpers import ids, query
+
+
+def test_parallel_scan_matches_serial(users, capsys):
+    where = "select from users where age > 20 and active = true"
+    serial = ids(users, capsys, where)
+    aggregate = "select active, count(*) from users group by active order by active"
+    serial_agg = query(users, capsys, aggregate)
+    workers, threshold = parallel.workers(), parallel._threshold
+    parallel.configure(workers=2, threshold=0)
+    try:
+        if not parallel.eligible(5):
+            pytest.skip("fork недоступен")
+        users.result_cache.clear()
+        assert ids(users, capsys, where) == serial
+        assert query(users, capsys, aggregate) == serial_agg
+    finally:
+        parallel.configure(workers=workers, threshold=threshold)
+
+
+def test_parallel_is_opt_in_and_single_threaded():
+    assert parallel.workers() == 1 and not parallel.eligible(10 ** 9)
+    workers, threshold = parallel.workers(), parallel._threshold
+    parallel.configure(workers=4, threshold=0)
+    stop = threading.Event()
+    thread = threading.Thread(target=stop.wait)
+    thread.start()
+    try:
+        # Пока работает другой поток, fork не выполняется
+        assert not parallel.eligible(10)
+    finally:
+        stop.set()
+        thread.join()
+        parallel.configure(workers=workers, threshold=threshold)
@@ -0,0 +1,15 @@
+from src.primitive_db import parser
+from tests.helpers import ids, run
+
+
+def test_parse_cache_and_prepared(session, capsys):
+    run(session, "create_table t name:str age:int",
+        'insert into t values ("a", 1), ("b", 2)')
+    line = "select from t where age = 2"
+    assert parser.parse_command(line) is parser.parse_command(line)
+    run(session, "prepare by_age as select from t where age >= ?")
+    assert ids(session, capsys, "execute by_age (2)") == [2]
+    assert ids(session, capsys, "execute by_age (1)") == [1, 2]
+    capsys.readouterr()
+    run(session, "execute by_age (1, 2)")
+    assert "Ожидалось параметров: 1" in capsys.readouterr().out
@@ -0,0 +1,51 @@
+import pytest
+
+from tests.helpers import run
+
+
+@pytest.fixture
+def filled(session, capsys):
+    values = ", ".join(f'("u{i}", {i % 50})' for i in range(200))
+    run(session, "create_table t name:str age:int",
+        f"insert into t values {values}")
+    capsys.readouterr()
+    return session
+
+
+def _out(session, capsys, line):
+    run(session, line)
+    return capsys.readouterr().out
+
+
+def test_seq_scan_without_index(filled, capsys):
+    assert "SeqScan: t" in _out(filled, capsys, "explain select from t where age = 7")
+
+
+def test_index_lookup(filled, capsys):
+    run(filled, "create_index t age")
+    out = _out(filled, capsys, "explain select from t where age = 7")
+    assert "IndexLookup: t (age = 7)" in out and "SeqScan" not in out
+
+
+def test_order_by_id_desc_uses_id_order(filled, capsys):
+    out = _out(filled, capsys,
+               "explain select from t where ID > 190 order by ID desc limit 3")
+    assert "IndexOrderScan: t.ID desc" in out
+    out = _out(filled, capsys, "select from t where ID > 190 order by ID desc limit 3")
+    ids = [int(line.split("|")[1]) for line in out.splitlines()
+           if line.startswith("|") and "ID" not in line]
+    assert ids == [200, 199, 198]
+
+
+def test_top_n_and_sorted_index(filled, capsys):
+    assert "TopN: age asc, 2" in _out(filled, capsys,
+                                      "explain select from t order by age limit 2")
+    run(filled, "create_index t age sorted")
+    out = _out(filled, capsys, "explain select from t order by age desc limit 2")
+    assert "IndexOrderScan: t.age desc" in out
+
+
+def test_explain_analyze_counts_rows(filled, capsys):
+    run(filled, "create_index t age")
+    out = _out(filled, capsys, "explain analyze select from t where age = 7 limit 2")
+    assert "Просмотрено строк: 2, возвращено: 2." in out
@@ -0,0 +1,39 @@
+from src.primitive_db.engine import Session
+from src.primitive_db.result_cache import ResultCache
+from tests.helpers import run
+
+
+def test_own_write_invalidates(session, capsys):
+    run(session, "create_table t name:str age:int",
+        'insert into t values ("a", 30)', "select from t where age > 20")
+    run(session, 'insert into t values ("b", 40)')
+    capsys.readouterr()
+    run(session, "select from t where age > 20")
+    assert " b " in capsys.readouterr().out
+
+
+def test_external_write_invalidates(session, capsys):
+    run(session, "create_table t name:str age:int",
+        'insert into t values ("a", 30)', "select from t where age > 20")
+    assert session.result_cache.table_entries("t") == 1
+    other = Session()
+    run(other, 'insert into t values ("external", 40)')
+    other.close()
+    capsys.readouterr()
+    run(session, "select from t where age > 20")
+    assert "external" in capsys.readouterr().out
+    assert session.result_cache.hits == 0
+
+
+def test_same_stamp_hits():
+    cache = ResultCache()
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return [{"ID": 1}]
+
+    cache.lookup("t", "q", compute, stamp=(1,))
+    assert cache.lookup("t", "q", compute, stamp=(1,))[1]
+    assert not cache.lookup("t", "q", compute, stamp=(2,))[1]
+    assert len(calls) == 2 and cache.table_entries("t") == 1
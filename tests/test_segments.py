@@ -0,0 +1,44 @@
+import pytest
+
+from src.primitive_db import utils
+from src.primitive_db.engine import Session
+from src.primitive_db.utils import load_manifest, load_table_data
+from tests.helpers import ids, run
+
+
+@pytest.fixture
+def segmented(session, monkeypatch):
+    monkeypatch.setattr(utils, "SEGMENT_ROWS", 10)
+    values = ", ".join(f'("user{i}", {i})' for i in range(1, 36))
+    run(session, "create_table t name:str age:int",
+        f"insert into t values {values}", "compact t")
+    return session
+
+
+def _files(manifest):
+    return [s["file"] for s in manifest["segments"]]
+
+
+def test_compact_splits_table_into_segments(segmented):
+    manifest = load_manifest("t")
+    assert [s["first_id"] for s in manifest["segments"]] == [1, 11, 21, 31]
+    assert len(load_table_data("t")) == 35
+
+
+def test_update_rewrites_only_affected_segment(segmented):
+    before = _files(load_manifest("t"))
+    run(segmented, "update t set age = 0 where ID = 15", "compact t")
+    after = _files(load_manifest("t"))
+    assert after[0] == before[0] and after[2:] == before[2:]
+    assert after[1] != before[1]
+    assert load_table_data("t")[14]["age"] == 0
+
+
+def test_cold_select_skips_segments(segmented, capsys, counters):
+    segmented.close()
+    reopened = Session()
+    counters.clear()
+    assert ids(reopened, capsys, "select from t where age >= 32") == [32, 33, 34, 35]
+    assert counters["segments_skipped"] == 3
+    assert counters["segments_read"] == 1
+    reopened.close()
@@ -0,0 +1,128 @@
+import asyncio
+import threading
+
+import pytest
+
+from src.primitive_db import buffer_pool
+from src.primitive_db.client import AsyncClient, ServerError
+from src.primitive_db.server import Server
+from src.primitive_db.utils import load_table_data
+
+SOCKET = "db.sock"
+
+
+def _serve(scenario):
+    """Запустить сервер на Unix-сокете, выполнить scenario(server) и остановить."""
+    async def main():
+        server = Server(unix_path=SOCKET)
+        ready, stop = asyncio.Event(), asyncio.Event()
+        task = asyncio.create_task(server.serve(ready, stop))
+        await ready.wait()
+        try:
+            return await scenario(server)
+        finally:
+            stop.set()
+            await task
+            server.close()
+    return asyncio.run(main())
+
+
+def _fail_commit(*_args, **_kwargs):
+    raise OSError("диск недоступен")
+
+
+def test_reads_and_writes(capsys):
+    async def scenario(server):
+        clients = [await AsyncClient.connect(unix_path=SOCKET) for _ in range(3)]
+        await clients[0].execute("create_table t name:str")
+        # Записи разных соединений попадают в общую очередь записи
+        await asyncio.gather(*(c.execute(f'insert into t values ("u{i}")')
+                               for i, c in enumerate(clients)))
+        out = await clients[1].execute('select from t where name = "u1"')
+        for c in clients:
+            await c.close()
+        return out
+
+    assert "u1" in _serve(scenario)
+    assert len(load_table_data("t")) == 3
+
+
+def test_failed_group_commit_rolls_back(monkeypatch, capsys):
+    async def scenario(server):
+        client = await AsyncClient.connect(unix_path=SOCKET)
+        await client.execute("create_table t name:str")
+        with monkeypatch.context() as m:
+            m.setattr(buffer_pool, "commit_group", _fail_commit)
+            with pytest.raises(ServerError, match="Ошибка записи на диск"):
+                await client.execute('insert into t values ("lost")')
+        # Изменения пакета отменены и в памяти: их не видно и ID не занят
+        out = await client.execute("select from t")
+        added = await client.execute('insert into t values ("kept")')
+        await client.close()
+        return out, added
+
+    out, added = _serve(scenario)
+    assert "lost" not in out
+    assert "ID=1" in added
+    assert [r["name"] for r in load_table_data("t")] == ["kept"]
+
+
+def test_format_is_per_connection(capsys):
+    async def scenario(server):
+        a = await AsyncClient.connect(unix_path=SOCKET)
+        b = await AsyncClient.connect(unix_path=SOCKET)
+        await a.execute("create_table t name:str")
+        await a.execute('insert into t values ("x")')
+        await a.execute("format csv")
+        with pytest.raises(ServerError, match="Вывод в файл по сети недоступен"):
+            await b.execute("format csv to out.csv")
+        outputs = (await a.execute("select from t"),
+                   await b.execute("select from t"))
+        await a.close()
+        await b.close()
+        return outputs
+
+    csv_out, table_out = _serve(scenario)
+    assert csv_out == "ID,name\n1,x\n"
+    assert table_out.startswith("+")
+
+
+def test_slow_read_does_not_block_other_connections(monkeypatch, capsys):
+    gate = threading.Event()
+
+    async def scenario(server):
+        real = server.session.execute_read
+
+        def execute_read(cmd, output_format=None):
+            if cmd["cmd"] == "select" and cmd["table"] == "slow":
+                gate.wait(5)
+            return real(cmd, output_format)
+
+        monkeypatch.setattr(server.session, "execute_read", execute_read)
+        slow, fast, writer = [await AsyncClient.connect(unix_path=SOCKET)
+                              for _ in range(3)]
+        await fast.execute("create_table slow name:str")
+        await fast.execute("create_table t name:str")
+        await fast.execute('insert into t values ("x")')
+        await fast.execute("format csv")
+        pending = asyncio.ensure_future(slow.execute("select from slow"))
+        await asyncio.sleep(0.05)
+        # Чтение другого соединения выполняется, пока первое ещё идёт,
+        # и получает вывод только своей команды в своём формате
+        fast_out = await asyncio.wait_for(fast.execute("select from t"), 2)
+        assert not pending.done()
+        # Запись ждёт окончания чтения
+        write = asyncio.ensure_future(writer.execute('insert into t values ("y")'))
+        await asyncio.sleep(0.05)
+        assert not write.done()
+        gate.set()
+        slow_out = await pending
+        await write
+        for c in (slow, fast, writer):
+            await c.close()
+        return fast_out, slow_out
+
+    fast_out, slow_out = _serve(scenario)
+    assert fast_out == "ID,name\n1,x\n"
+    assert "Нет данных по заданному запросу." in slow_out
+    assert [r["name"] for r in load_table_data("t")] == ["x", "y"]
@@ -0,0 +1,55 @@
+import json
+import os
+
+from src.primitive_db.engine import Session
+from src.primitive_db.stats import _HLL_M, distinct_estimate, on_insert
+from src.primitive_db.utils import META_PATH, load_metadata
+from tests.helpers import run
+
+
+def _fill(session, n):
+    values = ", ".join(f'("user{i}", {i % 40}, {i % 2 == 0})' for i in range(n))
+    run(session, "create_table t name:str age:int active:bool",
+        f"insert into t values {values}")
+
+
+def test_metadata_is_compact(session):
+    _fill(session, 500)
+    with open(META_PATH, encoding="utf-8") as f:
+        text = f.read()
+    assert "\n" not in text
+    hll = json.loads(text)["tables"]["t"]["stats"]["columns"]["age"]["hll"]
+    assert isinstance(hll, str) and len(hll) == 2 * _HLL_M
+    assert os.path.getsize(META_PATH) < 2048
+
+
+def test_stats_survive_reload(session, capsys):
+    _fill(session, 500)
+    session.close()
+    reopened = Session()
+    stats = reopened.metadata["tables"]["t"]["stats"]
+    assert stats["rows"] == 500 and stats["next_id"] == 501
+    assert 30 <= distinct_estimate(stats, "age") <= 50
+    run(reopened, 'insert into t values ("x", 99, true)')
+    assert reopened.metadata["tables"]["t"]["stats"]["columns"]["age"]["max"] == 99
+    reopened.close()
+
+
+def test_old_list_registers_are_read():
+    stats = {"rows": 0, "next_id": 1,
+             "columns": {"ID": {"min": None, "max": None, "hll": [0] * _HLL_M}}}
+    for i in range(1, 11):
+        on_insert(stats, {"ID": i})
+    assert distinct_estimate(stats, "ID") == 10
+
+
+def test_info_does_not_read_table(session, capsys):
+    _fill(session, 20)
+    session.close()
+    # Файл данных не нужен: info берёт всё из метаданных
+    os.remove(os.path.join("data", "t.json"))
+    reopened = Session()
+    run(reopened, "info t")
+    assert "Количество записей: 20" in capsys.readouterr().out
+    assert load_metadata()["tables"]["t"]["stats"]["rows"] == 20
+    reopened.close()
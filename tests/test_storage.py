@@ -0,0 +1,74 @@
+from src.primitive_db import storage
+from src.primitive_db.engine import Session
+from src.primitive_db.storage import BinaryBackend
+from tests.helpers import run
+
+SCHEMA = [{"name": "ID", "type": "int"}, {"name": "name", "type": "str"},
+          {"name": "active", "type": "bool"}]
+
+
+def test_binary_round_trip(tmp_path):
+    rows = [{"ID": i, "name": f"имя {i}", "active": i % 2 == 0}
+            for i in range(1, 10001)]
+    path = str(tmp_path / "t.bin")
+    BinaryBackend().save(path, rows, SCHEMA)
+    assert BinaryBackend().load(path) == rows
+
+
+def test_binary_layout_uses_declared_schema(tmp_path):
+    # Порядок столбцов первой строки не совпадает со схемой
+    rows = [{"active": True, "name": "a", "ID": 1}]
+    path = str(tmp_path / "t.bin")
+    backend = BinaryBackend()
+    backend.save(path, rows, SCHEMA)
+    mm, layout, _ = backend._open(path)
+    mm.close()
+    assert layout == [("ID", "int"), ("name", "str"), ("active", "bool")]
+    # Пустая таблица сохраняет схему, а не пустой макет
+    backend.save(path, [], SCHEMA)
+    mm, layout, _ = backend._open(path)
+    mm.close()
+    assert len(layout) == 3 and backend.load(path) == []
+
+
+def test_iter_rows_skips_pages_outside_id_range(tmp_path, monkeypatch, counters):
+    monkeypatch.setattr(storage, "PAGE_ROWS", 10)
+    rows = [{"ID": i, "name": str(i), "active": False} for i in range(1, 101)]
+    path = str(tmp_path / "t.bin")
+    BinaryBackend().save(path, rows, SCHEMA)
+    found = list(BinaryBackend().iter_rows(path, (35, 44)))
+    assert [r["ID"] for r in found] == list(range(31, 51))
+    assert counters["pages_read"] == 2
+    assert counters["pages_skipped"] == 8
+
+
+def test_cold_select_by_id_skips_pages(session, monkeypatch, capsys, counters):
+    monkeypatch.setattr(storage, "PAGE_ROWS", 10)
+    values = ", ".join(f'("user{i}", {i % 2 == 0})' for i in range(1, 101))
+    run(session, "create_table t name:str active:bool",
+        f"insert into t values {values}", "convert t binary")
+    session.close()
+    reopened = Session()
+    counters.clear()
+    capsys.readouterr()
+    run(reopened, "select from t where ID >= 95")
+    out = capsys.readouterr().out
+    assert "user95" in out and "user100" in out and "user94" not in out
+    assert counters["pages_read"] == 1
+    assert counters["pages_skipped"] == 9
+    reopened.close()
+
+
+def test_convert_binary_keeps_changes(session, capsys):
+    run(session, "create_table t name:str active:bool",
+        'insert into t values ("a", true), ("b", false)',
+        "convert t binary",
+        'update t set active = true where name = "b"',
+        "compact t")
+    session.close()
+    reopened = Session()
+    capsys.readouterr()
+    run(reopened, "select from t where active = true")
+    out = capsys.readouterr().out
+    assert out.count("True") == 2
+    reopened.close()
@@ -0,0 +1,11 @@
+from src.primitive_db.engine import Session
+from tests.helpers import ids, run
+
+
+def test_streaming_select_does_not_load_table(users, capsys):
+    run(users, "convert users jsonl", 'insert into users values ("Zed", 50, true)')
+    users.close()
+    reopened = Session()
+    assert ids(reopened, capsys, "select from users limit 2 offset 4") == [5, 6]
+    assert not reopened.pool.is_resident("users")
+    reopened.close()
@@ -0,0 +1,53 @@
+import os
+
+import pytest
+
+from src.primitive_db import utils
+from src.primitive_db.engine import Session
+from tests.helpers import ids, run
+
+
+@pytest.fixture
+def table(session):
+    run(session, "create_table t name:str", 'insert into t values ("a")')
+    return session
+
+
+def test_rollback_restores_rows_and_schema(table, capsys):
+    run(table, "begin", 'insert into t values ("b")', "delete from t where ID = 1",
+        "create_table other x:int", "rollback")
+    assert ids(table, capsys, "select from t") == [1]
+    assert "other" not in table.metadata["tables"]
+    assert table.metadata["tables"]["t"]["stats"]["next_id"] == 2
+
+
+def test_commit_is_durable(table, capsys):
+    run(table, "begin", 'insert into t values ("b")', 'insert into t values ("c")')
+    # До commit на диске ничего нет
+    assert [r["ID"] for r in utils.load_table_data("t")] == [1]
+    run(table, "commit")
+    assert [r["ID"] for r in utils.load_table_data("t")] == [1, 2, 3]
+
+
+def test_file_rewrites_are_rejected_in_transaction(table, capsys):
+    capsys.readouterr()
+    run(table, "begin", "compact t")
+    assert "недоступна внутри транзакции" in capsys.readouterr().out
+    run(table, "rollback")
+
+
+def test_interrupted_commit_is_recovered(table, monkeypatch, capsys):
+    run(table, "begin", 'insert into t values ("b")')
+    # Сбой после записи журнала коммита, до применения его к файлам
+    with monkeypatch.context() as m:
+        m.setattr(utils, "_apply_journal", _crash)
+        run(table, "commit")
+    assert os.path.exists(utils._journal_path())
+    reopened = Session()
+    assert not os.path.exists(utils._journal_path())
+    assert ids(reopened, capsys, "select from t") == [1, 2]
+    reopened.close()
+
+
+def _crash(_journal):
+    raise OSError("процесс упал")
@@ -0,0 +1,21 @@
+import pytest
+
+from tests.helpers import ids, run
+
+
+@pytest.mark.parametrize("where, expected", [
+    ("age >= 30 and active = true", [1, 4]),
+    ('name like "A%" or age < 20', [1, 3, 5]),
+    ("not (age = 30)", [2, 3, 5]),
+    ("age in (25, 41)", [2, 3]),
+    ('name not in ("Ann", "Bob") and age <> 18', [3, 4]),
+    ('name like "_o%"', [2]),
+])
+def test_where_expressions(users, capsys, where, expected):
+    assert ids(users, capsys, f"select from users where {where}") == expected
+
+
+def test_where_type_error(users, capsys):
+    capsys.readouterr()
+    run(users, 'select from users where age = "old"')
+    assert "Ошибка" in capsys.readouterr().out